@@ -0,0 +1,233 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+
+from flask import request, g, jsonify
+
+from instrumentacion import anotar
+
+# Control de admisión por clase de ruta.
+#
+# Cada petición se clasifica según su ruta (ver REGLAS) y tiene que conseguir
+# un cupo de su clase antes de ejecutarse:
+#   vision       reconocimiento y fotos de productos (usan el modelo)
+#   pesadas      exportaciones, reportes, importaciones y listados de compras y ventas
+#   escrituras   altas y anulaciones (POST /ventas, /compras, ...)
+#   lecturas     el resto de los GET (catálogo, búsqueda, ...)
+#   sondeos      consultas de trabajos de reconocimiento, que pueden quedar
+#                esperando el resultado (ver trabajos.MAX_ESPERA_CONSULTA_S)
+# Cada clase tiene su límite de peticiones en curso y de peticiones en espera.
+# Con la cola llena se responde 429; si la espera estimada supera el plazo de
+# la petición, o el plazo vence esperando, se responde 503. Así una
+# exportación o una ráfaga de fotos solo ocupa los cupos de su clase y las
+# ventas siguen atendiéndose con la misma latencia.
+#
+# Los límites son por worker de gunicorn. Como las peticiones en espera
+# también ocupan un hilo, gunicorn.conf.py usa hilos_necesarios() para que
+# haya hilos para todas las clases a la vez.
+#
+# Configuración: ADMISION_<CLASE>='en_curso,en_espera,espera_maxima_s', por
+# ejemplo ADMISION_VISION='2,4,10'. ADMISION=0 lo desactiva. El cliente puede
+# acortar el plazo de su petición con la cabecera X-Plazo-Ms.
+
+CLASES_POR_DEFECTO = {
+    'vision': (2, 4, 10.0),
+    'pesadas': (2, 2, 5.0),
+    'escrituras': (6, 6, 2.0),
+    'lecturas': (12, 12, 1.0),
+    # Cada consulta ocupa su cupo hasta MAX_ESPERA_CONSULTA_S (5 s), bastante
+    # menos que lo que puede esperar en la cola
+    'sondeos': (8, 8, 10.0),
+}
+
+# (métodos, prefijo de la ruta, clase); gana la primera que coincide.
+# Clase None: la ruta no pasa por el control
+REGLAS = [
+    (('GET',), '/health', None),
+    (('GET',), '/admision/metricas', None),
+    (('GET',), '/metrics', None),
+    (('GET',), '/reconocer-imagen/metricas', 'lecturas'),
+    (('POST',), '/reconocer-imagen/jobs', 'escrituras'),
+    # La consulta de un trabajo puede quedar esperando el resultado: tiene su
+    # propia clase para no ocupar los cupos de las exportaciones y reportes
+    (('GET',), '/reconocer-imagen/jobs', 'sondeos'),
+    (('POST',), '/reconocer-imagen', 'vision'),
+    (('POST',), '/reconocer-imagenes', 'vision'),
+    (('POST',), '/productos/reconocer', 'vision'),
+    (('POST',), '/productos/fotos', 'vision'),
+    (('POST',), '/productos/bulk', 'pesadas'),
+    (('POST',), '/clientes/bulk', 'pesadas'),
+    (('GET',), '/compras/exportar', 'pesadas'),
+    (('GET',), '/productos/exportar', 'pesadas'),
+    (('GET',), '/ventas/exportar', 'pesadas'),
+    (('GET',), '/reportes', 'pesadas'),
+    (('GET',), '/compras', 'pesadas'),
+    (('GET',), '/ventas', 'pesadas'),
+]
+
+
+def leer_clases(entorno=os.environ):
+    clases = {}
+    for nombre, (en_curso, en_espera, espera) in CLASES_POR_DEFECTO.items():
+        valor = entorno.get(f'ADMISION_{nombre.upper()}')
+        if valor:
+            partes = [p.strip() for p in valor.split(',')]
+            en_curso = int(partes[0])
+            en_espera = int(partes[1]) if len(partes) > 1 else en_espera
+            espera = float(partes[2]) if len(partes) > 2 else espera
+        clases[nombre] = (en_curso, en_espera, espera)
+    return clases
+
+
+# Hilos por worker para que todas las clases puedan estar llenas a la vez
+def hilos_necesarios(entorno=os.environ):
+    return sum(en_curso + en_espera for en_curso, en_espera, _ in leer_clases(entorno).values())
+
+
+def clasificar(ruta, metodo):
+    for metodos, prefijo, clase in REGLAS:
+        if metodo in metodos and (ruta == prefijo or ruta.startswith(prefijo.rstrip('/') + '/')):
+            return clase
+    return 'lecturas' if metodo in ('GET', 'HEAD', 'OPTIONS') else 'escrituras'
+
+
+class Rechazada(Exception):
+    def __init__(self, clase, motivo, mensaje, codigo, reintentar):
+        super().__init__(mensaje)
+        self.clase = clase
+        self.motivo = motivo
+        self.codigo = codigo
+        self.reintentar = reintentar
+
+
+# Cupos de una clase. Las peticiones en espera se atienden en orden de
+# llegada: al salir, una petición le pasa su cupo a la primera de la cola
+class ClaseAdmision:
+    def __init__(self, nombre, en_curso, en_espera, espera_maxima):
+        self.nombre = nombre
+        self.limite = en_curso
+        self.limite_espera = en_espera
+        self.espera_maxima = espera_maxima
+        self._candado = threading.Lock()
+        self._cola = deque()
+        self._en_curso = 0
+        # Duración media de las peticiones (media móvil), para estimar esperas
+        self._duracion = 0.05
+        self._admitidas = 0
+        self._rechazadas = 0
+        self._descartadas = 0
+        self._espera_total = 0.0
+
+    def _reintentar(self):
+        return max(1, math.ceil(self._duracion * (len(self._cola) + 1) / self.limite))
+
+    def _rechazo(self, motivo, mensaje, codigo):
+        return Rechazada(self.nombre, motivo, mensaje, codigo, self._reintentar())
+
+    def entrar(self, plazo=None):
+        plazo = self.espera_maxima if plazo is None else min(plazo, self.espera_maxima)
+        inicio = time.monotonic()
+        with self._candado:
+            if self._en_curso < self.limite and not self._cola:
+                self._en_curso += 1
+                self._admitidas += 1
+                return 0.0
+            if len(self._cola) >= self.limite_espera:
+                self._rechazadas += 1
+                raise self._rechazo('cola_llena', f"Hay demasiadas peticiones de tipo '{self.nombre}' en espera, intente nuevamente.", 429)
+            # Descartar ya si la espera estimada no entra en el plazo
+            estimada = self._duracion * (len(self._cola) + 1) / self.limite
+            if estimada > plazo:
+                self._descartadas += 1
+                raise self._rechazo('espera_estimada', f"El servidor no puede atender la petición de tipo '{self.nombre}' dentro de su plazo, intente nuevamente.", 503)
+            turno = threading.Event()
+            self._cola.append(turno)
+
+        if not turno.wait(plazo):
+            with self._candado:
+                # Si el cupo llegó justo al vencer el plazo, se usa
+                if not turno.is_set():
+                    self._cola.remove(turno)
+                    self._descartadas += 1
+                    raise self._rechazo('plazo_vencido', f"La petición de tipo '{self.nombre}' esperó demasiado un turno, intente nuevamente.", 503)
+
+        espera = time.monotonic() - inicio
+        with self._candado:
+            self._admitidas += 1
+            self._espera_total += espera
+        return espera
+
+    def salir(self, duracion):
+        with self._candado:
+            self._duracion = 0.9 * self._duracion + 0.1 * duracion
+            if self._cola:
+                # El cupo pasa directamente a la siguiente petición
+                self._cola.popleft().set()
+            else:
+                self._en_curso -= 1
+
+    def metricas(self):
+        with self._candado:
+            return {
+                'limite': self.limite,
+                'limiteEspera': self.limite_espera,
+                'enCurso': self._en_curso,
+                'enEspera': len(self._cola),
+                'admitidas': self._admitidas,
+                'rechazadas': self._rechazadas,
+                'descartadas': self._descartadas,
+                'esperaPromedioMs': round(self._espera_total * 1000 / self._admitidas, 3) if self._admitidas else 0,
+                'duracionMediaMs': round(self._duracion * 1000, 3),
+            }
+
+
+class ControlAdmision:
+    def __init__(self, clases=None):
+        self.clases = {nombre: ClaseAdmision(nombre, *limites) for nombre, limites in (clases or leer_clases()).items()}
+
+    def metricas(self):
+        return {nombre: clase.metricas() for nombre, clase in self.clases.items()}
+
+
+def plazo_cliente():
+    valor = request.headers.get('X-Plazo-Ms')
+    try:
+        return max(float(valor), 0) / 1000.0 if valor else None
+    except ValueError:
+        return None
+
+
+# Registrar antes que instalar_plazos, para que una petición descartada no
+# llegue a abrir su plazo de MongoDB
+def instalar_admision(app, control=None):
+    if os.environ.get('ADMISION', '1') == '0':
+        return None
+    control = control or ControlAdmision()
+
+    @app.before_request
+    def admitir():
+        clase = clasificar(request.path, request.method)
+        if clase is None:
+            return None
+        try:
+            anotar('admision', control.clases[clase].entrar(plazo_cliente()))
+        except Rechazada as e:
+            respuesta = jsonify({'error': str(e), 'clase': e.clase, 'motivo': e.motivo})
+            return respuesta, e.codigo, {'Retry-After': str(e.reintentar)}
+        g.admision = (control.clases[clase], time.monotonic())
+        return None
+
+    @app.teardown_request
+    def liberar(error=None):
+        admision = g.pop('admision', None)
+        if admision is not None:
+            clase, inicio = admision
+            clase.salir(time.monotonic() - inicio)
+
+    @app.route('/admision/metricas', methods=['GET'])
+    def metricas_admision():
+        return jsonify(control.metricas()), 200
+
+    return control
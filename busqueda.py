@@ -0,0 +1,331 @@
+import re
+import time
+import bisect
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from pymongo import ReturnDocument
+
+# Índice invertido en memoria para GET /productos/buscar.
+#
+# Cada worker arma el índice en la primera búsqueda (una lectura de los campos
+# de texto de 'productos') y responde desde memoria. Cada término de la
+# consulta se busca como prefijo, sin distinguir acentos ni mayúsculas, y los
+# productos deben contener todos los términos. El puntaje suma el peso del
+# campo donde aparece cada término, con más peso si la palabra es completa.
+#
+# Las rutas que cambian nombre, descripción, categoría, proveedor o estado de
+# un producto llaman a invalidar(): se incrementa un contador en 'versiones' y
+# los demás workers, que lo revisan como máximo una vez por
+# 'intervalo_version', rearman su índice en segundo plano mientras siguen
+# respondiendo con el anterior.
+
+PESOS = {
+    'nombre': 10.0,
+    'Categoria': 4.0,
+    'Proveedor': 3.0,
+    'descripcion': 1.0,
+}
+# Campos que se devuelven en cada resultado, además de _id
+CAMPOS_RESULTADO = ('nombre', 'precioVenta', 'Iva', 'unidadMedida', 'Categoria', 'Proveedor', 'estado')
+BONO_PALABRA_COMPLETA = 1.5
+BONO_INICIO_NOMBRE = 5.0
+# Límite de palabras que se expanden por prefijo, para consultas muy cortas
+MAX_EXPANSION_PREFIJO = 500
+# Los prefijos cortos (primeras teclas del autocompletado) expanden muchas
+# palabras; su resultado se guarda hasta el próximo cambio del índice
+LARGO_PREFIJO_CACHEADO = 2
+MAX_PREFIJOS_CACHEADOS = 128
+
+SEPARADOR = re.compile(r'[^0-9a-z]+')
+
+
+# Minúsculas y sin acentos ('Azúcar Ñandutí' -> 'azucar nanduti')
+def normalizar(texto):
+    return unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def palabras(texto):
+    return [p for p in SEPARADOR.split(normalizar(texto)) if p]
+
+
+ESTADOS = {'activo': 1, 'anulado': 2}
+
+
+# Los productos ocupan posiciones (slots) en arreglos de NumPy; cada palabra
+# guarda los slots donde aparece y su peso. Una búsqueda suma los pesos en un
+# arreglo denso, así el costo por término es una operación vectorizada y no un
+# recorrido en Python
+class Indice:
+    def __init__(self, capacidad=1024):
+        self.documentos = []
+        self.slots = {}
+        self.vivo = np.zeros(capacidad, dtype=bool)
+        self.estado = np.zeros(capacidad, dtype=np.int8)
+        self.longitud = np.zeros(capacidad, dtype=np.float32)
+        self._listas = {}
+        self._postings = {}
+        self._iniciales = {}
+        self._iniciales_compiladas = {}
+        self._prefijos = OrderedDict()
+        self._ordenadas = None
+        self._iniciales_ordenadas = None
+
+    def _crecer(self, necesario):
+        capacidad = len(self.vivo)
+        if necesario <= capacidad:
+            return
+        while capacidad < necesario:
+            capacidad *= 2
+        for nombre in ('vivo', 'estado', 'longitud'):
+            actual = getattr(self, nombre)
+            nuevo = np.zeros(capacidad, dtype=actual.dtype)
+            nuevo[:len(actual)] = actual
+            setattr(self, nombre, nuevo)
+
+    def agregar(self, documento):
+        clave = str(documento['_id'])
+        self.quitar(clave)
+        slot = len(self.documentos)
+        self._crecer(slot + 1)
+
+        terminos = {}
+        for campo, peso in PESOS.items():
+            for palabra in palabras(documento.get(campo)):
+                terminos[palabra] = max(terminos.get(palabra, 0), peso)
+        for palabra, peso in terminos.items():
+            self._listas.setdefault(palabra, ([], []))
+            self._listas[palabra][0].append(slot)
+            self._listas[palabra][1].append(peso)
+            self._postings.pop(palabra, None)
+
+        palabras_nombre = palabras(documento.get('nombre'))
+        if palabras_nombre:
+            self._iniciales.setdefault(palabras_nombre[0], []).append(slot)
+            self._iniciales_compiladas.pop(palabras_nombre[0], None)
+
+        resultado = {campo: documento.get(campo) for campo in CAMPOS_RESULTADO}
+        resultado['_id'] = clave
+        self.documentos.append(resultado)
+        self.slots[clave] = slot
+        self.vivo[slot] = True
+        self.estado[slot] = ESTADOS.get(documento.get('estado'), 0)
+        self.longitud[slot] = len(documento.get('nombre') or '')
+        self._prefijos.clear()
+        self._ordenadas = None
+        self._iniciales_ordenadas = None
+
+    # El slot queda marcado como libre; sus entradas se descartan al buscar
+    def quitar(self, clave):
+        slot = self.slots.pop(clave, None)
+        if slot is not None:
+            self.vivo[slot] = False
+
+    def cambiar_estado(self, clave, estado):
+        slot = self.slots.get(clave)
+        if slot is not None:
+            self.documentos[slot]['estado'] = estado
+            self.estado[slot] = ESTADOS.get(estado, 0)
+
+    def compactar_orden(self):
+        if self._ordenadas is None:
+            self._ordenadas = sorted(self._listas)
+        if self._iniciales_ordenadas is None:
+            self._iniciales_ordenadas = sorted(self._iniciales)
+
+    def _posting(self, palabra):
+        posting = self._postings.get(palabra)
+        if posting is None:
+            slots, pesos = self._listas[palabra]
+            posting = (np.array(slots, dtype=np.int32), np.array(pesos, dtype=np.float32))
+            self._postings[palabra] = posting
+        return posting
+
+    def _inicial(self, palabra):
+        slots = self._iniciales_compiladas.get(palabra)
+        if slots is None:
+            slots = np.array(self._iniciales[palabra], dtype=np.int32)
+            self._iniciales_compiladas[palabra] = slots
+        return slots
+
+    @staticmethod
+    def _expandir(ordenadas, prefijo):
+        inicio = bisect.bisect_left(ordenadas, prefijo)
+        for palabra in ordenadas[inicio:inicio + MAX_EXPANSION_PREFIJO]:
+            if not palabra.startswith(prefijo):
+                break
+            yield palabra
+
+    # Puntaje de cada slot para un término buscado como prefijo
+    def _puntajes(self, prefijo, total):
+        if len(prefijo) <= LARGO_PREFIJO_CACHEADO:
+            cacheado = self._prefijos.get(prefijo)
+            if cacheado is not None:
+                self._prefijos.move_to_end(prefijo)
+                puntajes = np.zeros(total, dtype=np.float32)
+                puntajes[cacheado[0]] = cacheado[1]
+                return puntajes
+
+        puntajes = np.zeros(total, dtype=np.float32)
+        for palabra in self._expandir(self._ordenadas, prefijo):
+            slots, pesos = self._posting(palabra)
+            if palabra == prefijo:
+                pesos = pesos * BONO_PALABRA_COMPLETA
+            puntajes[slots] = np.maximum(puntajes[slots], pesos)
+
+        if len(prefijo) <= LARGO_PREFIJO_CACHEADO:
+            slots = np.flatnonzero(puntajes).astype(np.int32)
+            self._prefijos[prefijo] = (slots, puntajes[slots])
+            while len(self._prefijos) > MAX_PREFIJOS_CACHEADOS:
+                self._prefijos.popitem(last=False)
+        return puntajes
+
+    def buscar(self, consulta, limite=10, estado=None):
+        terminos = palabras(consulta)
+        if not terminos or not self.documentos:
+            return []
+        self.compactar_orden()
+        total = len(self.documentos)
+
+        puntaje = np.zeros(total, dtype=np.float32)
+        validos = self.vivo[:total].copy()
+        if estado:
+            validos &= self.estado[:total] == ESTADOS.get(estado, -1)
+        for termino in terminos:
+            puntajes_termino = self._puntajes(termino, total)
+            validos &= puntajes_termino > 0
+            puntaje += puntajes_termino
+
+        # Bono para los nombres que empiezan con el primer término
+        for palabra in self._expandir(self._iniciales_ordenadas, terminos[0]):
+            puntaje[self._inicial(palabra)] += BONO_INICIO_NOMBRE
+
+        candidatos = np.flatnonzero(validos)
+        if not len(candidatos):
+            return []
+        # A igual puntaje, primero los nombres más cortos
+        orden = puntaje[candidatos] - self.longitud[candidatos] * 1e-3
+        if len(candidatos) > limite:
+            mejores = np.argpartition(-orden, limite - 1)[:limite]
+            candidatos, orden = candidatos[mejores], orden[mejores]
+        candidatos = candidatos[np.argsort(-orden, kind='stable')]
+
+        resultados = []
+        for slot in candidatos:
+            documento = dict(self.documentos[slot])
+            documento['puntaje'] = round(float(puntaje[slot]), 2)
+            resultados.append(documento)
+        return resultados
+
+
+class IndiceBusqueda:
+    def __init__(self, productos_collection, versiones_collection, intervalo_version=1.0):
+        self.productos = productos_collection
+        self.versiones = versiones_collection
+        self.intervalo_version = intervalo_version
+        self._indice = None
+        self._version_indice = None
+        self._version = None
+        self._revisado = 0
+        self._candado = threading.Lock()
+        self._candado_armado = threading.Lock()
+        self._armando = False
+        self._armados = 0
+        self._segundos_ultimo_armado = 0.0
+
+    def _leer_version(self):
+        documento = self.versiones.find_one({'_id': 'busqueda_productos'})
+        return documento['v'] if documento else 0
+
+    def _armar(self):
+        inicio = time.perf_counter()
+        version = self._leer_version()
+        proyeccion = dict.fromkeys(set(PESOS) | set(CAMPOS_RESULTADO), 1)
+        indice = Indice()
+        for documento in self.productos.find({}, proyeccion, batch_size=5000):
+            indice.agregar(documento)
+        indice.compactar_orden()
+        with self._candado:
+            self._indice = indice
+            self._version_indice = version
+            self._version = version if self._version is None else max(self._version, version)
+            self._armados += 1
+            self._segundos_ultimo_armado = time.perf_counter() - inicio
+            self._armando = False
+
+    def _armar_en_segundo_plano(self):
+        try:
+            self._armar()
+        except Exception:
+            with self._candado:
+                self._armando = False
+
+    def _asegurar(self):
+        # La primera vez se arma en la petición; las demás esperan a que termine
+        if self._indice is None:
+            with self._candado_armado:
+                if self._indice is None:
+                    self._armar()
+            return
+
+        ahora = time.monotonic()
+        if ahora - self._revisado < self.intervalo_version:
+            return
+        self._revisado = ahora
+        version = self._leer_version()
+        with self._candado:
+            self._version = version
+            if version == self._version_indice or self._armando:
+                return
+            self._armando = True
+        threading.Thread(target=self._armar_en_segundo_plano, name='indice-busqueda', daemon=True).start()
+
+    # Armar el índice en segundo plano al arrancar el worker (BUSQUEDA_PRECARGA)
+    def precargar(self):
+        def armar():
+            try:
+                self._asegurar()
+            except Exception:
+                pass
+        threading.Thread(target=armar, name='indice-busqueda', daemon=True).start()
+
+    def buscar(self, consulta, limite=10, estado=None):
+        self._asegurar()
+        with self._candado:
+            return self._indice.buscar(consulta, limite, estado)
+
+    # Aplicar en este worker un producto creado o modificado, sin esperar al rearmado
+    def actualizar(self, documento):
+        with self._candado:
+            if self._indice is not None:
+                self._indice.agregar(documento)
+
+    def actualizar_estado(self, producto_id, estado):
+        with self._candado:
+            if self._indice is not None:
+                self._indice.cambiar_estado(str(producto_id), estado)
+
+    # Avisar a los demás workers que tienen que rearmar su índice. Con
+    # aplicado=True este worker ya tiene el cambio (actualizar/actualizar_estado)
+    def invalidar(self, aplicado=False):
+        documento = self.versiones.find_one_and_update(
+            {'_id': 'busqueda_productos'}, {'$inc': {'v': 1}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        version = documento['v']
+        with self._candado:
+            # Si además estaba al día, no necesita rearmar
+            if aplicado and self._version_indice is not None and version == self._version_indice + 1:
+                self._version_indice = version
+            self._version = version
+            self._revisado = 0
+
+    def metricas(self):
+        return {
+            'productos': len(self._indice.slots) if self._indice else 0,
+            'palabras': len(self._indice._listas) if self._indice else 0,
+            'version': self._version_indice,
+            'armados': self._armados,
+            'segundosUltimoArmado': self._segundos_ultimo_armado,
+        }
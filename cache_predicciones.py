@@ -0,0 +1,145 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+# Clave exacta: hash del contenido subido
+def hash_contenido(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+# Clave perceptual (average hash de 64 bits) sobre la imagen ya decodificada
+# a 224x224, para que re-codificaciones casi idénticas compartan clave
+def hash_perceptual(img_array):
+    gris = np.asarray(img_array, dtype=np.float32).mean(axis=2)
+    alto, ancho = gris.shape
+    bloques = gris[:alto - alto % 8, :ancho - ancho % 8].reshape(8, alto // 8, 8, ancho // 8).mean(axis=(1, 3))
+    bits = (bloques > bloques.mean()).flatten()
+    return 'p' + format(int(''.join('1' if b else '0' for b in bits), 2), '016x')
+
+
+# Backend en memoria del proceso: LRU con límite de entradas y TTL
+class BackendMemoria:
+    def __init__(self, max_entradas=10000, ttl_segundos=86400):
+        self.max_entradas = max_entradas
+        self.ttl = ttl_segundos
+        self._entradas = OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, clave):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira < time.time():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._candado:
+            self._entradas[clave] = (valor, time.time() + self.ttl)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def tamano(self):
+        return len(self._entradas)
+
+
+# Backend en una colección de Mongo, compartido por todos los workers.
+# La expiración la hace un índice TTL sobre 'expira'; el límite de tamaño se
+# revisa cada cierto número de inserciones borrando las entradas más viejas
+class BackendMongo:
+    def __init__(self, collection, max_entradas=100000, ttl_segundos=86400, revisar_cada=500):
+        self.collection = collection
+        self.max_entradas = max_entradas
+        self.ttl = ttl_segundos
+        self.revisar_cada = revisar_cada
+        self._inserciones = 0
+        self._indices_creados = False
+
+    def _asegurar_indices(self):
+        if not self._indices_creados:
+            self.collection.create_index('expira', expireAfterSeconds=0)
+            self.collection.create_index('creado')
+            self._indices_creados = True
+
+    def obtener(self, clave):
+        # El monitor TTL de Mongo corre cada ~60 s, así que se filtra también aquí
+        documento = self.collection.find_one({'_id': clave, 'expira': {'$gt': _ahora_utc()}}, {'valor': 1})
+        return documento['valor'] if documento else None
+
+    def guardar(self, clave, valor):
+        self._asegurar_indices()
+        ahora = _ahora_utc()
+        self.collection.replace_one(
+            {'_id': clave},
+            {'valor': valor, 'creado': ahora, 'expira': ahora + timedelta(seconds=self.ttl)},
+            upsert=True
+        )
+        self._inserciones += 1
+        if self._inserciones % self.revisar_cada == 0:
+            self._recortar()
+
+    def _recortar(self):
+        sobrantes = self.collection.estimated_document_count() - self.max_entradas
+        if sobrantes > 0:
+            viejos = self.collection.find({}, {'_id': 1}).sort('creado', 1).limit(sobrantes)
+            self.collection.delete_many({'_id': {'$in': [d['_id'] for d in viejos]}})
+
+    def tamano(self):
+        return self.collection.estimated_document_count()
+
+
+def _ahora_utc():
+    return datetime.now(timezone.utc)
+
+
+# Caché de resultados de reconocimiento con contadores de aciertos y fallos
+class CachePredicciones:
+    def __init__(self, backend, usar_hash_perceptual=False):
+        self.backend = backend
+        self.usar_hash_perceptual = usar_hash_perceptual
+        self._candado = threading.Lock()
+        self._contadores = {'aciertosExactos': 0, 'aciertosPerceptuales': 0, 'fallos': 0}
+
+    def _contar(self, nombre):
+        with self._candado:
+            self._contadores[nombre] += 1
+
+    def obtener_exacto(self, clave_contenido):
+        valor = self.backend.obtener(clave_contenido)
+        if valor is not None:
+            self._contar('aciertosExactos')
+        return valor
+
+    def obtener_perceptual(self, clave_perceptual):
+        valor = self.backend.obtener(clave_perceptual) if clave_perceptual else None
+        if valor is not None:
+            self._contar('aciertosPerceptuales')
+        else:
+            self._contar('fallos')
+        return valor
+
+    def guardar(self, valor, *claves):
+        for clave in claves:
+            if clave:
+                self.backend.guardar(clave, valor)
+
+    def clave_perceptual(self, img_array):
+        return hash_perceptual(img_array) if self.usar_hash_perceptual else None
+
+    def metricas(self):
+        with self._candado:
+            metricas = dict(self._contadores)
+        total = sum(metricas.values())
+        metricas['tasaAciertos'] = (total - metricas['fallos']) / total if total else 0
+        metricas['entradas'] = self.backend.tamano()
+        return metricas
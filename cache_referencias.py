@@ -0,0 +1,81 @@
+import time
+import threading
+
+from flask import Response, make_response
+
+# Caché de lectura para los datos de referencia (categorías, proveedores,
+# empresas), que cambian pocas veces al día pero se piden en cada pantalla.
+#
+# Guarda el cuerpo JSON ya serializado. Las escrituras llaman a invalidar(),
+# que borra la copia local e incrementa un contador de versión en la
+# colección 'versiones'. Cada worker revisa ese contador como máximo una vez
+# cada 'intervalo_version' segundos, y descarta sus copias si cambió; así los
+# demás workers se enteran sin ir a la base de datos en cada petición.
+
+
+class CacheReferencias:
+    def __init__(self, versiones_collection, ttl_segundos=300, intervalo_version=1.0):
+        self.versiones = versiones_collection
+        self.ttl = ttl_segundos
+        self.intervalo_version = intervalo_version
+        self._entradas = {}
+        self._version = {}
+        self._revisado = {}
+        self._candado = threading.Lock()
+        self._aciertos = 0
+        self._fallos = 0
+
+    def _version_actual(self, coleccion):
+        ahora = time.monotonic()
+        if ahora - self._revisado.get(coleccion, 0) < self.intervalo_version:
+            return self._version.get(coleccion, 0)
+
+        documento = self.versiones.find_one({'_id': coleccion})
+        version = documento['v'] if documento else 0
+        with self._candado:
+            if version != self._version.get(coleccion):
+                self._descartar(coleccion)
+            self._version[coleccion] = version
+            self._revisado[coleccion] = ahora
+        return version
+
+    def _descartar(self, coleccion):
+        for clave in [c for c in self._entradas if c[0] == coleccion]:
+            del self._entradas[clave]
+
+    # Llamar después de cada escritura sobre la colección
+    def invalidar(self, coleccion):
+        with self._candado:
+            self._descartar(coleccion)
+            self._revisado.pop(coleccion, None)
+        self.versiones.update_one({'_id': coleccion}, {'$inc': {'v': 1}}, upsert=True)
+
+    # Devolver la respuesta cacheada o generarla con 'generar' (que devuelve lo
+    # mismo que una vista de Flask). Solo se guardan las respuestas 200
+    def responder(self, coleccion, clave, generar):
+        version = self._version_actual(coleccion)
+        entrada = self._entradas.get((coleccion, clave))
+        if entrada is not None and entrada[0] == version and entrada[1] > time.monotonic():
+            self._aciertos += 1
+            _, _, cuerpo, cabeceras = entrada
+            return Response(cuerpo, status=200, headers=cabeceras, mimetype='application/json')
+
+        self._fallos += 1
+        respuesta = make_response(generar())
+        if respuesta.status_code == 200:
+            cabeceras = {k: v for k, v in respuesta.headers.items() if k not in ('Content-Type', 'Content-Length')}
+            with self._candado:
+                # Si otro worker invalidó mientras se generaba, la versión ya no coincide
+                if self._version.get(coleccion, 0) == version:
+                    self._entradas[(coleccion, clave)] = (version, time.monotonic() + self.ttl, respuesta.get_data(), cabeceras)
+        return respuesta
+
+    def metricas(self):
+        total = self._aciertos + self._fallos
+        return {
+            'aciertos': self._aciertos,
+            'fallos': self._fallos,
+            'tasaAciertos': self._aciertos / total if total else 0,
+            'entradas': len(self._entradas),
+            'versiones': dict(self._version),
+        }
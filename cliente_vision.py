@@ -0,0 +1,215 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoVencido
+from multiprocessing.connection import Client
+
+from decodificacion import ImagenInvalida, ImagenDemasiadoGrande
+from micro_lotes import LoteVencido
+from instrumentacion import anotar
+
+# Acceso a la pila de reconocimiento sin importar TensorFlow en app.py.
+# VISION_MODO='local' carga vision.py dentro del worker en el primer uso;
+# VISION_MODO='remoto' envía las imágenes a vision_worker.py por un socket local
+#
+# El proceso de visión deserializa (pickle) lo que recibe, así que la clave
+# VISION_AUTHKEY es la única protección: con un socket Unix alcanza la clave
+# por defecto (el socket queda solo para el usuario del proceso), pero por
+# TCP hay que configurar una clave propia
+
+VISION_MODO = os.environ.get('VISION_MODO', 'local')
+VISION_AUTHKEY_POR_DEFECTO = 'vision-local'
+VISION_AUTHKEY = os.environ.get('VISION_AUTHKEY', VISION_AUTHKEY_POR_DEFECTO).encode()
+
+# Límites del ejecutor de reconocimiento (ver EjecutorVision)
+VISION_CONCURRENCIA = int(os.environ.get('VISION_CONCURRENCIA', 4))
+VISION_COLA = int(os.environ.get('VISION_COLA', 16))
+VISION_PLAZO_S = float(os.environ.get('VISION_PLAZO_S', 30))
+
+
+class VisionSaturada(Exception):
+    pass
+
+
+class VisionPlazoVencido(Exception):
+    pass
+
+
+# VISION_SOCKET acepta la ruta de un socket Unix o 'host:puerto'. Una
+# dirección TCP requiere VISION_AUTHKEY configurada y distinta de la clave por defecto
+def direccion_vision(entorno=os.environ):
+    direccion = entorno.get('VISION_SOCKET', '/tmp/vision.sock')
+    if ':' in direccion:
+        if entorno.get('VISION_AUTHKEY', VISION_AUTHKEY_POR_DEFECTO) == VISION_AUTHKEY_POR_DEFECTO:
+            raise RuntimeError(f"VISION_SOCKET='{direccion}' es una dirección TCP: configure VISION_AUTHKEY con una clave propia.")
+        host, puerto = direccion.rsplit(':', 1)
+        return (host, int(puerto))
+    return direccion
+
+
+# Singleton que inicializa el modelo en el primer reconocimiento
+class ClienteVisionLocal:
+    def __init__(self, obtener_db=None):
+        self.obtener_db = obtener_db
+        self._vision = None
+        self._candado = threading.Lock()
+
+    def _modulo(self):
+        if self._vision is None:
+            with self._candado:
+                if self._vision is None:
+                    import vision
+                    vision.inicializar(self.obtener_db() if self.obtener_db else None)
+                    self._vision = vision
+        return self._vision
+
+    def reconocer(self, contenidos):
+        try:
+            return self._modulo().reconocer(contenidos)
+        except queue.Full:
+            raise VisionSaturada('El servicio de reconocimiento está saturado, intente nuevamente.')
+        except LoteVencido as e:
+            raise VisionSaturada(str(e))
+
+    def embeddings(self, contenidos):
+        try:
+            return self._modulo().embeddings(contenidos)
+        except queue.Full:
+            raise VisionSaturada('El servicio de reconocimiento está saturado, intente nuevamente.')
+        except LoteVencido as e:
+            raise VisionSaturada(str(e))
+
+    def metricas(self):
+        if self._vision is None:
+            return {'inicializado': False}
+        return self._vision.metricas()
+
+
+# Cliente del proceso de visión dedicado. Mantiene un pequeño pool de
+# conexiones que se crean después del fork de gunicorn
+class ClienteVisionRemoto:
+    def __init__(self, direccion, authkey=VISION_AUTHKEY, tamano_pool=8):
+        self.direccion = direccion
+        self.authkey = authkey
+        self.tamano_pool = tamano_pool
+        self._pool = queue.LifoQueue()
+        self._pid = None
+
+    def _obtener_conexion(self):
+        # Las conexiones heredadas de otro proceso no se reutilizan
+        if self._pid != os.getpid():
+            self._pool = queue.LifoQueue()
+            self._pid = os.getpid()
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return Client(self.direccion, authkey=self.authkey)
+
+    def _devolver_conexion(self, conexion):
+        if self._pool.qsize() < self.tamano_pool:
+            self._pool.put(conexion)
+        else:
+            conexion.close()
+
+    def _llamar(self, operacion, *args):
+        conexion = self._obtener_conexion()
+        try:
+            conexion.send((operacion, args))
+            estado, valor = conexion.recv()
+        except (EOFError, OSError):
+            conexion.close()
+            raise
+        self._devolver_conexion(conexion)
+
+        if estado == 'demasiado_grande':
+            raise ImagenDemasiadoGrande(valor)
+        if estado == 'invalida':
+            raise ImagenInvalida(valor)
+        if estado == 'saturado':
+            raise VisionSaturada(valor)
+        if estado == 'error':
+            raise RuntimeError(valor)
+        return valor
+
+    def reconocer(self, contenidos):
+        return self._llamar('reconocer', list(contenidos))
+
+    def embeddings(self, contenidos):
+        return self._llamar('embeddings', list(contenidos))
+
+    def metricas(self):
+        return self._llamar('metricas')
+
+
+# Ejecuta los reconocimientos en un pool de hilos acotado. Con workers de
+# varios hilos (gunicorn gthread) evita que una ráfaga de imágenes ocupe todos
+# los hilos del worker: como máximo 'concurrencia' reconocimientos corren a la
+# vez, 'cola' más esperan, y el resto se rechaza con VisionSaturada. Quien
+# llama espera el resultado como mucho 'plazo' segundos
+class EjecutorVision:
+    def __init__(self, cliente, concurrencia=VISION_CONCURRENCIA, cola=VISION_COLA, plazo=VISION_PLAZO_S):
+        self.cliente = cliente
+        self.concurrencia = concurrencia
+        self.plazo = plazo
+        self._cupos = threading.BoundedSemaphore(concurrencia + cola)
+        self._pid = None
+        self._ejecutor = None
+        self._candado = threading.Lock()
+        self._rechazados = 0
+        self._vencidos = 0
+
+    def _obtener_ejecutor(self):
+        # Los hilos no sobreviven al fork: se crea un pool por proceso
+        if self._pid != os.getpid():
+            with self._candado:
+                if self._pid != os.getpid():
+                    self._ejecutor = ThreadPoolExecutor(max_workers=self.concurrencia, thread_name_prefix='vision')
+                    self._pid = os.getpid()
+        return self._ejecutor
+
+    def reconocer(self, contenidos, plazo=None):
+        return self._ejecutar(self.cliente.reconocer, contenidos, plazo)
+
+    # Embeddings para las coincidencias visuales (ver coincidencias.py)
+    def embeddings(self, contenidos, plazo=None):
+        return self._ejecutar(self.cliente.embeddings, contenidos, plazo)
+
+    def _ejecutar(self, funcion, contenidos, plazo):
+        if not self._cupos.acquire(blocking=False):
+            self._rechazados += 1
+            raise VisionSaturada('El servicio de reconocimiento está saturado, intente nuevamente.')
+        try:
+            futuro = self._obtener_ejecutor().submit(funcion, contenidos)
+        except Exception:
+            self._cupos.release()
+            raise
+        futuro.add_done_callback(lambda _: self._cupos.release())
+
+        inicio = time.perf_counter()
+        try:
+            return futuro.result(timeout=plazo or self.plazo)
+        except FuturoVencido:
+            # El trabajo sigue hasta terminar y recién entonces libera su cupo
+            self._vencidos += 1
+            raise VisionPlazoVencido('El reconocimiento tardó demasiado, intente nuevamente.')
+        finally:
+            # Tiempo de la petición esperando al modelo, para el desglose
+            anotar('vision', time.perf_counter() - inicio)
+
+    def metricas(self):
+        metricas = self.cliente.metricas()
+        metricas['ejecutor'] = {
+            'concurrencia': self.concurrencia,
+            'rechazados': self._rechazados,
+            'vencidos': self._vencidos,
+        }
+        return metricas
+
+
+def crear_cliente_vision(obtener_db=None):
+    if VISION_MODO == 'remoto':
+        cliente = ClienteVisionRemoto(direccion_vision())
+    else:
+        cliente = ClienteVisionLocal(obtener_db)
+    return EjecutorVision(cliente)
@@ -0,0 +1,549 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import argparse
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+from bson.binary import Binary
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+# Coincidencias visuales de productos (POST /productos/reconocer).
+#
+# Cada foto de referencia de un producto se guarda como el embedding de
+# MobileNetV2 (la salida de la penúltima capa, 1280 valores) normalizado y en
+# float16, en la colección 'embeddings_productos'. Para buscar, la foto
+# consultada se pasa por el mismo modelo y se compara por similitud coseno
+# (producto punto entre vectores normalizados) contra todas las fotos.
+#
+# La matriz de fotos vive en una instantánea en disco (EMBEDDINGS_RUTA) que
+# cada worker abre con np.load(mmap_mode='r'): las páginas quedan en la caché
+# del sistema operativo y se comparten entre los workers. Las fotos agregadas
+# y los productos anulados o reactivados después de la instantánea se aplican
+# en memoria, leyendo de la colección los documentos con 'v' mayor a la
+# versión ya aplicada; el contador está en 'versiones' ('embeddings_productos')
+# y se revisa como máximo una vez por 'intervalo_version'. Cuando las filas en
+# memoria superan EMBEDDINGS_MAX_PENDIENTES se escribe una instantánea nueva.
+#
+# Multiplicar 50k x 1280 valores en cada consulta está limitado por el ancho
+# de banda de memoria (~25 ms en una CPU). Por eso la búsqueda tiene dos
+# pasadas: una aproximada sobre una proyección PCA de EMBEDDINGS_DIMENSION_REDUCIDA
+# dimensiones (float32, calculada al escribir la instantánea) y otra exacta
+# en float16 -> float32 sobre los mejores candidatos.
+#
+#   python coincidencias.py reconstruir     rearma la instantánea desde la colección
+#   python coincidencias.py medir --productos 50000
+
+RUTA_BASE = os.path.dirname(os.path.abspath(__file__))
+RUTA_EMBEDDINGS = os.environ.get('EMBEDDINGS_RUTA', os.path.join(RUTA_BASE, 'modelos', 'embeddings'))
+DIMENSION = 1280
+DIMENSION_REDUCIDA = int(os.environ.get('EMBEDDINGS_DIMENSION_REDUCIDA', 128))
+MAX_PENDIENTES = int(os.environ.get('EMBEDDINGS_MAX_PENDIENTES', 2000))
+# Candidatos de la pasada aproximada que se comparan exactamente
+MIN_CANDIDATOS = 200
+CANDIDATOS_POR_RESULTADO = 20
+# Filas usadas para ajustar la proyección
+MUESTRA_PROYECCION = 10000
+# Escrituras concurrentes pueden guardar documentos con una versión menor a la
+# ya aplicada por otro worker; la sincronización relee ese margen de versiones
+MARGEN_VERSIONES = 64
+
+
+def normalizar_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norma = np.linalg.norm(vector)
+    return vector / norma if norma else vector
+
+
+# PCA sobre una muestra de filas: (media, componentes) o None si hay pocas filas
+def ajustar_proyeccion(vectores, dimension=DIMENSION_REDUCIDA, semilla=0):
+    if dimension <= 0 or len(vectores) < 4 * dimension:
+        return None
+    filas = np.arange(len(vectores))
+    if len(filas) > MUESTRA_PROYECCION:
+        filas = np.sort(np.random.default_rng(semilla).choice(filas, MUESTRA_PROYECCION, replace=False))
+    muestra = np.asarray(vectores[filas], dtype=np.float32)
+    media = muestra.mean(axis=0)
+    muestra -= media
+    # Autovectores de la covarianza, de mayor a menor autovalor
+    _, autovectores = np.linalg.eigh(muestra.T @ muestra)
+    componentes = np.ascontiguousarray(autovectores[:, ::-1][:, :dimension], dtype=np.float32)
+    return media, componentes
+
+
+def proyectar(vectores, proyeccion, bloque=8192):
+    media, componentes = proyeccion
+    reducidos = np.empty((len(vectores), componentes.shape[1]), dtype=np.float32)
+    for inicio in range(0, len(vectores), bloque):
+        parte = np.asarray(vectores[inicio:inicio + bloque], dtype=np.float32)
+        reducidos[inicio:inicio + bloque] = (parte - media) @ componentes
+    return reducidos
+
+
+# Filas de la matriz: la instantánea (arreglos de solo lectura) o las
+# agregadas en memoria (arreglos que crecen al doble cuando se llenan)
+class Segmento:
+    def __init__(self, vectores, reducidos, productos, registros):
+        self.vectores = vectores
+        self.reducidos = reducidos
+        self.productos = list(productos)
+        self.registros = list(registros)
+        self.total = len(self.productos)
+        self.activos = np.ones(max(self.total, 1), dtype=bool)
+
+    @classmethod
+    def vacio(cls, dimension_reducida=None, capacidad=256):
+        segmento = cls(np.zeros((capacidad, DIMENSION), dtype=np.float16),
+                       np.zeros((capacidad, dimension_reducida), dtype=np.float32) if dimension_reducida else None,
+                       [], [])
+        segmento.activos = np.zeros(capacidad, dtype=bool)
+        return segmento
+
+    def _crecer(self):
+        capacidad = len(self.activos) * 2
+        for nombre in ('vectores', 'reducidos', 'activos'):
+            actual = getattr(self, nombre)
+            if actual is None:
+                continue
+            nuevo = np.zeros((capacidad,) + actual.shape[1:], dtype=actual.dtype)
+            nuevo[:len(actual)] = actual
+            setattr(self, nombre, nuevo)
+
+    def agregar(self, vector, reducido, producto, registro):
+        if self.total == len(self.activos):
+            self._crecer()
+        fila = self.total
+        self.vectores[fila] = vector
+        if self.reducidos is not None:
+            self.reducidos[fila] = reducido
+        self.activos[fila] = True
+        self.productos.append(producto)
+        self.registros.append(registro)
+        self.total += 1
+        return fila
+
+    # (filas, similitudes) de las fotos activas más parecidas a 'consulta'
+    def comparar(self, consulta, consulta_reducida, candidatos):
+        activos = self.activos[:self.total]
+        if self.reducidos is not None and consulta_reducida is not None and self.total > candidatos:
+            aproximadas = self.reducidos[:self.total] @ consulta_reducida
+            aproximadas[~activos] = -np.inf
+            filas = np.argpartition(-aproximadas, candidatos - 1)[:candidatos]
+            filas = filas[activos[filas]]
+        else:
+            filas = np.flatnonzero(activos)
+        if not len(filas):
+            return filas, np.zeros(0, dtype=np.float32)
+        filas.sort()
+        return filas, np.asarray(self.vectores[filas], dtype=np.float32) @ consulta
+
+
+class MatrizVisual:
+    def __init__(self, base=None, proyeccion=None, version=0):
+        self.proyeccion = proyeccion
+        self.version = version
+        self.version_base = version
+        self.base = base or Segmento.vacio(capacidad=1)
+        self.agregadas = Segmento.vacio(proyeccion[1].shape[1] if proyeccion else None)
+        # registro -> (segmento, fila)
+        self.filas = {}
+        for fila, registro in enumerate(self.base.registros):
+            self.filas[registro] = (self.base, fila)
+
+    def __len__(self):
+        return self.base.total + self.agregadas.total
+
+    def activas(self):
+        return int(self.base.activos[:self.base.total].sum() + self.agregadas.activos[:self.agregadas.total].sum())
+
+    def contiene(self, registro):
+        return registro in self.filas
+
+    def agregar(self, registro, producto, vector):
+        if registro in self.filas:
+            return
+        vector = normalizar_vector(vector)
+        reducido = proyectar(vector[None, :], self.proyeccion)[0] if self.proyeccion else None
+        fila = self.agregadas.agregar(vector.astype(np.float16), reducido, producto, registro)
+        self.filas[registro] = (self.agregadas, fila)
+
+    def cambiar_estado(self, registro, activo):
+        ubicacion = self.filas.get(registro)
+        if ubicacion is not None:
+            segmento, fila = ubicacion
+            segmento.activos[fila] = activo
+
+    # Los 'limite' productos más parecidos, con la mejor similitud de sus fotos
+    def buscar(self, vector, limite=5):
+        consulta = normalizar_vector(vector)
+        consulta_reducida = consulta @ self.proyeccion[1] if self.proyeccion else None
+        candidatos = max(MIN_CANDIDATOS, limite * CANDIDATOS_POR_RESULTADO)
+
+        productos = []
+        similitudes = []
+        for segmento in (self.base, self.agregadas):
+            if not segmento.total:
+                continue
+            filas, valores = segmento.comparar(consulta, consulta_reducida, candidatos)
+            productos.extend(segmento.productos[fila] for fila in filas)
+            similitudes.append(valores)
+        if not productos:
+            return []
+
+        similitudes = np.concatenate(similitudes)
+        resultados = []
+        vistos = set()
+        for posicion in np.argsort(-similitudes, kind='stable'):
+            producto = productos[posicion]
+            if producto in vistos:
+                continue
+            vistos.add(producto)
+            resultados.append({'_id': producto, 'similitud': round(float(similitudes[posicion]), 4)})
+            if len(resultados) == limite:
+                break
+        return resultados
+
+    # Filas activas de ambos segmentos, para escribir una instantánea nueva
+    def exportar(self):
+        vectores, productos, registros = [], [], []
+        for segmento in (self.base, self.agregadas):
+            filas = np.flatnonzero(segmento.activos[:segmento.total])
+            vectores.append(np.asarray(segmento.vectores[filas], dtype=np.float16))
+            productos.extend(segmento.productos[fila] for fila in filas)
+            registros.extend(segmento.registros[fila] for fila in filas)
+        return np.concatenate(vectores) if vectores else np.zeros((0, DIMENSION), dtype=np.float16), productos, registros
+
+
+# Instantánea en disco: un meta.json que apunta a los archivos .npy de la
+# versión vigente. Los archivos llevan versión y pid en el nombre y meta.json
+# se reemplaza al final, así un lector nunca ve una instantánea a medias
+class Instantanea:
+    def __init__(self, ruta=RUTA_EMBEDDINGS):
+        self.ruta = ruta
+
+    def _archivo(self, nombre):
+        return os.path.join(self.ruta, nombre)
+
+    # Candado entre procesos para que un solo worker escriba a la vez
+    def bloquear(self):
+        os.makedirs(self.ruta, exist_ok=True)
+        archivo = open(self._archivo('.candado'), 'w')
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        return archivo
+
+    def leer_meta(self):
+        try:
+            with open(self._archivo('meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cargar(self):
+        meta = self.leer_meta()
+        if meta is None:
+            return None
+        vectores = np.load(self._archivo(meta['vectores']), mmap_mode='r')
+        productos = np.load(self._archivo(meta['productos'])).tolist()
+        registros = np.load(self._archivo(meta['registros'])).tolist()
+        proyeccion = None
+        reducidos = None
+        if meta.get('proyeccion'):
+            with np.load(self._archivo(meta['proyeccion'])) as datos:
+                proyeccion = (datos['media'], datos['componentes'])
+            reducidos = np.load(self._archivo(meta['reducidos']), mmap_mode='r')
+        base = Segmento(vectores, reducidos, productos, registros)
+        return MatrizVisual(base, proyeccion, meta['version'])
+
+    def escribir(self, vectores, productos, registros, version):
+        os.makedirs(self.ruta, exist_ok=True)
+        sufijo = f'{version}-{os.getpid()}'
+        meta = {
+            'version': version,
+            'filas': len(productos),
+            'dimension': DIMENSION,
+            'creada': datetime.now(timezone.utc).isoformat(),
+            'vectores': f'vectores-{sufijo}.npy',
+            'productos': f'productos-{sufijo}.npy',
+            'registros': f'registros-{sufijo}.npy',
+        }
+        np.save(self._archivo(meta['vectores']), np.asarray(vectores, dtype=np.float16))
+        np.save(self._archivo(meta['productos']), np.array(productos, dtype='U24'))
+        np.save(self._archivo(meta['registros']), np.array(registros, dtype='U24'))
+
+        proyeccion = ajustar_proyeccion(vectores)
+        if proyeccion is not None:
+            meta['proyeccion'] = f'proyeccion-{sufijo}.npz'
+            meta['reducidos'] = f'reducidos-{sufijo}.npy'
+            np.savez(self._archivo(meta['proyeccion']), media=proyeccion[0], componentes=proyeccion[1])
+            np.save(self._archivo(meta['reducidos']), proyectar(vectores, proyeccion))
+
+        temporal = self._archivo(f'meta-{sufijo}.json')
+        with open(temporal, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temporal, self._archivo('meta.json'))
+        self._limpiar(meta)
+        return meta
+
+    # Borrar los archivos de instantáneas anteriores. Los workers que todavía
+    # los tienen mapeados siguen leyéndolos hasta cerrarlos
+    def _limpiar(self, meta):
+        vigentes = {valor for valor in meta.values() if isinstance(valor, str)}
+        for nombre in os.listdir(self.ruta):
+            if nombre.endswith(('.npy', '.npz')) and nombre not in vigentes:
+                try:
+                    os.remove(self._archivo(nombre))
+                except OSError:
+                    pass
+
+
+class IndiceVisual:
+    def __init__(self, embeddings_collection, versiones_collection, ruta=RUTA_EMBEDDINGS, intervalo_version=1.0):
+        self.embeddings = embeddings_collection
+        self.versiones = versiones_collection
+        self.instantanea = Instantanea(ruta)
+        self.intervalo_version = intervalo_version
+        self._matriz = None
+        self._version = None
+        self._revisado = 0
+        self._candado = threading.Lock()
+        self._candado_carga = threading.Lock()
+        self._escribiendo = False
+        self._sincronizaciones = 0
+        self._instantaneas = 0
+        self._segundos_ultima_busqueda = 0.0
+
+    def _leer_version(self):
+        documento = self.versiones.find_one({'_id': 'embeddings_productos'})
+        return documento['v'] if documento else 0
+
+    def _incrementar_version(self):
+        documento = self.versiones.find_one_and_update(
+            {'_id': 'embeddings_productos'}, {'$inc': {'v': 1}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        return documento['v']
+
+    # Instantánea inicial desde la colección (solo fotos activas)
+    def _armar_desde_coleccion(self):
+        version = self._leer_version()
+        vectores, productos, registros = [], [], []
+        for documento in self.embeddings.find({'activo': True}, {'producto': 1, 'vector': 1}, batch_size=2000):
+            vectores.append(np.frombuffer(documento['vector'], dtype=np.float16))
+            productos.append(str(documento['producto']))
+            registros.append(str(documento['_id']))
+        vectores = np.stack(vectores) if vectores else np.zeros((0, DIMENSION), dtype=np.float16)
+        self.instantanea.escribir(vectores, productos, registros, version)
+        self._instantaneas += 1
+
+    def _cargar(self):
+        with self.instantanea.bloquear():
+            matriz = self.instantanea.cargar()
+            if matriz is None:
+                self._armar_desde_coleccion()
+                matriz = self.instantanea.cargar()
+        self._sincronizar(matriz, matriz.version)
+        with self._candado:
+            self._matriz = matriz
+
+    # Aplicar a 'matriz' los cambios guardados con versión mayor a 'desde'
+    def _sincronizar(self, matriz, desde):
+        version = self._leer_version()
+        cambios = list(self.embeddings.find({'v': {'$gt': desde - MARGEN_VERSIONES}}, {'producto': 1, 'activo': 1}))
+        # Los vectores solo se leen para las fotos nuevas
+        nuevos = [c['_id'] for c in cambios if c['activo'] and not matriz.contiene(str(c['_id']))]
+        vectores = {}
+        if nuevos:
+            vectores = {d['_id']: d['vector'] for d in self.embeddings.find({'_id': {'$in': nuevos}}, {'vector': 1})}
+
+        with self._candado:
+            for cambio in cambios:
+                registro = str(cambio['_id'])
+                if cambio['_id'] in vectores:
+                    matriz.agregar(registro, str(cambio['producto']), np.frombuffer(vectores[cambio['_id']], dtype=np.float16))
+                matriz.cambiar_estado(registro, cambio['activo'])
+            matriz.version = max(matriz.version, version)
+            self._version = matriz.version
+            self._sincronizaciones += 1
+
+    def _asegurar(self):
+        if self._matriz is None:
+            with self._candado_carga:
+                if self._matriz is None:
+                    self._cargar()
+            return
+
+        ahora = time.monotonic()
+        if ahora - self._revisado < self.intervalo_version:
+            return
+        self._revisado = ahora
+        if self._leer_version() != self._version:
+            with self._candado_carga:
+                self._sincronizar(self._matriz, self._matriz.version)
+        if self._matriz.agregadas.total > MAX_PENDIENTES and not self._escribiendo:
+            self._escribiendo = True
+            threading.Thread(target=self._renovar_instantanea, name='indice-visual', daemon=True).start()
+
+    # Pasar las filas en memoria a una instantánea nueva. Si otro worker ya
+    # escribió una más reciente, se carga esa
+    def _renovar_instantanea(self):
+        try:
+            with self.instantanea.bloquear():
+                meta = self.instantanea.leer_meta()
+                if meta is None or meta['version'] <= self._matriz.version_base:
+                    with self._candado:
+                        vectores, productos, registros = self._matriz.exportar()
+                        version = self._matriz.version
+                    self.instantanea.escribir(vectores, productos, registros, version)
+                    self._instantaneas += 1
+                matriz = self.instantanea.cargar()
+            with self._candado_carga:
+                self._sincronizar(matriz, matriz.version)
+                with self._candado:
+                    self._matriz = matriz
+        except Exception:
+            pass
+        finally:
+            self._escribiendo = False
+
+    # Cargar la instantánea en segundo plano al arrancar el worker (EMBEDDINGS_PRECARGA)
+    def precargar(self):
+        def cargar():
+            try:
+                self._asegurar()
+            except Exception:
+                pass
+        threading.Thread(target=cargar, name='indice-visual', daemon=True).start()
+
+    def buscar(self, vector, limite=5):
+        self._asegurar()
+        inicio = time.perf_counter()
+        with self._candado:
+            resultados = self._matriz.buscar(vector, limite)
+        self._segundos_ultima_busqueda = time.perf_counter() - inicio
+        return resultados
+
+    # Guardar las fotos de referencia de un producto. 'vectores' son los
+    # embeddings que devuelve cliente_vision.embeddings
+    def agregar(self, producto_id, vectores, activo=True):
+        version = self._incrementar_version()
+        creado = datetime.now(timezone.utc)
+        documentos = [{
+            'producto': ObjectId(producto_id),
+            'vector': Binary(normalizar_vector(vector).astype(np.float16).tobytes()),
+            'activo': activo,
+            'v': version,
+            'creado': creado,
+        } for vector in vectores]
+        self.embeddings.insert_many(documentos)
+        # Los demás workers sincronizan al ver el cambio de versión
+        self._incrementar_version()
+
+        with self._candado:
+            if self._matriz is not None:
+                for documento in documentos:
+                    registro = str(documento['_id'])
+                    self._matriz.agregar(registro, str(documento['producto']), np.frombuffer(documento['vector'], dtype=np.float16))
+                    self._matriz.cambiar_estado(registro, activo)
+        return [str(documento['_id']) for documento in documentos]
+
+    # Anulación y reactivación del producto; 'eliminar' borra sus fotos de la
+    # búsqueda de forma permanente
+    def cambiar_estado(self, producto_id, activo, eliminar=False):
+        filtro = {'producto': ObjectId(producto_id)}
+        if not eliminar:
+            filtro['eliminada'] = {'$ne': True}
+        registros = [d['_id'] for d in self.embeddings.find(filtro, {'_id': 1})]
+        if not registros:
+            return 0
+
+        cambios = {'activo': activo, 'v': self._incrementar_version()}
+        if eliminar:
+            cambios['eliminada'] = True
+        self.embeddings.update_many({'_id': {'$in': registros}}, {'$set': cambios})
+        self._incrementar_version()
+
+        with self._candado:
+            if self._matriz is not None:
+                for registro in registros:
+                    self._matriz.cambiar_estado(str(registro), activo)
+        return len(registros)
+
+    def eliminar_fotos(self, producto_id):
+        return self.cambiar_estado(producto_id, False, eliminar=True)
+
+    def metricas(self):
+        matriz = self._matriz
+        return {
+            'fotos': len(matriz) if matriz else 0,
+            'fotosActivas': matriz.activas() if matriz else 0,
+            'enMemoria': matriz.agregadas.total if matriz else 0,
+            'dimensionReducida': matriz.proyeccion[1].shape[1] if matriz and matriz.proyeccion else None,
+            'version': self._version,
+            'sincronizaciones': self._sincronizaciones,
+            'instantaneasEscritas': self._instantaneas,
+            'msUltimaBusqueda': round(self._segundos_ultima_busqueda * 1000, 3),
+        }
+
+
+def reconstruir(db, ruta=RUTA_EMBEDDINGS):
+    indice = IndiceVisual(db['embeddings_productos'], db['versiones'], ruta)
+    with indice.instantanea.bloquear():
+        indice._armar_desde_coleccion()
+    return indice.instantanea.leer_meta()
+
+
+# Tiempo de búsqueda con vectores sintéticos (sin base de datos ni modelo)
+def medir(productos, fotos_por_producto=1, consultas=200, limite=5):
+    rng = np.random.default_rng(0)
+    total = productos * fotos_por_producto
+    # Vectores no negativos y correlacionados, como las salidas de MobileNetV2
+    factores = rng.standard_normal((64, DIMENSION)).astype(np.float32)
+    vectores = np.empty((total, DIMENSION), dtype=np.float16)
+    for inicio in range(0, total, 8192):
+        parte = np.maximum(rng.standard_normal((min(8192, total - inicio), 64)).astype(np.float32) @ factores, 0)
+        parte /= np.linalg.norm(parte, axis=1, keepdims=True) + 1e-6
+        vectores[inicio:inicio + len(parte)] = parte
+    ids = [str(ObjectId()) for _ in range(productos)]
+    productos_fila = [ids[i // fotos_por_producto] for i in range(total)]
+
+    proyeccion = ajustar_proyeccion(vectores)
+    base = Segmento(vectores, proyectar(vectores, proyeccion) if proyeccion else None,
+                    productos_fila, [str(i) for i in range(total)])
+    matriz = MatrizVisual(base, proyeccion)
+
+    tiempos = []
+    for i in range(consultas):
+        consulta = vectores[rng.integers(total)].astype(np.float32) + 0.05 * rng.standard_normal(DIMENSION).astype(np.float32)
+        inicio = time.perf_counter()
+        matriz.buscar(consulta, limite)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'fotos': total,
+        'dimensionReducida': proyeccion[1].shape[1] if proyeccion else None,
+        'p50Ms': round(float(np.percentile(tiempos, 50)), 3),
+        'p95Ms': round(float(np.percentile(tiempos, 95)), 3),
+        'p99Ms': round(float(np.percentile(tiempos, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de coincidencias visuales de productos.')
+    parser.add_argument('comando', choices=('reconstruir', 'medir'))
+    parser.add_argument('--productos', type=int, default=50000, help='Solo para medir.')
+    parser.add_argument('--fotos', type=int, default=1, help='Fotos por producto (solo para medir).')
+    args = parser.parse_args()
+
+    if args.comando == 'medir':
+        print(json.dumps(medir(args.productos, args.fotos), indent=2))
+        return 0
+
+    from conexion import ConexionMongo
+    print(json.dumps(reconstruir(ConexionMongo.desde_entorno().db), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
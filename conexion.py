@@ -0,0 +1,272 @@
+import os
+import time
+import threading
+
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+
+# Conexión a MongoDB por proceso.
+#
+# MongoClient no es seguro a través de fork(): gunicorn importa app.py en el
+# proceso maestro y luego crea los workers. Por eso aquí no se conecta al
+# importar; el cliente se crea en el primer uso dentro de cada proceso y se
+# vuelve a crear si cambia el pid. 'db' y las colecciones que entrega este
+# módulo son envolturas que resuelven el cliente del proceso actual en cada
+# llamada, así el resto del código las usa como colecciones normales.
+#
+# Configuración (variables de entorno):
+#   MONGO_URI                     cadena de conexión, obligatoria (mongomock:// usa mongomock, para pruebas)
+#   MONGO_DB                      nombre de la base de datos
+#   MONGO_POOL_MAX / MONGO_POOL_MIN
+#   MONGO_ESPERA_POOL_MS          espera máxima por una conexión libre del pool
+#   MONGO_TIMEOUT_SELECCION_MS    serverSelectionTimeoutMS
+#   MONGO_TIMEOUT_CONEXION_MS     connectTimeoutMS
+#   MONGO_TIMEOUT_SOCKET_MS       socketTimeoutMS
+#   MONGO_LECTURA_LISTADOS        preferencia de lectura de los listados (primary, secondaryPreferred, ...)
+#   MONGO_LECTURA_MAX_DESFASE     maxStalenessSeconds para las lecturas en secundarios (mínimo 90)
+
+BASE_POR_DEFECTO = 'nombre_base_datos'
+
+PREFERENCIAS_LECTURA = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+BUCKETS_ESPERA_POOL_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+def preferencia_lectura(nombre, max_desfase=-1):
+    if nombre not in PREFERENCIAS_LECTURA:
+        raise ValueError(f"Preferencia de lectura desconocida: '{nombre}'.")
+    if nombre == 'primary':
+        return Primary()
+    return PREFERENCIAS_LECTURA[nombre](max_staleness=max_desfase)
+
+
+# Registra cuánto espera cada petición por una conexión del pool
+class MonitorPool(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._inicio = threading.local()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._candado:
+            self.esperas = 0
+            self.espera_total_ms = 0.0
+            self.espera_maxima_ms = 0.0
+            self.buckets = [0] * (len(BUCKETS_ESPERA_POOL_MS) + 1)
+            self.fallos = 0
+            self.en_uso = 0
+            self.abiertas = 0
+            self.limpiezas = 0
+
+    def _registrar_espera(self, espera_ms):
+        with self._candado:
+            self.esperas += 1
+            self.espera_total_ms += espera_ms
+            self.espera_maxima_ms = max(self.espera_maxima_ms, espera_ms)
+            for i, limite in enumerate(BUCKETS_ESPERA_POOL_MS):
+                if espera_ms <= limite:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def connection_check_out_started(self, event):
+        self._inicio.valor = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        duracion = getattr(event, 'duration', None)
+        if duracion is None:
+            inicio = getattr(self._inicio, 'valor', None)
+            duracion = time.perf_counter() - inicio if inicio is not None else 0.0
+        self._registrar_espera(duracion * 1000)
+        with self._candado:
+            self.en_uso += 1
+
+    def connection_check_out_failed(self, event):
+        with self._candado:
+            self.fallos += 1
+
+    def connection_checked_in(self, event):
+        with self._candado:
+            self.en_uso = max(self.en_uso - 1, 0)
+
+    def connection_created(self, event):
+        with self._candado:
+            self.abiertas += 1
+
+    def connection_closed(self, event):
+        with self._candado:
+            self.abiertas = max(self.abiertas - 1, 0)
+
+    def pool_cleared(self, event):
+        with self._candado:
+            self.limpiezas += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def metricas(self):
+        with self._candado:
+            etiquetas = [f'<={b}' for b in BUCKETS_ESPERA_POOL_MS] + [f'>{BUCKETS_ESPERA_POOL_MS[-1]}']
+            return {
+                'esperas': self.esperas,
+                'esperaPromedioMs': self.espera_total_ms / self.esperas if self.esperas else 0,
+                'esperaMaximaMs': self.espera_maxima_ms,
+                'esperaPoolMs': dict(zip(etiquetas, self.buckets)),
+                'fallosCheckout': self.fallos,
+                'conexionesEnUso': self.en_uso,
+                'conexionesAbiertas': self.abiertas,
+                'limpiezasPool': self.limpiezas,
+            }
+
+
+class ConexionMongo:
+    def __init__(self, uri, nombre_base=BASE_POR_DEFECTO, opciones=None,
+                 lectura_listados='primary', max_desfase=-1, fabrica_cliente=None):
+        self.uri = uri
+        self.nombre_base = nombre_base
+        self.opciones = dict(opciones or {})
+        self.lectura_listados = preferencia_lectura(lectura_listados, max_desfase)
+        self.fabrica_cliente = fabrica_cliente
+        self.monitor = MonitorPool()
+        self.monitores = []
+        self._candado = threading.Lock()
+        self._cliente = None
+        self._pid = None
+        self.db = BaseDatosProceso(self)
+
+    @classmethod
+    def desde_entorno(cls, fabrica_cliente=None):
+        # Sin valor por defecto: las credenciales no van en el código
+        uri = os.environ.get('MONGO_URI')
+        if not uri:
+            raise RuntimeError('Falta la variable de entorno MONGO_URI con la cadena de conexión a MongoDB.')
+        opciones = {
+            'maxPoolSize': int(os.environ.get('MONGO_POOL_MAX', 50)),
+            'minPoolSize': int(os.environ.get('MONGO_POOL_MIN', 0)),
+            'waitQueueTimeoutMS': int(os.environ.get('MONGO_ESPERA_POOL_MS', 2000)),
+            'serverSelectionTimeoutMS': int(os.environ.get('MONGO_TIMEOUT_SELECCION_MS', 5000)),
+            'connectTimeoutMS': int(os.environ.get('MONGO_TIMEOUT_CONEXION_MS', 5000)),
+            'socketTimeoutMS': int(os.environ.get('MONGO_TIMEOUT_SOCKET_MS', 30000)),
+        }
+        return cls(
+            uri=uri,
+            nombre_base=os.environ.get('MONGO_DB', BASE_POR_DEFECTO),
+            opciones=opciones,
+            lectura_listados=os.environ.get('MONGO_LECTURA_LISTADOS', 'primary'),
+            max_desfase=int(os.environ.get('MONGO_LECTURA_MAX_DESFASE', -1)),
+            fabrica_cliente=fabrica_cliente,
+        )
+
+    def _crear_cliente(self):
+        if self.fabrica_cliente is not None:
+            return self.fabrica_cliente()
+        if self.uri.startswith('mongomock://'):
+            # Base en memoria para pruebas locales (requiere mongomock)
+            import mongomock
+            return mongomock.MongoClient()
+        return MongoClient(self.uri, event_listeners=[self.monitor] + self.monitores, **self.opciones)
+
+    # Listeners de pymongo adicionales (p. ej. instrumentacion.MonitorComandos);
+    # se aplican a los clientes que se creen después
+    def agregar_monitor(self, listener):
+        self.monitores.append(listener)
+
+    # Cliente del proceso actual; se crea después del fork, en el primer uso
+    def cliente(self):
+        pid = os.getpid()
+        if self._cliente is None or self._pid != pid:
+            with self._candado:
+                if self._cliente is None or self._pid != pid:
+                    # El cliente heredado del proceso padre no se cierra aquí:
+                    # sus sockets siguen siendo del padre
+                    self._cliente = self._crear_cliente()
+                    self._pid = pid
+                    self.monitor.reiniciar()
+        return self._cliente
+
+    def base_datos(self):
+        return self.cliente()[self.nombre_base]
+
+    def coleccion(self, nombre):
+        return ColeccionProceso(self, nombre)
+
+    # Colección para los listados, con la preferencia de lectura configurada
+    def coleccion_lectura(self, nombre):
+        return ColeccionProceso(self, nombre, {'read_preference': self.lectura_listados})
+
+    def cerrar(self):
+        with self._candado:
+            if self._cliente is not None and self._pid == os.getpid():
+                self._cliente.close()
+            self._cliente = None
+            self._pid = None
+
+    def salud(self):
+        inicio = time.perf_counter()
+        try:
+            self.cliente().admin.command('ping')
+            estado = 'ok'
+            error = None
+        except Exception as e:
+            estado = 'error'
+            error = str(e)
+        resultado = {
+            'estado': estado,
+            'pingMs': (time.perf_counter() - inicio) * 1000,
+            'pool': self.monitor.metricas(),
+            'lecturaListados': self.lectura_listados.mongos_mode,
+        }
+        if error:
+            resultado['error'] = error
+        return resultado
+
+
+# Envolturas que resuelven la base y las colecciones del proceso actual
+class BaseDatosProceso:
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def __getitem__(self, nombre):
+        return ColeccionProceso(self._conexion, nombre)
+
+    def __getattr__(self, atributo):
+        return getattr(self._conexion.base_datos(), atributo)
+
+
+class ColeccionProceso:
+    def __init__(self, conexion, nombre, opciones=None):
+        self._conexion = conexion
+        self._nombre = nombre
+        self._opciones = opciones
+        self._cliente = None
+        self._coleccion = None
+
+    def _actual(self):
+        # El cliente cambia después de un fork; se vuelve a resolver la colección
+        cliente = self._conexion.cliente()
+        if self._cliente is not cliente:
+            coleccion = cliente[self._conexion.nombre_base][self._nombre]
+            if self._opciones:
+                coleccion = coleccion.with_options(**self._opciones)
+            self._coleccion = coleccion
+            self._cliente = cliente
+        return self._coleccion
+
+    def __getattr__(self, atributo):
+        return getattr(self._actual(), atributo)
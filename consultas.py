@@ -0,0 +1,139 @@
+import os
+from urllib.parse import urlencode
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from flask import jsonify
+
+# Soporte común de consultas para los endpoints de listado:
+#   ?limit=50&after=<cursor>   paginación por _id (keyset), tiempo constante por página
+#   ?fields=nombre,precioVenta proyección de campos (_id siempre se incluye)
+#   ?estado=activo&Categoria=X filtros sobre campos indexados permitidos por endpoint
+#   ?desde=2024-01-01&hasta=2024-12-31 rango sobre el campo de fecha del endpoint
+#
+# El cuerpo sigue siendo una lista JSON; el cursor de la página siguiente va en
+# la cabecera X-Siguiente-Cursor (y en Link rel="next").
+#
+# Todos los listados se paginan: sin 'limit' se devuelven LIMITE_POR_DEFECTO
+# documentos y nunca más de LIMITE_MAXIMO. El resto se pide con el cursor.
+#
+# CAMBIO INCOMPATIBLE: antes, sin 'limit' ni 'after' se devolvía la lista
+# completa. Para que un cliente anterior no pierda datos sin enterarse, si una
+# petición sin 'limit' ni 'after' no entra en LIMITE_POR_DEFECTO se responde
+# 206 con un objeto en lugar de la lista:
+#   {"datos": [...], "siguiente": "<cursor>", "truncado": true}
+# Los clientes que paginan (mandan 'limit' o siguen el cursor con 'after')
+# reciben siempre la lista y las cabeceras.
+LIMITE_MAXIMO = max(int(os.environ.get('LISTADO_LIMITE_MAXIMO', 1000)), 1)
+LIMITE_POR_DEFECTO = min(max(int(os.environ.get('LISTADO_LIMITE_POR_DEFECTO', 100)), 1), LIMITE_MAXIMO)
+
+
+class ParametrosInvalidos(Exception):
+    pass
+
+
+def leer_limite(args):
+    valor = args.get('limit')
+    if valor is None or valor == '':
+        return LIMITE_POR_DEFECTO
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise ParametrosInvalidos("El parámetro 'limit' debe ser un entero.")
+    if limite <= 0:
+        raise ParametrosInvalidos("El parámetro 'limit' debe ser mayor que cero.")
+    return min(limite, LIMITE_MAXIMO)
+
+
+# 'ocultos' son campos internos que no se devuelven aunque se pidan en ?fields=
+def leer_proyeccion(args, ocultos=()):
+    valor = args.get('fields')
+    if not valor:
+        return {campo: 0 for campo in ocultos} or None
+    campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+    if any(campo.startswith('$') for campo in campos):
+        raise ParametrosInvalidos("El parámetro 'fields' contiene un campo inválido.")
+    return {campo: 1 for campo in campos if campo.split('.')[0] not in ocultos} or {'_id': 1}
+
+
+# Armar el filtro de Mongo a partir de los parámetros de la URL
+def construir_filtro(args, filtro_base=None, filtros=(), campo_fecha=None):
+    filtro = dict(filtro_base or {})
+
+    for campo in filtros:
+        valor = args.get(campo)
+        if valor is not None and campo not in filtro:
+            filtro[campo] = valor
+
+    if campo_fecha:
+        rango = {}
+        if args.get('desde'):
+            rango['$gte'] = args['desde']
+        if args.get('hasta'):
+            rango['$lte'] = args['hasta']
+        if rango:
+            filtro[campo_fecha] = rango
+
+    after = args.get('after')
+    if after:
+        try:
+            filtro['_id'] = {'$gt': ObjectId(after)}
+        except (InvalidId, TypeError):
+            raise ParametrosInvalidos("El parámetro 'after' no es un cursor válido.")
+
+    return filtro
+
+
+def serializar(documento):
+    documento['_id'] = str(documento['_id'])
+    return documento
+
+
+# Ejecutar la consulta paginada. Devuelve los documentos y el cursor siguiente
+def paginar(collection, args, filtro_base=None, filtros=(), campo_fecha=None, ocultos=()):
+    filtro = construir_filtro(args, filtro_base, filtros, campo_fecha)
+    limite = leer_limite(args)
+
+    # Siempre ordenado por _id, así el cursor 'after' recorre las páginas sin
+    # saltear ni repetir documentos. Se pide uno de más para saber si hay otra página
+    documentos = list(collection.find(filtro, leer_proyeccion(args, ocultos)).sort('_id', 1).limit(limite + 1))
+    siguiente = None
+    if len(documentos) > limite:
+        documentos = documentos[:limite]
+        siguiente = str(documentos[-1]['_id'])
+    return [serializar(d) for d in documentos], siguiente
+
+
+# El cliente pidió una página (y lee el cursor de las cabeceras)
+def pide_paginacion(args):
+    return bool(args.get('limit') or args.get('after'))
+
+
+def cabeceras_paginacion(args, url, siguiente):
+    if not siguiente:
+        return {}
+    parametros = args.to_dict()
+    parametros['after'] = siguiente
+    parametros.setdefault('limit', str(leer_limite(args)))
+    return {
+        'X-Siguiente-Cursor': siguiente,
+        'Link': f'<{url}?{urlencode(parametros)}>; rel="next"',
+    }
+
+
+# Respuesta de listado con la cabecera del cursor siguiente
+def responder_lista(collection, args, url, filtro_base=None, filtros=(), campo_fecha=None, ocultos=()):
+    try:
+        documentos, siguiente = paginar(collection, args, filtro_base, filtros, campo_fecha, ocultos)
+    except ParametrosInvalidos as e:
+        return jsonify({'error': str(e)}), 400
+
+    if siguiente and not pide_paginacion(args):
+        # Lista recortada que el cliente no pidió paginar: ver CAMBIO INCOMPATIBLE arriba
+        respuesta = jsonify({'datos': documentos, 'siguiente': siguiente, 'truncado': True})
+        codigo = 206
+    else:
+        respuesta = jsonify(documentos)
+        codigo = 200
+    respuesta.headers.update(cabeceras_paginacion(args, url, siguiente))
+    return respuesta, codigo
@@ -0,0 +1,124 @@
+import io
+import os
+import queue
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Etapa de decodificación de imágenes subidas. Solo usa Pillow y NumPy, así
+# app.py puede rechazar subidas inválidas sin cargar la pila de visión
+
+LIMITE_BYTES = int(os.environ.get('IMAGEN_LIMITE_BYTES', 10 * 1024 * 1024))
+LIMITE_PIXELES = int(os.environ.get('IMAGEN_LIMITE_PIXELES', 50_000_000))
+TAMANO_MODELO = (224, 224)
+BLOQUE_LECTURA = 64 * 1024
+
+# Firmas de los formatos aceptados
+FIRMAS = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+)
+
+
+class ImagenInvalida(Exception):
+    pass
+
+
+class ImagenDemasiadoGrande(ImagenInvalida):
+    pass
+
+
+# Leer el archivo subido por bloques, cortando apenas supera el límite
+def leer_subida(archivo, limite=LIMITE_BYTES):
+    partes = []
+    total = 0
+    while True:
+        bloque = archivo.read(BLOQUE_LECTURA)
+        if not bloque:
+            break
+        total += len(bloque)
+        if total > limite:
+            raise ImagenDemasiadoGrande(f'La imagen supera el límite de {limite // (1024 * 1024)} MB.')
+        partes.append(bloque)
+    return b''.join(partes)
+
+
+def detectar_formato(datos):
+    for firma, formato in FIRMAS:
+        if datos.startswith(firma):
+            return formato
+    if datos[:4] == b'RIFF' and datos[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+# Validar firma, tamaño y dimensiones leyendo solo la cabecera de la imagen
+def validar_imagen(datos, limite=LIMITE_BYTES):
+    if not datos:
+        raise ImagenInvalida('La imagen está vacía.')
+    if len(datos) > limite:
+        raise ImagenDemasiadoGrande(f'La imagen supera el límite de {limite // (1024 * 1024)} MB.')
+    if detectar_formato(datos) is None:
+        raise ImagenInvalida('El archivo no es una imagen JPEG, PNG, GIF, BMP o WEBP.')
+
+    try:
+        img = Image.open(io.BytesIO(datos))
+    except Exception:
+        raise ImagenInvalida('No se pudo leer la cabecera de la imagen.')
+    ancho, alto = img.size
+    if ancho * alto > LIMITE_PIXELES:
+        raise ImagenDemasiadoGrande(f'La imagen tiene demasiados píxeles ({ancho}x{alto}).')
+    return img
+
+
+# Decodificar la imagen a RGB del tamaño del modelo. En JPEG se usa el modo
+# draft, que decodifica directamente a 1/2, 1/4 o 1/8 de la resolución
+def decodificar(datos, tamano=TAMANO_MODELO):
+    img = validar_imagen(datos)
+    if img.format == 'JPEG':
+        img.draft('RGB', tamano)
+
+    try:
+        img = ImageOps.exif_transpose(img)
+    except Exception:
+        # EXIF corrupto: se usa la imagen tal cual
+        pass
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != tamano:
+        img = img.resize(tamano, Image.BILINEAR)
+    return img
+
+
+# Pool de buffers float32 preasignados para las imágenes en espera de lote
+class PoolBuffers:
+    def __init__(self, forma=TAMANO_MODELO + (3,), tamano=64):
+        self.forma = forma
+        self.tamano = tamano
+        self._libres = queue.LifoQueue()
+        for _ in range(tamano):
+            self._libres.put(np.empty(forma, dtype=np.float32))
+
+    def tomar(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            return np.empty(self.forma, dtype=np.float32)
+
+    def devolver(self, buffer):
+        # Los buffers extra creados en picos de carga se descartan
+        if self._libres.qsize() < self.tamano:
+            self._libres.put(buffer)
+
+
+# Escribir la imagen en el buffer con el preprocesamiento de MobileNetV2
+# (escala [0, 255] -> [-1, 1]), sin arreglos intermedios
+def a_buffer(img, buffer):
+    np.copyto(buffer, np.asarray(img), casting='unsafe')
+    buffer *= 1.0 / 127.5
+    buffer -= 1.0
+    return buffer
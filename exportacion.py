@@ -0,0 +1,80 @@
+import os
+import json
+
+from flask import Response, stream_with_context, jsonify
+
+from consultas import construir_filtro, leer_proyeccion, ParametrosInvalidos
+
+# Exportación en streaming: el cursor de pymongo se recorre por lotes y la
+# respuesta se escribe a medida, sin armar la lista completa en memoria.
+#   ?formato=ndjson (por defecto) un documento JSON por línea
+#   ?formato=json              un arreglo JSON escrito por partes
+
+TAMANO_LOTE_CURSOR = int(os.environ.get('EXPORTACION_BATCH_SIZE', 1000))
+TAMANO_BLOQUE_RESPUESTA = 64 * 1024
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def documento_a_json(documento):
+    documento['_id'] = str(documento['_id'])
+    return json.dumps(documento, ensure_ascii=False, default=str)
+
+
+# Agrupar las líneas en bloques de ~64 KB para no escribir un chunk por documento
+def agrupar_en_bloques(partes):
+    bloque = []
+    tamano = 0
+    for parte in partes:
+        bloque.append(parte)
+        tamano += len(parte)
+        if tamano >= TAMANO_BLOQUE_RESPUESTA:
+            yield ''.join(bloque)
+            bloque = []
+            tamano = 0
+    if bloque:
+        yield ''.join(bloque)
+
+
+def generar_ndjson(cursor):
+    for documento in cursor:
+        yield documento_a_json(documento) + '\n'
+
+
+def generar_arreglo_json(cursor):
+    yield '['
+    separador = ''
+    for documento in cursor:
+        yield separador + documento_a_json(documento)
+        separador = ','
+    yield ']\n'
+
+
+def exportar(collection, args, nombre_archivo, filtros=(), campo_fecha=None, ocultos=()):
+    formato = args.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return jsonify({'error': "El parámetro 'formato' debe ser 'ndjson' o 'json'."}), 400
+    try:
+        filtro = construir_filtro(args, filtros=filtros, campo_fecha=campo_fecha)
+        proyeccion = leer_proyeccion(args, ocultos)
+    except ParametrosInvalidos as e:
+        return jsonify({'error': str(e)}), 400
+
+    cursor = collection.find(filtro, proyeccion, batch_size=TAMANO_LOTE_CURSOR).sort('_id', 1)
+    generador = generar_ndjson(cursor) if formato == 'ndjson' else generar_arreglo_json(cursor)
+
+    def cuerpo():
+        try:
+            yield from agrupar_en_bloques(generador)
+        finally:
+            cursor.close()
+
+    extension = 'ndjson' if formato == 'ndjson' else 'json'
+    return Response(
+        stream_with_context(cuerpo()),
+        mimetype=FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename={nombre_archivo}.{extension}'}
+    )
@@ -0,0 +1,72 @@
+import os
+import multiprocessing
+
+# Configuración de gunicorn para servir con concurrencia (start.sh la usa con
+# 'gunicorn -c gunicorn.conf.py app:app').
+#
+# Modos (GUNICORN_CLASE):
+#   gthread (por defecto)  cada worker atiende 'threads' peticiones a la vez.
+#       Las consultas a MongoDB y la espera por el modelo liberan el GIL, así
+#       que un reconocimiento lento o un GET /compras grande ya no bloquean al
+#       resto. El reconocimiento corre en un ejecutor acotado
+#       (VISION_CONCURRENCIA, VISION_COLA, VISION_PLAZO_S en cliente_vision.py).
+#   gevent  solo con VISION_MODO=remoto: TensorFlow no es compatible con el
+#       monkey-patching, así que el modelo tiene que vivir en vision_worker.py.
+#       Requiere el paquete gevent.
+#   sync  el modo anterior, un hilo por worker.
+#
+# Cantidad de workers (GUNICORN_WORKERS para fijarla):
+#   - VISION_MODO=remoto: 2 * núcleos + 1, los workers no cargan el modelo.
+#   - VISION_MODO=local: cada worker carga su propia copia del modelo (varios
+#     cientos de MB), así que se usa la mitad de los núcleos.
+#
+# Plazos: 'timeout' es solo el límite para reiniciar un worker colgado. Los
+# plazos por ruta se aplican dentro de la aplicación (plazos.py para MongoDB,
+# VISION_PLAZO_S para el reconocimiento).
+#
+# Rendimiento: las peticiones por segundo sostenidas de estas configuraciones
+# NO están medidas todavía; no se midió contra un despliegue con MongoDB y el
+# modelo cargado. Para medirlas:
+#   python scripts/carga_mixta.py --url http://localhost:5000 --duracion 60 --clientes 32 --imagen foto.jpg
+# o, para guardar el resultado y compararlo entre commits,
+#   python scripts/benchmark.py correr --destino url --url http://localhost:5000
+
+nucleos = multiprocessing.cpu_count()
+vision_remota = os.environ.get('VISION_MODO', 'local') == 'remoto'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+worker_class = os.environ.get('GUNICORN_CLASE', 'gthread')
+if worker_class == 'gevent' and not vision_remota:
+    # Con el modelo dentro del worker gevent no es seguro; se usan hilos
+    worker_class = 'gthread'
+
+if 'GUNICORN_WORKERS' in os.environ:
+    workers = int(os.environ['GUNICORN_WORKERS'])
+elif vision_remota:
+    workers = 2 * nucleos + 1
+else:
+    workers = max(1, nucleos // 2)
+
+# Con el control de admisión (admision.py) hacen falta hilos para que todas
+# las clases puedan tener sus peticiones en curso y en espera a la vez, más
+# algunos para las rutas que no pasan por el control (/health)
+if 'GUNICORN_HILOS' in os.environ:
+    threads = int(os.environ['GUNICORN_HILOS'])
+elif os.environ.get('ADMISION', '1') != '0':
+    from admision import hilos_necesarios
+    threads = hilos_necesarios() + 2
+else:
+    threads = 8
+worker_connections = int(os.environ.get('GUNICORN_CONEXIONES', 1000))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Reiniciar los workers cada tanto acota el crecimiento de memoria de TensorFlow
+max_requests = int(os.environ.get('GUNICORN_MAX_PETICIONES', 0))
+max_requests_jitter = max_requests // 10
+
+# La aplicación se importa en cada worker, después del fork
+preload_app = False
@@ -0,0 +1,184 @@
+import os
+import csv
+import json
+import codecs
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Importación masiva de filas desde un archivo CSV o NDJSON.
+#
+# El archivo se lee por partes y se escribe en lotes de TAMANO_LOTE:
+#   - modo 'insertar': insert_many(ordered=False); las filas que fallan
+#     (p. ej. clave duplicada) no detienen al resto del lote
+#   - modo 'upsert': un UpdateOne con upsert por fila, usando el campo clave,
+#     así volver a importar el mismo archivo no duplica documentos
+# El reporte indica cuántas filas se escribieron y el error de cada fila rechazada.
+# Si el archivo deja de ser UTF-8 válido a mitad de camino la importación se
+# corta ahí: las filas anteriores ya quedaron escritas y se lanza
+# CodificacionInvalida con el reporte parcial para que el cliente sepa cuáles.
+
+TAMANO_LOTE = int(os.environ.get('IMPORTACION_TAMANO_LOTE', 500))
+MAX_ERRORES_REPORTADOS = 1000
+
+TIPOS_CONTENIDO = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+
+class FormatoInvalido(Exception):
+    pass
+
+
+class CodificacionInvalida(Exception):
+    def __init__(self, fila, reporte):
+        super().__init__(f'El archivo no es UTF-8 válido a partir de la fila {fila}; '
+                         'las filas anteriores se importaron (ver el reporte).')
+        self.fila = fila
+        self.reporte = reporte
+
+
+def detectar_formato(formato, nombre_archivo, tipo_contenido):
+    if formato:
+        if formato not in ('csv', 'ndjson'):
+            raise FormatoInvalido("El parámetro 'formato' debe ser 'csv' o 'ndjson'.")
+        return formato
+    if nombre_archivo:
+        extension = nombre_archivo.rsplit('.', 1)[-1].lower()
+        if extension in ('csv', 'ndjson'):
+            return extension
+        if extension == 'jsonl':
+            return 'ndjson'
+    formato = TIPOS_CONTENIDO.get((tipo_contenido or '').split(';')[0].strip())
+    if formato is None:
+        raise FormatoInvalido("No se pudo determinar el formato del archivo; indique ?formato=csv o ?formato=ndjson.")
+    return formato
+
+
+# Genera (número de fila, datos, error) sin leer el archivo completo en memoria
+def leer_filas(stream, formato):
+    # De a una línea (el cuerpo de la petición puede llegar en un solo bloque),
+    # así un byte inválido se detecta en su fila y no antes
+    texto = codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig')
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        # La fila 1 es el encabezado
+        for numero, fila in enumerate(lector, start=2):
+            yield numero, {k.strip(): v for k, v in fila.items() if k}, None
+        return
+
+    for numero, linea in enumerate(texto, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError as e:
+            yield numero, None, f'JSON inválido: {e}'
+            continue
+        if not isinstance(datos, dict):
+            yield numero, None, 'Cada línea debe ser un objeto JSON.'
+            continue
+        yield numero, datos, None
+
+
+class Importacion:
+    def __init__(self, collection, clave=None, campos_solo_alta=None, tamano_lote=TAMANO_LOTE):
+        self.collection = collection
+        self.clave = clave
+        self.campos_solo_alta = campos_solo_alta or {}
+        self.tamano_lote = tamano_lote
+        self.filas = 0
+        self.insertados = 0
+        self.actualizados = 0
+        self.total_errores = 0
+        self.errores = []
+        self._lote = []
+
+    def rechazar(self, numero, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_REPORTADOS:
+            self.errores.append({'fila': numero, 'error': mensaje})
+
+    def agregar(self, numero, documento):
+        self._lote.append((numero, documento))
+        if len(self._lote) >= self.tamano_lote:
+            self.escribir()
+
+    def escribir(self):
+        lote, self._lote = self._lote, []
+        if not lote:
+            return
+        if self.clave:
+            self._escribir_upsert(lote)
+        else:
+            self._escribir_insercion(lote)
+
+    def _escribir_insercion(self, lote):
+        documentos = [dict(documento, **self.campos_solo_alta) for _, documento in lote]
+        try:
+            resultado = self.collection.insert_many(documentos, ordered=False)
+            self.insertados += len(resultado.inserted_ids)
+        except BulkWriteError as e:
+            detalles = e.details
+            self.insertados += detalles.get('nInserted', 0)
+            for error in detalles.get('writeErrors', []):
+                mensaje = 'Clave duplicada.' if error.get('code') == 11000 else error.get('errmsg', 'Error de escritura.')
+                self.rechazar(lote[error['index']][0], mensaje)
+
+    def _escribir_upsert(self, lote):
+        # Si la misma clave aparece varias veces en el lote gana la última fila
+        por_clave = {}
+        for numero, documento in lote:
+            por_clave[documento[self.clave]] = (numero, documento)
+        filas = list(por_clave.values())
+
+        operaciones = []
+        for _, documento in filas:
+            actualizacion = {'$set': documento}
+            if self.campos_solo_alta:
+                actualizacion['$setOnInsert'] = self.campos_solo_alta
+            operaciones.append(UpdateOne({self.clave: documento[self.clave]}, actualizacion, upsert=True))
+        try:
+            resultado = self.collection.bulk_write(operaciones, ordered=False)
+            self.insertados += resultado.upserted_count
+            self.actualizados += resultado.matched_count
+        except BulkWriteError as e:
+            detalles = e.details
+            self.insertados += detalles.get('nUpserted', 0)
+            self.actualizados += detalles.get('nMatched', 0)
+            for error in detalles.get('writeErrors', []):
+                self.rechazar(filas[error['index']][0], error.get('errmsg', 'Error de escritura.'))
+
+    def reporte(self):
+        return {
+            'filas': self.filas,
+            'insertados': self.insertados,
+            'actualizados': self.actualizados,
+            'rechazados': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+# preparar(datos) devuelve (documento, None) o (None, mensaje de error)
+def importar(collection, stream, formato, preparar, clave=None, campos_solo_alta=None):
+    importacion = Importacion(collection, clave=clave, campos_solo_alta=campos_solo_alta)
+    # En CSV la fila 1 es el encabezado
+    numero = 1 if formato == 'csv' else 0
+    try:
+        for numero, datos, error in leer_filas(stream, formato):
+            importacion.filas += 1
+            if error is None:
+                documento, error = preparar(datos)
+            if error is not None:
+                importacion.rechazar(numero, error)
+                continue
+            importacion.agregar(numero, documento)
+    except UnicodeDecodeError:
+        importacion.escribir()
+        importacion.rechazar(numero + 1, 'El texto no es UTF-8 válido.')
+        raise CodificacionInvalida(numero + 1, importacion.reporte())
+    importacion.escribir()
+    return importacion.reporte()
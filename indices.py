@@ -0,0 +1,212 @@
+import sys
+import json
+import argparse
+
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import OperationFailure
+
+# Registro declarativo de los índices que necesita la aplicación. Se aplica
+# en cada despliegue (start.sh) con:
+#
+#   python indices.py reconciliar            crea o corrige los índices declarados
+#   python indices.py reconciliar --eliminar además borra los índices no declarados
+#   python indices.py diagnosticar           explain() de cada consulta de las rutas
+
+# Los listados filtran por un campo y paginan por _id, por eso los índices
+# compuestos terminan en _id
+INDICES = {
+    'productos': [
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+        IndexModel([('Categoria', ASCENDING), ('_id', ASCENDING)], name='categoria_id'),
+        IndexModel([('Proveedor', ASCENDING), ('_id', ASCENDING)], name='proveedor_id'),
+        # Importación con ?modo=upsert (POST /productos/bulk)
+        IndexModel([('nombre', ASCENDING)], name='nombre'),
+        # Solo los productos con bajoStock (GET /productos/bajo-stock)
+        IndexModel([('bajoStock', ASCENDING), ('_id', ASCENDING)], name='bajoStock_id',
+                   partialFilterExpression={'bajoStock': True}),
+    ],
+    'compras': [
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+        IndexModel([('fechaCompra', ASCENDING)], name='fechaCompra'),
+        IndexModel([('rucProveedor', ASCENDING), ('_id', ASCENDING)], name='rucProveedor_id'),
+    ],
+    'ventas': [
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+        IndexModel([('fechaVenta', ASCENDING)], name='fechaVenta'),
+        IndexModel([('rucCliente', ASCENDING), ('_id', ASCENDING)], name='rucCliente_id'),
+        IndexModel([('rucEmpresa', ASCENDING), ('_id', ASCENDING)], name='rucEmpresa_id'),
+        IndexModel([('facturaNumero', ASCENDING)], name='facturaNumero', unique=True),
+    ],
+    'clientes': [
+        IndexModel([('rucCliente', ASCENDING)], name='rucCliente', unique=True),
+    ],
+    'proveedores': [
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+        IndexModel([('rucProveedor', ASCENDING), ('_id', ASCENDING)], name='rucProveedor_id'),
+    ],
+    'categorias': [
+        IndexModel([('nombreCategoria', ASCENDING)], name='nombreCategoria', unique=True),
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+    ],
+    'empresas': [
+        IndexModel([('rucEmpresa', ASCENDING)], name='rucEmpresa'),
+    ],
+    'embeddings_productos': [
+        # Sincronización de las coincidencias visuales y anulación de productos
+        IndexModel([('v', ASCENDING)], name='v'),
+        IndexModel([('producto', ASCENDING)], name='producto'),
+    ],
+    'trabajos_reconocimiento': [
+        # Cola de trabajos y posición de cada uno (ver trabajos.py)
+        IndexModel([('estado', ASCENDING), ('_id', ASCENDING)], name='estado_id'),
+        IndexModel([('expira', ASCENDING)], name='expira', expireAfterSeconds=0),
+    ],
+    'resumen_ventas': [
+        IndexModel([('tipo', ASCENDING), ('dia', ASCENDING)], name='tipo_dia'),
+    ],
+}
+
+# Forma de las consultas de cada ruta: (ruta, colección, filtro, orden)
+FORMAS_CONSULTA = [
+    ('GET /productos', 'productos', {}, [('_id', 1)]),
+    ('GET /productos/activos', 'productos', {'estado': 'activo'}, [('_id', 1)]),
+    ('GET /productos/anulados', 'productos', {'estado': 'anulado'}, [('_id', 1)]),
+    ('GET /productos/bajo-stock', 'productos', {'bajoStock': True, 'estado': 'activo'}, [('_id', 1)]),
+    ('GET /productos?Categoria=', 'productos', {'Categoria': 'x'}, [('_id', 1)]),
+    ('GET /productos?Proveedor=', 'productos', {'Proveedor': 'x'}, [('_id', 1)]),
+    ('POST /productos/bulk?modo=upsert', 'productos', {'nombre': 'x'}, None),
+    ('GET /compras', 'compras', {}, [('_id', 1)]),
+    ('GET /compras?desde=&hasta=', 'compras', {'fechaCompra': {'$gte': '2000-01-01', '$lte': '2100-01-01'}}, None),
+    ('GET /ventas?desde=&hasta=', 'ventas', {'fechaVenta': {'$gte': '2000-01-01', '$lte': '2100-01-01'}}, None),
+    ('GET /ventas?rucCliente=', 'ventas', {'rucCliente': 'x'}, [('_id', 1)]),
+    ('GET /clientes?rucCliente=', 'clientes', {'rucCliente': 'x'}, None),
+    ('GET /proveedores/activos', 'proveedores', {'estado': 'activo'}, [('_id', 1)]),
+    ('GET /proveedores/anulados', 'proveedores', {'estado': 'anulado'}, [('_id', 1)]),
+    ('GET /categorias/activas', 'categorias', {'estado': 'activo'}, [('_id', 1)]),
+    ('GET /categorias/anuladas', 'categorias', {'estado': 'anulado'}, [('_id', 1)]),
+    ('POST /categorias (duplicado)', 'categorias', {'nombreCategoria': 'x'}, None),
+    ('GET /empresas?rucEmpresa=', 'empresas', {'rucEmpresa': 'x'}, None),
+    ('GET /reportes/ventas?desde=&hasta=', 'resumen_ventas', {'tipo': 'dia', 'dia': {'$gte': '2000-01-01', '$lte': '2100-01-01'}}, [('dia', 1)]),
+    ('GET /reportes/ventas/productos', 'resumen_ventas', {'tipo': 'producto', 'dia': {'$gte': '2000-01-01'}}, [('dia', 1)]),
+    ('POST /productos/reconocer (sincronización)', 'embeddings_productos', {'v': {'$gt': 0}}, None),
+    ('PUT /productos/anular (fotos)', 'embeddings_productos', {'producto': 'x'}, None),
+    ('POST /reconocer-imagen/jobs', 'trabajos_reconocimiento', {'estado': 'pendiente'}, None),
+    ('trabajos.py (tomar)', 'trabajos_reconocimiento', {'estado': 'pendiente'}, [('_id', 1)]),
+]
+
+
+# Comparar solo lo que define al índice (clave y opciones), no metadatos como 'v'
+def especificacion(documento):
+    claves = documento.get('key')
+    if isinstance(claves, dict):
+        claves = list(claves.items())
+    opciones = {k: v for k, v in documento.items() if k in ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds', 'collation', 'weights')}
+    return [list(c) for c in claves], opciones
+
+
+def reconciliar(db, eliminar_sobrantes=False):
+    reporte = []
+    for nombre_coleccion, modelos in INDICES.items():
+        collection = db[nombre_coleccion]
+        existentes = collection.index_information()
+
+        declarados = set()
+        for modelo in modelos:
+            documento = modelo.document
+            nombre = documento['name']
+            declarados.add(nombre)
+
+            actual = existentes.get(nombre)
+            if actual is not None:
+                actual = dict(actual, name=nombre)
+                if especificacion(actual) == especificacion(documento):
+                    reporte.append({'coleccion': nombre_coleccion, 'indice': nombre, 'accion': 'sin cambios'})
+                    continue
+                # Mismo nombre con otra definición: se vuelve a crear
+                collection.drop_index(nombre)
+                accion = 'recreado'
+            else:
+                accion = 'creado'
+
+            try:
+                collection.create_indexes([modelo])
+                reporte.append({'coleccion': nombre_coleccion, 'indice': nombre, 'accion': accion})
+            except OperationFailure as e:
+                # Por ejemplo, valores duplicados al crear un índice único
+                reporte.append({'coleccion': nombre_coleccion, 'indice': nombre, 'accion': 'error', 'detalle': str(e)})
+
+        for nombre in existentes:
+            if nombre == '_id_' or nombre in declarados:
+                continue
+            if eliminar_sobrantes:
+                collection.drop_index(nombre)
+                reporte.append({'coleccion': nombre_coleccion, 'indice': nombre, 'accion': 'eliminado'})
+            else:
+                reporte.append({'coleccion': nombre_coleccion, 'indice': nombre, 'accion': 'no declarado'})
+    return reporte
+
+
+def etapas_del_plan(plan):
+    etapas = [plan.get('stage')]
+    if 'inputStage' in plan:
+        etapas += etapas_del_plan(plan['inputStage'])
+    for hijo in plan.get('inputStages', []):
+        etapas += etapas_del_plan(hijo)
+    return etapas
+
+
+# Ejecutar explain() sobre la forma de consulta de cada ruta y marcar los COLLSCAN
+def diagnosticar(db, formas=FORMAS_CONSULTA):
+    reporte = []
+    for ruta, nombre_coleccion, filtro, orden in formas:
+        comando = {'find': nombre_coleccion, 'filter': filtro, 'limit': 50}
+        if orden:
+            comando['sort'] = dict(orden)
+        explicacion = db.command('explain', comando, verbosity='queryPlanner')
+        plan = explicacion['queryPlanner']['winningPlan']
+        # En clusters fragmentados el plan viene agrupado por shard
+        if 'shards' in plan:
+            etapas = [e for shard in plan['shards'] for e in etapas_del_plan(shard['winningPlan'])]
+        else:
+            etapas = etapas_del_plan(plan)
+        reporte.append({
+            'ruta': ruta,
+            'coleccion': nombre_coleccion,
+            'etapas': etapas,
+            'collscan': 'COLLSCAN' in etapas,
+        })
+    return reporte
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gestión de índices de MongoDB.')
+    parser.add_argument('comando', choices=('reconciliar', 'diagnosticar'))
+    parser.add_argument('--eliminar', action='store_true', help='Eliminar los índices no declarados.')
+    parser.add_argument('--json', action='store_true', help='Imprimir el reporte en JSON.')
+    args = parser.parse_args()
+
+    from conexion import ConexionMongo
+    db = ConexionMongo.desde_entorno().db
+
+    if args.comando == 'reconciliar':
+        reporte = reconciliar(db, eliminar_sobrantes=args.eliminar)
+        errores = [r for r in reporte if r['accion'] == 'error']
+        if args.json:
+            print(json.dumps(reporte, indent=2, ensure_ascii=False))
+        else:
+            for r in reporte:
+                print(f"{r['coleccion']:12s} {r['indice']:20s} {r['accion']}" + (f" ({r['detalle']})" if 'detalle' in r else ''))
+        return 1 if errores else 0
+
+    reporte = diagnosticar(db)
+    if args.json:
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    else:
+        for r in reporte:
+            marca = 'COLLSCAN' if r['collscan'] else 'ok'
+            print(f"{marca:8s} {r['ruta']:32s} {' <- '.join(r['etapas'])}")
+    return 1 if any(r['collscan'] for r in reporte) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
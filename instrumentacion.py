@@ -0,0 +1,367 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Instrumentación de la aplicación y endpoint GET /metrics (formato de texto
+# de Prometheus).
+#
+#   http_peticion_segundos{ruta, metodo, codigo}     histograma por ruta
+#   http_peticiones_en_curso{ruta, metodo}           peticiones en curso
+#   mongo_comando_segundos{coleccion, operacion}     cada comando enviado a MongoDB
+#   mongo_documentos_total{coleccion, operacion}     documentos devueltos o afectados
+#   mongo_comandos_fallidos_total{coleccion, operacion}
+#   vision_etapa_segundos{etapa}                     decodificar, preprocesar, predecir,
+#                                                    embeddings y traducir (vision.py)
+#   app_<origen>_<métrica>{worker}                   los metricas() existentes (lotes,
+#                                                    cachés, pool de MongoDB, índices, ...)
+#
+# Cada proceso tiene su registro. Con METRICAS_DIR, cada proceso (workers de
+# gunicorn, vision_worker.py, trabajos.py) escribe cada METRICAS_INTERVALO
+# segundos una copia de su registro en ese directorio, y /metrics suma las de
+# todos los procesos vivos; sin METRICAS_DIR solo se ve el worker que atiende.
+#
+# Las peticiones que tardan más de METRICAS_LENTA_MS se registran en el log
+# con el desglose del tiempo: MongoDB por colección y operación, espera del
+# control de admisión, reconocimiento y serialización JSON.
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRICAS_DIR = os.environ.get('METRICAS_DIR')
+METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', 5))
+METRICAS_LENTA_MS = float(os.environ.get('METRICAS_LENTA_MS', 1000))
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+class Registro:
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = buckets
+        self._candado = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._medidores = {}
+
+    def observar(self, nombre, valor, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._candado:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            histograma[0][bisect.bisect_left(self.buckets, valor)] += 1
+            histograma[1] += valor
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._candado:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def sumar(self, nombre, delta, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._candado:
+            self._medidores[clave] = self._medidores.get(clave, 0) + delta
+
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def instantanea(self):
+        with self._candado:
+            return {
+                'histogramas': [[n, list(e), list(h[0]), h[1]] for (n, e), h in self._histogramas.items()],
+                'contadores': [[n, list(e), v] for (n, e), v in self._contadores.items()],
+                'medidores': [[n, list(e), v] for (n, e), v in self._medidores.items()],
+            }
+
+
+registro = Registro()
+
+
+# Desglose de la petición en curso, por hilo
+_actual = threading.local()
+
+
+class Desglose:
+    def __init__(self):
+        self.tiempos = {}
+        self.comandos = {}
+
+    def anotar(self, categoria, segundos):
+        self.tiempos[categoria] = self.tiempos.get(categoria, 0.0) + segundos
+
+    def anotar_comando(self, coleccion, operacion, segundos, documentos):
+        self.anotar('mongo', segundos)
+        acumulado = self.comandos.setdefault(f'{coleccion}.{operacion}', [0, 0.0, 0])
+        acumulado[0] += 1
+        acumulado[1] += segundos
+        acumulado[2] += documentos
+
+    def describir(self):
+        partes = [f'{categoria} {segundos * 1000:.1f} ms' for categoria, segundos in
+                  sorted(self.tiempos.items(), key=lambda t: -t[1])]
+        comandos = ', '.join(f'{nombre} x{n} {segundos * 1000:.1f} ms ({documentos} docs)' for nombre, (n, segundos, documentos) in
+                             sorted(self.comandos.items(), key=lambda c: -c[1][1]))
+        return '; '.join(partes) + (f' [{comandos}]' if comandos else '')
+
+
+# Sumar tiempo a una categoría del desglose de la petición actual (si la hay)
+def anotar(categoria, segundos):
+    desglose = getattr(_actual, 'desglose', None)
+    if desglose is not None:
+        desglose.anotar(categoria, segundos)
+
+
+def documentos_respuesta(respuesta):
+    cursor = respuesta.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    n = respuesta.get('n')
+    return n if isinstance(n, int) else 0
+
+
+# Registra la duración y los documentos de cada comando enviado a MongoDB. Los
+# eventos se publican en el hilo que ejecuta el comando, así cada uno se suma
+# al desglose de su petición
+class MonitorComandos(monitoring.CommandListener):
+    def __init__(self, registro=registro):
+        self.registro = registro
+        self._pendientes = {}
+
+    def started(self, event):
+        coleccion = event.command.get(event.command_name)
+        if not isinstance(coleccion, str):
+            coleccion = event.command.get('collection', '-')
+        self._pendientes[(event.connection_id, event.request_id)] = coleccion
+
+    def _terminar(self, event):
+        coleccion = self._pendientes.pop((event.connection_id, event.request_id), '-')
+        segundos = event.duration_micros / 1e6
+        self.registro.observar('mongo_comando_segundos', segundos, coleccion=coleccion, operacion=event.command_name)
+        return coleccion, segundos
+
+    def succeeded(self, event):
+        coleccion, segundos = self._terminar(event)
+        documentos = documentos_respuesta(event.reply)
+        self.registro.incrementar('mongo_documentos_total', documentos, coleccion=coleccion, operacion=event.command_name)
+        desglose = getattr(_actual, 'desglose', None)
+        if desglose is not None:
+            desglose.anotar_comando(coleccion, event.command_name, segundos, documentos)
+
+    def failed(self, event):
+        coleccion, segundos = self._terminar(event)
+        self.registro.incrementar('mongo_comandos_fallidos_total', coleccion=coleccion, operacion=event.command_name)
+        desglose = getattr(_actual, 'desglose', None)
+        if desglose is not None:
+            desglose.anotar_comando(coleccion, event.command_name, segundos, 0)
+
+
+def _snake(nombre):
+    nombre = re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', str(nombre)).lower()
+    return re.sub(r'[^a-z0-9_]+', '_', nombre.replace('<=', 'le_').replace('>', 'gt_')).strip('_')
+
+
+# {'lotes': 3, 'esperaColaMs': {'<=1ms': 2}} -> [('lotes', 3), ('espera_cola_ms_le_1ms', 2)]
+def aplanar(valores, prefijo=''):
+    for clave, valor in valores.items():
+        nombre = f'{prefijo}_{_snake(clave)}' if prefijo else _snake(clave)
+        if isinstance(valor, dict):
+            yield from aplanar(valor, nombre)
+        elif isinstance(valor, bool):
+            yield nombre, int(valor)
+        elif isinstance(valor, (int, float)):
+            yield nombre, valor
+
+
+def valores_fuentes(fuentes):
+    medidores = []
+    for origen, funcion in fuentes.items():
+        try:
+            valores = funcion()
+        except Exception:
+            continue
+        for nombre, valor in aplanar(valores or {}):
+            medidores.append([f'app_{_snake(origen)}_{nombre}', [['worker', str(os.getpid())]], valor])
+    return medidores
+
+
+# Copia del registro (y de las fuentes locales) en METRICAS_DIR
+class Exportador:
+    def __init__(self, directorio=METRICAS_DIR, intervalo=METRICAS_INTERVALO, fuentes=None, registro=registro):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.fuentes = fuentes or {}
+        self.registro = registro
+        self._pid = None
+        self._candado = threading.Lock()
+
+    def instantanea(self):
+        datos = self.registro.instantanea()
+        datos['medidores'] += valores_fuentes(self.fuentes)
+        return datos
+
+    def escribir(self):
+        ruta = os.path.join(self.directorio, f'{os.getpid()}.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(self.instantanea(), f)
+        os.replace(temporal, ruta)
+
+    def _bucle(self):
+        while True:
+            try:
+                self.escribir()
+            except Exception:
+                pass
+            time.sleep(self.intervalo)
+
+    # El hilo se arranca en cada proceso (después del fork de gunicorn)
+    def asegurar(self):
+        if not self.directorio or self._pid == os.getpid():
+            return
+        with self._candado:
+            if self._pid != os.getpid():
+                os.makedirs(self.directorio, exist_ok=True)
+                self._pid = os.getpid()
+                threading.Thread(target=self._bucle, name='exportador-metricas', daemon=True).start()
+
+    # Instantáneas de este proceso y de los demás que escribieron hace poco
+    def recolectar(self):
+        instantaneas = [self.instantanea()]
+        if not self.directorio or not os.path.isdir(self.directorio):
+            return instantaneas
+        propia = f'{os.getpid()}.json'
+        limite = time.time() - 3 * self.intervalo
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if not nombre.endswith('.json') or nombre == propia:
+                continue
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    # Proceso terminado
+                    os.remove(ruta)
+                    continue
+                with open(ruta) as f:
+                    instantaneas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return instantaneas
+
+
+def formato_prometheus(instantaneas, buckets=BUCKETS_SEGUNDOS):
+    histogramas, contadores, medidores = {}, {}, {}
+    for datos in instantaneas:
+        for nombre, etiquetas, conteos, suma in datos.get('histogramas', ()):
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            actual = histogramas.setdefault(clave, [[0] * len(conteos), 0.0])
+            actual[0] = [a + b for a, b in zip(actual[0], conteos)]
+            actual[1] += suma
+        for destino, origen in ((contadores, 'contadores'), (medidores, 'medidores')):
+            for nombre, etiquetas, valor in datos.get(origen, ()):
+                clave = (nombre, tuple(map(tuple, etiquetas)))
+                destino[clave] = destino.get(clave, 0) + valor
+
+    def etiquetas_texto(etiquetas, extra=()):
+        pares = list(etiquetas) + list(extra)
+        if not pares:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pares) + '}'
+
+    lineas = []
+    declarados = set()
+
+    def declarar(nombre, tipo):
+        if nombre not in declarados:
+            declarados.add(nombre)
+            lineas.append(f'# TYPE {nombre} {tipo}')
+
+    for (nombre, etiquetas), (conteos, suma) in sorted(histogramas.items()):
+        declarar(nombre, 'histogram')
+        acumulado = 0
+        for limite, conteo in zip(list(buckets) + ['+Inf'], conteos):
+            acumulado += conteo
+            lineas.append(f'{nombre}_bucket{etiquetas_texto(etiquetas, [("le", limite)])} {acumulado}')
+        lineas.append(f'{nombre}_sum{etiquetas_texto(etiquetas)} {suma}')
+        lineas.append(f'{nombre}_count{etiquetas_texto(etiquetas)} {acumulado}')
+    for tipo, valores in (('counter', contadores), ('gauge', medidores)):
+        for (nombre, etiquetas), valor in sorted(valores.items()):
+            declarar(nombre, tipo)
+            lineas.append(f'{nombre}{etiquetas_texto(etiquetas)} {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+# Timers de la petición, /metrics y log de peticiones lentas. 'fuentes' son
+# funciones metricas() de este proceso ({origen: función}); 'fuentes_globales'
+# se consultan solo al responder /metrics (p. ej. contadores en MongoDB)
+def instalar_instrumentacion(app, fuentes=None, fuentes_globales=None, lenta_ms=METRICAS_LENTA_MS):
+    from flask import request, g, Response
+    from flask.json.provider import DefaultJSONProvider
+
+    exportador = Exportador(fuentes=fuentes)
+    exportador.fuentes_globales = dict(fuentes_globales or {})
+
+    class ProveedorJSON(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return super().dumps(obj, **kwargs)
+            finally:
+                anotar('json', time.perf_counter() - inicio)
+
+    app.json = ProveedorJSON(app)
+
+    def etiquetas_ruta():
+        return {'ruta': request.url_rule.rule if request.url_rule else 'sin_ruta', 'metodo': request.method}
+
+    @app.before_request
+    def iniciar_medicion():
+        exportador.asegurar()
+        _actual.desglose = Desglose()
+        g.instrumentacion = (time.perf_counter(), etiquetas_ruta())
+        registro.sumar('http_peticiones_en_curso', 1, **g.instrumentacion[1])
+
+    @app.after_request
+    def anotar_codigo(respuesta):
+        g.codigo_respuesta = respuesta.status_code
+        return respuesta
+
+    @app.teardown_request
+    def terminar_medicion(error=None):
+        medicion = g.pop('instrumentacion', None)
+        desglose = getattr(_actual, 'desglose', None)
+        _actual.desglose = None
+        if medicion is None:
+            return
+        inicio, etiquetas = medicion
+        segundos = time.perf_counter() - inicio
+        codigo = g.pop('codigo_respuesta', 500)
+        registro.sumar('http_peticiones_en_curso', -1, **etiquetas)
+        registro.observar('http_peticion_segundos', segundos, codigo=codigo, **etiquetas)
+        if segundos * 1000 >= lenta_ms and desglose is not None:
+            app.logger.warning('Petición lenta: %s %s %d en %.1f ms: %s', request.method, request.full_path.rstrip('?'),
+                           codigo, segundos * 1000, desglose.describir() or 'sin desglose')
+
+    @app.route('/metrics', methods=['GET'])
+    def metricas_prometheus():
+        instantaneas = exportador.recolectar()
+        if exportador.fuentes_globales:
+            instantaneas.append({'medidores': [[n, [], v] for n, _, v in valores_fuentes(exportador.fuentes_globales)]})
+        return Response(formato_prometheus(instantaneas), mimetype='text/plain; version=0.0.4')
+
+    return exportador
+
+
+# Para los procesos que no son de Flask (vision_worker.py, trabajos.py)
+def exportar_en_segundo_plano(fuentes=None):
+    exportador = Exportador(fuentes=fuentes)
+    exportador.asegurar()
+    return exportador
@@ -0,0 +1,190 @@
+import uuid
+from collections import OrderedDict
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+# Movimientos de stock de productos en un solo viaje a la base de datos.
+# Las reservas descuentan el stock solo si 'CantidadActual' >= cantidad, así dos
+# ventas concurrentes no pueden dejar el stock en negativo
+
+# Sin transacciones, cada reserva deja una marca en 'reservas' para poder
+# compensar una reserva parcial; se quita en cuanto la reserva se completa.
+# Solo quedan marcas si falla esa limpieza, y nunca más de MARCAS_RESERVA
+MARCAS_RESERVA = 50
+
+# Campos internos de 'productos' que no se devuelven en los listados
+CAMPOS_INTERNOS_PRODUCTO = ('reservas',)
+
+# Todas las actualizaciones de 'CantidadActual' son pipelines que además
+# recalculan 'bajoStock' en la misma operación, así el indicador (y su índice
+# parcial) nunca queda desfasado respecto del stock
+ES_BAJO_STOCK = {'$lt': ['$CantidadActual', '$CantidadMinima']}
+
+
+class ProductosInexistentes(Exception):
+    def __init__(self, ids):
+        super().__init__(f"Los productos con ID {', '.join(ids)} no existen.")
+        self.ids = ids
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, faltantes):
+        ids = ', '.join(f['idProducto'] for f in faltantes)
+        super().__init__(f'No hay suficiente stock para los productos con ID {ids}.')
+        self.faltantes = faltantes
+
+
+# Sumar las cantidades por producto (un producto puede repetirse en la venta).
+# Lanza bson.errors.InvalidId si algún idProducto no es un ObjectId válido
+def agrupar_lineas(lineas, campo_cantidad='cantidadVendida'):
+    cantidades = OrderedDict()
+    for linea in lineas:
+        producto_id = ObjectId(linea['idProducto'])
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + linea[campo_cantidad]
+    return cantidades
+
+
+def calcular_faltantes(productos, cantidades):
+    faltantes = []
+    for producto_id, cantidad in cantidades.items():
+        disponible = productos[producto_id].get('CantidadActual', 0)
+        if cantidad > disponible:
+            faltantes.append({
+                'idProducto': str(producto_id),
+                'nombre': productos[producto_id].get('nombre'),
+                'cantidadSolicitada': cantidad,
+                'cantidadDisponible': disponible
+            })
+    return faltantes
+
+
+# Pipeline de actualización: suma 'delta' al stock, fija 'campos' y recalcula
+# 'bajoStock'. 'agregar_marca' / 'quitar_marca' mantienen la lista de reservas
+def pipeline_stock(delta, campos=None, agregar_marca=None, quitar_marca=None):
+    etapa = {'CantidadActual': {'$add': [{'$ifNull': ['$CantidadActual', 0]}, delta]}}
+    for campo, valor in (campos or {}).items():
+        etapa[campo] = {'$literal': valor}
+    if agregar_marca:
+        etapa['reservas'] = {'$slice': [{'$concatArrays': [{'$ifNull': ['$reservas', []]}, [agregar_marca]]}, -MARCAS_RESERVA]}
+    if quitar_marca:
+        etapa['reservas'] = {'$filter': {'input': {'$ifNull': ['$reservas', []]}, 'cond': {'$ne': ['$$this', quitar_marca]}}}
+    return [{'$set': etapa}, {'$set': {'bajoStock': ES_BAJO_STOCK}}]
+
+
+def buscar_productos(productos_collection, ids, session=None):
+    return {p['_id']: p for p in productos_collection.find({'_id': {'$in': list(ids)}}, session=session)}
+
+
+# Descontar el stock de todos los productos con un $in y un bulk_write.
+# Dentro de una transacción basta con lanzar la excepción para que se aborte;
+# sin sesión, las reservas que sí se aplicaron se compensan antes de lanzarla.
+# Devuelve los documentos de los productos leídos antes de la reserva
+def reservar_stock(productos_collection, cantidades, session=None):
+    productos = buscar_productos(productos_collection, cantidades.keys(), session)
+
+    inexistentes = [str(producto_id) for producto_id in cantidades if producto_id not in productos]
+    if inexistentes:
+        raise ProductosInexistentes(inexistentes)
+
+    faltantes = calcular_faltantes(productos, cantidades)
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+
+    marca = None if session is not None else uuid.uuid4().hex
+    operaciones = [
+        UpdateOne({'_id': producto_id, 'CantidadActual': {'$gte': cantidad}},
+                  pipeline_stock(-cantidad, agregar_marca=marca))
+        for producto_id, cantidad in cantidades.items()
+    ]
+
+    resultado = productos_collection.bulk_write(operaciones, ordered=False, session=session)
+    if resultado.matched_count == len(operaciones):
+        if marca:
+            quitar_marca(productos_collection, cantidades, marca)
+        return productos
+
+    # Otra venta se llevó el stock entre la lectura y la actualización
+    if marca:
+        compensar_reserva(productos_collection, cantidades, marca)
+    actuales = buscar_productos(productos_collection, cantidades.keys(), session)
+    faltantes = calcular_faltantes(actuales, cantidades)
+    if not faltantes:
+        # El stock se repuso después del conflicto: se informan todos los productos
+        faltantes = [{
+            'idProducto': str(producto_id),
+            'nombre': productos[producto_id].get('nombre'),
+            'cantidadSolicitada': cantidad,
+            'cantidadDisponible': actuales.get(producto_id, {}).get('CantidadActual')
+        } for producto_id, cantidad in cantidades.items()]
+    raise StockInsuficiente(faltantes)
+
+
+# La reserva ya está completa: la marca solo servía para compensarla. Si la
+# limpieza falla la venta sigue adelante; la marca queda hasta que $slice la descarte
+def quitar_marca(productos_collection, cantidades, marca):
+    try:
+        productos_collection.update_many({'_id': {'$in': list(cantidades)}, 'reservas': marca},
+                                         {'$pull': {'reservas': marca}})
+    except PyMongoError:
+        pass
+
+
+# Devolver el stock solo de los productos en los que se aplicó la reserva marcada
+def compensar_reserva(productos_collection, cantidades, marca):
+    productos_collection.bulk_write([
+        UpdateOne({'_id': producto_id, 'reservas': marca}, pipeline_stock(cantidad, quitar_marca=marca))
+        for producto_id, cantidad in cantidades.items()
+    ], ordered=False)
+
+
+# Sumar 'cantidades' (pueden ser negativas) al stock en un solo bulk_write.
+# 'campos' es {ObjectId: {campo: valor}} con otros campos a fijar por producto
+def ajustar_stock(productos_collection, cantidades, campos=None, session=None):
+    if not cantidades:
+        return
+    productos_collection.bulk_write([
+        UpdateOne({'_id': producto_id}, pipeline_stock(cantidad, (campos or {}).get(producto_id)))
+        for producto_id, cantidad in cantidades.items()
+    ], ordered=False, session=session)
+
+
+# Devolver stock (anulación de una venta o compensación manual)
+def liberar_stock(productos_collection, cantidades, session=None):
+    ajustar_stock(productos_collection, cantidades, session=session)
+
+
+# Recalcular 'bajoStock' en todos los productos (carga inicial o corrección)
+def recalcular_bajo_stock(productos_collection):
+    return productos_collection.update_many({}, [{'$set': {'bajoStock': ES_BAJO_STOCK}}]).modified_count
+
+
+# Copiar a cada línea de la venta los datos del producto al momento de la
+# venta, para no tener que volver a leer 'productos' al reimprimir o reportar.
+# 'productos' es {ObjectId: documento}, como lo devuelve reservar_stock
+def completar_lineas_venta(lineas, productos):
+    for linea in lineas:
+        producto = productos.get(ObjectId(linea['idProducto']))
+        if producto is None:
+            continue
+        linea['nombre'] = producto.get('nombre')
+        linea['precioVenta'] = producto.get('precioVenta')
+        linea['Iva'] = producto.get('Iva')
+        # Costo y categoría al momento de la venta, para los resúmenes y su anulación
+        linea['precioCompra'] = producto.get('precioCompra')
+        linea['Categoria'] = producto.get('Categoria')
+        linea['total'] = linea['cantidadVendida'] * (producto.get('precioVenta') or 0)
+    return lineas
+
+
+# Lo mismo para una compra: el precio de compra ya viene en la línea
+def completar_lineas_compra(lineas, productos):
+    for linea in lineas:
+        producto = productos.get(ObjectId(linea['idProducto']))
+        if producto is None:
+            continue
+        linea.setdefault('nombre', producto.get('nombre'))
+        linea['Iva'] = producto.get('Iva')
+        linea['total'] = linea['cantidadComprada'] * linea['precioCompra']
+    return lineas
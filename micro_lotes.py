@@ -0,0 +1,131 @@
+import threading
+import time
+import queue
+from concurrent.futures import Future
+
+import numpy as np
+
+
+# Límites (en milisegundos) de los buckets del histograma de espera en cola
+BUCKETS_ESPERA_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+# El lote no terminó dentro del plazo (p. ej. el hilo del programador quedó
+# trabado); quien esperaba deja de hacerlo y la petición responde 503
+class LoteVencido(Exception):
+    pass
+
+
+# Programador de micro-lotes: junta las imágenes que llegan de distintas
+# peticiones y ejecuta una sola pasada del modelo por lote
+class ProgramadorLotes:
+    def __init__(self, predecir, tamano_maximo=16, espera_maxima_ms=10, limite_cola=256):
+        self.predecir = predecir
+        self.tamano_maximo = tamano_maximo
+        self.espera_maxima = espera_maxima_ms / 1000.0
+        self.cola = queue.Queue(maxsize=limite_cola)
+        self._hilo = None
+        self._candado = threading.Lock()
+        # Buffer del lote, reutilizado entre pasadas (solo lo usa el hilo del programador)
+        self._buffer_lote = None
+
+        # Métricas: distribución de tamaños de lote y de tiempos de espera
+        self._conteo_tamanos = {}
+        self._conteo_espera = [0] * (len(BUCKETS_ESPERA_MS) + 1)
+        self._suma_espera_ms = 0.0
+        self._lotes = 0
+        self._imagenes = 0
+
+    def _asegurar_hilo(self):
+        # El hilo se arranca en el primer uso para que exista dentro de cada
+        # worker de gunicorn y no en el proceso padre antes del fork
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._candado:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='programador-lotes', daemon=True)
+                self._hilo.start()
+
+    def enviar(self, img_array, liberar=None):
+        # img_array es una sola imagen ya preprocesada, sin eje de lote.
+        # liberar(img_array) se llama cuando la imagen ya se copió al lote
+        self._asegurar_hilo()
+        futuro = Future()
+        self.cola.put_nowait((img_array, futuro, time.perf_counter(), liberar))
+        return futuro
+
+    def _recoger_lote(self):
+        # Bloquea hasta la primera imagen y luego junta más hasta llenar el
+        # lote o hasta que venza el plazo de espera
+        pendientes = [self.cola.get()]
+        limite = time.perf_counter() + self.espera_maxima
+        while len(pendientes) < self.tamano_maximo:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                pendientes.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return pendientes
+
+    def _bucle(self):
+        while True:
+            pendientes = self._recoger_lote()
+            inicio = time.perf_counter()
+            self._registrar(pendientes, inicio)
+
+            try:
+                lote = self._armar_lote(pendientes)
+                predicciones = self.predecir(lote)
+            except Exception as e:
+                for _, futuro, _, _ in pendientes:
+                    futuro.set_exception(e)
+                continue
+
+            for i, (_, futuro, _, _) in enumerate(pendientes):
+                futuro.set_result(predicciones[i:i + 1])
+
+    def _armar_lote(self, pendientes):
+        forma = pendientes[0][0].shape
+        if self._buffer_lote is None or self._buffer_lote.shape[1:] != forma:
+            self._buffer_lote = np.empty((self.tamano_maximo,) + forma, dtype=np.float32)
+
+        lote = self._buffer_lote[:len(pendientes)]
+        try:
+            np.stack([img_array for img_array, _, _, _ in pendientes], out=lote)
+        finally:
+            for img_array, _, _, liberar in pendientes:
+                if liberar is not None:
+                    liberar(img_array)
+        return lote
+
+    def _registrar(self, pendientes, inicio):
+        with self._candado:
+            tamano = len(pendientes)
+            self._conteo_tamanos[tamano] = self._conteo_tamanos.get(tamano, 0) + 1
+            self._lotes += 1
+            self._imagenes += tamano
+            for _, _, encolado, _ in pendientes:
+                espera_ms = (inicio - encolado) * 1000.0
+                self._suma_espera_ms += espera_ms
+                indice = len(BUCKETS_ESPERA_MS)
+                for i, limite in enumerate(BUCKETS_ESPERA_MS):
+                    if espera_ms <= limite:
+                        indice = i
+                        break
+                self._conteo_espera[indice] += 1
+
+    def metricas(self):
+        with self._candado:
+            buckets = {f'<={limite}ms': self._conteo_espera[i] for i, limite in enumerate(BUCKETS_ESPERA_MS)}
+            buckets[f'>{BUCKETS_ESPERA_MS[-1]}ms'] = self._conteo_espera[-1]
+            return {
+                'lotes': self._lotes,
+                'imagenes': self._imagenes,
+                'tamanoPromedioLote': self._imagenes / self._lotes if self._lotes else 0,
+                'tamanosLote': {str(k): v for k, v in sorted(self._conteo_tamanos.items())},
+                'esperaPromedioMs': self._suma_espera_ms / self._imagenes if self._imagenes else 0,
+                'esperaColaMs': buckets,
+                'enCola': self.cola.qsize(),
+            }
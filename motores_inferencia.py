@@ -0,0 +1,145 @@
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+
+
+RUTA_BASE = os.path.dirname(os.path.abspath(__file__))
+RUTA_MODELOS = os.environ.get('RUTA_MODELOS', os.path.join(RUTA_BASE, 'modelos'))
+
+FORMA_ENTRADA = (224, 224, 3)
+# Salida de la penúltima capa (GlobalAveragePooling) de MobileNetV2
+DIMENSION_EMBEDDING = 1280
+
+
+# Modelo que comparte los pesos de 'model' y termina en la penúltima capa;
+# lo usan las coincidencias visuales de productos (ver coincidencias.py)
+def crear_extractor(model):
+    return tf.keras.Model(model.input, model.layers[-2].output)
+
+
+# Ruta Keras original: model.predict genérico
+class MotorKeras:
+    nombre = 'keras'
+
+    def __init__(self):
+        self.model = MobileNetV2(weights='imagenet')
+        self.extractor = crear_extractor(self.model)
+
+    def predecir(self, lote):
+        return self.model.predict(lote, verbose=0)
+
+    def embeddings(self, lote):
+        return self.extractor.predict(lote, verbose=0)
+
+
+# Llamada directa al modelo compilada con tf.function, sin la maquinaria de
+# model.predict; se hace una pasada de calentamiento al crearla
+class MotorCompilado:
+    nombre = 'compilado'
+
+    def __init__(self, calentar=True):
+        self.model = MobileNetV2(weights='imagenet')
+        self.extractor = crear_extractor(self.model)
+        firma = [tf.TensorSpec(shape=(None,) + FORMA_ENTRADA, dtype=tf.float32)]
+        self._llamar = tf.function(lambda lote: self.model(lote, training=False), input_signature=firma)
+        # Se traza en la primera llamada, no al arrancar
+        self._extraer = tf.function(lambda lote: self.extractor(lote, training=False), input_signature=firma)
+        if calentar:
+            self.predecir(np.zeros((1,) + FORMA_ENTRADA, dtype=np.float32))
+
+    def predecir(self, lote):
+        return self._llamar(tf.convert_to_tensor(lote, dtype=tf.float32)).numpy()
+
+    def embeddings(self, lote):
+        return self._extraer(tf.convert_to_tensor(lote, dtype=tf.float32)).numpy()
+
+
+# Convertir MobileNetV2 a TFLite cuantizado y guardarlo en disco.
+# 'float16' cuantiza los pesos a float16; 'int8' usa cuantización de rango
+# dinámico (pesos int8, activaciones en float). Con extractor=True se
+# convierte el modelo cortado en la penúltima capa
+def convertir_tflite(cuantizacion, ruta, extractor=False):
+    model = MobileNetV2(weights='imagenet')
+    if extractor:
+        model = crear_extractor(model)
+    convertidor = tf.lite.TFLiteConverter.from_keras_model(model)
+    convertidor.optimizations = [tf.lite.Optimize.DEFAULT]
+    if cuantizacion == 'float16':
+        convertidor.target_spec.supported_types = [tf.float16]
+    contenido = convertidor.convert()
+
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return ruta
+
+
+# Intérprete de TFLite para un archivo .tflite; el intérprete no es seguro
+# entre hilos, por eso cada llamada toma el candado
+class InterpreteTFLite:
+    def __init__(self, ruta, hilos=None):
+        self.interprete = tf.lite.Interpreter(model_path=ruta, num_threads=hilos)
+        self._entrada = self.interprete.get_input_details()[0]['index']
+        self._salida = self.interprete.get_output_details()[0]['index']
+        self._tamano_lote = None
+        self._candado = threading.Lock()
+
+    def ejecutar(self, lote):
+        lote = np.ascontiguousarray(lote, dtype=np.float32)
+        with self._candado:
+            # Redimensionar el tensor de entrada solo cuando cambia el tamaño del lote
+            if lote.shape[0] != self._tamano_lote:
+                self.interprete.resize_tensor_input(self._entrada, lote.shape)
+                self.interprete.allocate_tensors()
+                self._tamano_lote = lote.shape[0]
+            self.interprete.set_tensor(self._entrada, lote)
+            self.interprete.invoke()
+            return self.interprete.get_tensor(self._salida).copy()
+
+
+# MobileNetV2 cuantizado ejecutado con el intérprete de TFLite. El modelo
+# Keras solo se construye si todavía no existe el archivo .tflite. El
+# extractor de embeddings es otro archivo y se carga en el primer uso
+class MotorTFLite:
+    def __init__(self, cuantizacion='float16', hilos=None, ruta=None, calentar=True):
+        self.nombre = f'tflite-{cuantizacion}'
+        self.cuantizacion = cuantizacion
+        self.hilos = hilos
+        self.ruta = ruta or os.path.join(RUTA_MODELOS, f'mobilenet_v2_{cuantizacion}.tflite')
+        self.ruta_extractor = os.path.join(RUTA_MODELOS, f'mobilenet_v2_{cuantizacion}_embeddings.tflite')
+        if not os.path.exists(self.ruta):
+            convertir_tflite(cuantizacion, self.ruta)
+
+        self._clasificador = InterpreteTFLite(self.ruta, hilos)
+        self._extractor = None
+        self._candado_extractor = threading.Lock()
+        if calentar:
+            self.predecir(np.zeros((1,) + FORMA_ENTRADA, dtype=np.float32))
+
+    def predecir(self, lote):
+        return self._clasificador.ejecutar(lote)
+
+    def embeddings(self, lote):
+        if self._extractor is None:
+            with self._candado_extractor:
+                if self._extractor is None:
+                    if not os.path.exists(self.ruta_extractor):
+                        convertir_tflite(self.cuantizacion, self.ruta_extractor, extractor=True)
+                    self._extractor = InterpreteTFLite(self.ruta_extractor, self.hilos)
+        return self._extractor.ejecutar(lote)
+
+
+MOTORES = ('keras', 'compilado', 'tflite-float16', 'tflite-int8')
+
+
+def crear_motor(nombre='keras', hilos=None):
+    if nombre == 'keras':
+        return MotorKeras()
+    if nombre == 'compilado':
+        return MotorCompilado()
+    if nombre in ('tflite-float16', 'tflite-int8'):
+        return MotorTFLite(cuantizacion=nombre.split('-', 1)[1], hilos=hilos)
+    raise ValueError(f"Motor de inferencia desconocido: '{nombre}'. Opciones: {', '.join(MOTORES)}.")
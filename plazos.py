@@ -0,0 +1,76 @@
+import os
+
+import pymongo
+from flask import request, g, jsonify
+from pymongo.errors import PyMongoError
+
+# Plazo máximo por ruta para las operaciones de MongoDB de cada petición.
+# Usa los timeouts del lado del cliente de pymongo (pymongo.timeout): todas
+# las consultas hechas dentro de la petición comparten el mismo plazo y, al
+# vencer, fallan en lugar de dejar el hilo del worker bloqueado.
+#
+# PLAZOS_RUTAS permite cambiar o agregar plazos: '/ventas=5,/compras=20'.
+# Se usa el prefijo más largo que coincida; 0 deja la ruta sin plazo.
+
+PLAZO_LECTURA_S = float(os.environ.get('PLAZO_LECTURA_S', 10))
+PLAZO_ESCRITURA_S = float(os.environ.get('PLAZO_ESCRITURA_S', 15))
+
+PLAZOS_POR_DEFECTO = {
+    '/health': 2,
+    # El reconocimiento tiene su propio plazo (VISION_PLAZO_S)
+    '/reconocer-imagen': 0,
+    '/productos/reconocer': 0,
+    '/productos/fotos': 0,
+    # Las exportaciones se escriben a medida y pueden durar lo que haga falta
+    '/compras/exportar': 0,
+    '/productos/exportar': 0,
+    '/ventas/exportar': 0,
+}
+
+
+def leer_plazos(valor):
+    plazos = dict(PLAZOS_POR_DEFECTO)
+    for parte in valor.split(','):
+        if '=' in parte:
+            ruta, segundos = parte.split('=', 1)
+            plazos[ruta.strip()] = float(segundos)
+    return plazos
+
+
+PLAZOS_RUTAS = leer_plazos(os.environ.get('PLAZOS_RUTAS', ''))
+
+
+def plazo_para(ruta, metodo):
+    coincidencias = [r for r in PLAZOS_RUTAS if ruta == r or ruta.startswith(r.rstrip('/') + '/')]
+    if coincidencias:
+        return PLAZOS_RUTAS[max(coincidencias, key=len)]
+    return PLAZO_LECTURA_S if metodo in ('GET', 'HEAD') else PLAZO_ESCRITURA_S
+
+
+def instalar_plazos(app):
+    @app.before_request
+    def abrir_plazo():
+        segundos = plazo_para(request.path, request.method)
+        if segundos:
+            contexto = pymongo.timeout(segundos)
+            contexto.__enter__()
+            g.plazo_mongo = contexto
+
+    @app.teardown_request
+    def cerrar_plazo(error=None):
+        contexto = g.pop('plazo_mongo', None)
+        if contexto is not None:
+            contexto.__exit__(None, None, None)
+
+    @app.errorhandler(PyMongoError)
+    def plazo_vencido(error):
+        return error_interno(error)
+
+
+# Respuesta para un error inesperado en una vista: 504 si venció el plazo de
+# MongoDB y 500 en cualquier otro caso. Las vistas que atrapan Exception la
+# usan para no convertir un plazo vencido en un 500
+def error_interno(error):
+    if isinstance(error, PyMongoError) and error.timeout:
+        return jsonify({'error': 'La base de datos tardó demasiado en responder, intente nuevamente.'}), 504
+    return jsonify({'error': str(error)}), 500
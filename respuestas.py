@@ -0,0 +1,105 @@
+import os
+import gzip
+import hashlib
+import threading
+from functools import wraps
+from collections import OrderedDict
+
+from flask import request, make_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Capa de respuesta para los listados de catálogo:
+#   - ETag fuerte derivado del contenido (distinto por codificación)
+#   - 304 Not Modified cuando coincide If-None-Match
+#   - compresión br/gzip según Accept-Encoding, a partir de un tamaño mínimo
+# Los cuerpos comprimidos se guardan por ETag, así un sondeo repetido no
+# vuelve a comprimir.
+
+TAMANO_MINIMO_COMPRESION = int(os.environ.get('COMPRESION_TAMANO_MINIMO', 1024))
+MAX_CUERPOS_COMPRIMIDOS = int(os.environ.get('COMPRESION_CACHE_MAX', 256))
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 5
+
+_comprimidos = OrderedDict()
+_candado = threading.Lock()
+
+
+def elegir_codificacion(accept_encoding):
+    aceptadas = {}
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        if parametros.strip().startswith('q='):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            aceptadas[nombre.lower()] = calidad
+    if brotli is not None and aceptadas.get('br', 0) > 0:
+        return 'br'
+    if aceptadas.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def comprimir(cuerpo, codificacion, etag):
+    clave = (etag, codificacion)
+    with _candado:
+        comprimido = _comprimidos.get(clave)
+        if comprimido is not None:
+            _comprimidos.move_to_end(clave)
+            return comprimido
+
+    if codificacion == 'br':
+        comprimido = brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    else:
+        comprimido = gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+
+    with _candado:
+        _comprimidos[clave] = comprimido
+        while len(_comprimidos) > MAX_CUERPOS_COMPRIMIDOS:
+            _comprimidos.popitem(last=False)
+    return comprimido
+
+
+def etiquetas_if_none_match(valor):
+    return {etiqueta.strip() for etiqueta in valor.split(',') if etiqueta.strip()}
+
+
+# Decorador para las vistas de listado: aplica ETag, 304 y compresión a las
+# respuestas 200
+def respuesta_catalogo(vista):
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        respuesta = make_response(vista(*args, **kwargs))
+        if respuesta.status_code != 200 or respuesta.is_streamed:
+            return respuesta
+
+        cuerpo = respuesta.get_data()
+        base = hashlib.sha256(cuerpo).hexdigest()[:32]
+        codificacion = None
+        if len(cuerpo) >= TAMANO_MINIMO_COMPRESION:
+            codificacion = elegir_codificacion(request.headers.get('Accept-Encoding', ''))
+        etag = f'"{base}-{codificacion}"' if codificacion else f'"{base}"'
+
+        respuesta.headers['ETag'] = etag
+        respuesta.headers['Vary'] = 'Accept-Encoding'
+        respuesta.headers['Cache-Control'] = 'no-cache'
+
+        solicitadas = etiquetas_if_none_match(request.headers.get('If-None-Match', ''))
+        if etag in solicitadas or '*' in solicitadas:
+            respuesta.status_code = 304
+            respuesta.set_data(b'')
+            respuesta.headers.pop('Content-Length', None)
+            return respuesta
+
+        if codificacion:
+            respuesta.set_data(comprimir(cuerpo, codificacion, base))
+            respuesta.headers['Content-Encoding'] = codificacion
+        return respuesta
+    return envoltura
@@ -0,0 +1,254 @@
+import re
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+# Resúmenes de ventas mantenidos en cada alta y anulación, para que los
+# reportes no tengan que recorrer 'ventas' ni cruzar con 'productos'.
+#
+# Todo vive en la colección 'resumen_ventas', un documento por combinación:
+#   tipo 'dia'        clave = día                    (incluye la cantidad de ventas)
+#   tipo 'producto'   clave = id del producto, por día
+#   tipo 'categoria'  clave = nombre de la categoría, por día
+# con los acumulados unidades, ingresos, iva, costo y margen.
+#
+# Cada venta se suma con los datos copiados en sus líneas (precio, IVA, costo
+# y categoría al momento de la venta) y la anulación resta exactamente esos
+# mismos importes. La suma se aplica después de confirmar la venta, fuera de
+# su transacción, porque todas las ventas del día escriben el mismo documento.
+#
+# Los precios se toman como IVA incluido: iva = ingresos * tasa / (100 + tasa)
+# y margen = ingresos - iva - costo, con costo = precioCompra * unidades.
+#
+#   python resumenes.py reconstruir     recalcula todo desde 'ventas'
+#
+# La reconstrucción reemplaza los documentos y borra los que no recalculó;
+# conviene correrla sin ventas en curso.
+
+CAMPOS = ('unidades', 'ingresos', 'iva', 'costo', 'margen')
+
+
+# '10%', '10', 'IVA 5' -> 10.0 / 5.0; 'Exenta' o vacío -> 0
+def tasa_iva(iva):
+    coincidencia = re.search(r'\d+(?:[.,]\d+)?', str(iva or ''))
+    return float(coincidencia.group().replace(',', '.')) if coincidencia else 0.0
+
+
+def dia_de(fecha):
+    return str(fecha)[:10]
+
+
+def importes_linea(linea, producto):
+    # Se prefieren los datos guardados en la línea; si faltan, los del producto
+    cantidad = linea.get('cantidadVendida', 0)
+    precio = linea.get('precioVenta', producto.get('precioVenta', 0)) or 0
+    tasa = tasa_iva(linea.get('Iva', producto.get('Iva')))
+    costo = cantidad * (linea.get('precioCompra', producto.get('precioCompra', 0)) or 0)
+    ingresos = cantidad * precio
+    iva = ingresos * tasa / (100 + tasa) if tasa else 0.0
+    return {
+        'unidades': cantidad,
+        'ingresos': ingresos,
+        'iva': iva,
+        'costo': costo,
+        'margen': ingresos - iva - costo,
+    }
+
+
+# Las líneas de ventas nuevas traen los datos del producto al momento de la
+# venta (ver inventario.completar_lineas_venta); las anteriores, no todos
+def linea_completa(linea):
+    return all(campo in linea for campo in ('precioVenta', 'Iva', 'precioCompra', 'Categoria'))
+
+
+def sumar(acumulado, importes):
+    for campo in CAMPOS:
+        acumulado[campo] = acumulado.get(campo, 0) + importes.get(campo, 0)
+
+
+# Aplica una venta a los resúmenes (signo=-1 para una anulación). 'productos'
+# es {ObjectId: documento}, como lo devuelve buscar_productos, y solo completa
+# los datos que falten en las líneas (ventas anteriores a esas copias)
+def registrar_venta(resumen_collection, venta, productos, signo=1, session=None):
+    dia = dia_de(venta['fechaVenta'])
+    total_dia = {}
+    por_producto = {}
+    por_categoria = {}
+    for linea in venta['productos']:
+        producto = productos.get(ObjectId(linea['idProducto']), {})
+        importes = importes_linea(linea, producto)
+        sumar(total_dia, importes)
+
+        clave_producto = str(linea['idProducto'])
+        acumulado, _ = por_producto.setdefault(clave_producto, ({}, linea.get('nombre', producto.get('nombre'))))
+        sumar(acumulado, importes)
+
+        categoria = linea.get('Categoria', producto.get('Categoria')) or 'Sin categoría'
+        sumar(por_categoria.setdefault(categoria, {}), importes)
+
+    def operacion(tipo, clave, acumulado, extra=None):
+        incremento = {campo: signo * acumulado[campo] for campo in CAMPOS}
+        if tipo == 'dia':
+            incremento['ventas'] = signo
+        actualizacion = {'$inc': incremento, '$setOnInsert': {'tipo': tipo, 'clave': clave, 'dia': dia}}
+        if extra:
+            actualizacion['$set'] = extra
+        return UpdateOne({'_id': f'{tipo}:{dia}:{clave}'}, actualizacion, upsert=True)
+
+    operaciones = [operacion('dia', dia, total_dia)]
+    operaciones += [operacion('producto', clave, acumulado, {'nombre': nombre} if nombre else None)
+                    for clave, (acumulado, nombre) in por_producto.items()]
+    operaciones += [operacion('categoria', clave, acumulado) for clave, acumulado in por_categoria.items()]
+    resumen_collection.bulk_write(operaciones, ordered=False, session=session)
+
+
+def filtro_rango(tipo, desde=None, hasta=None):
+    filtro = {'tipo': tipo}
+    rango = {}
+    if desde:
+        rango['$gte'] = dia_de(desde)
+    if hasta:
+        rango['$lte'] = dia_de(hasta)
+    if rango:
+        filtro['dia'] = rango
+    return filtro
+
+
+def redondear(documento):
+    for campo in CAMPOS[1:]:
+        if campo in documento:
+            documento[campo] = round(documento[campo], 2)
+    return documento
+
+
+def reporte_diario(resumen_collection, desde=None, hasta=None):
+    dias = []
+    totales = {campo: 0 for campo in CAMPOS}
+    totales['ventas'] = 0
+    for documento in resumen_collection.find(filtro_rango('dia', desde, hasta), {'_id': 0, 'tipo': 0, 'clave': 0, 'reconstruido': 0}).sort('dia', 1):
+        sumar(totales, documento)
+        totales['ventas'] += documento.get('ventas', 0)
+        dias.append(redondear(documento))
+    return {'dias': dias, 'totales': redondear(totales)}
+
+
+# Acumulados por producto o categoría en el rango, ordenados por 'orden'
+def reporte_agrupado(resumen_collection, tipo, desde=None, hasta=None, orden='ingresos', limite=20):
+    grupo = {'_id': '$clave'}
+    for campo in CAMPOS:
+        grupo[campo] = {'$sum': f'${campo}'}
+    if tipo == 'producto':
+        grupo['nombre'] = {'$last': '$nombre'}
+    pipeline = [
+        {'$match': filtro_rango(tipo, desde, hasta)},
+        {'$sort': {'dia': 1}},
+        {'$group': grupo},
+        {'$sort': {orden: -1, '_id': 1}},
+    ]
+    if limite:
+        pipeline.append({'$limit': limite})
+
+    campo_clave = 'idProducto' if tipo == 'producto' else 'categoria'
+    resultado = []
+    for documento in resumen_collection.aggregate(pipeline):
+        documento[campo_clave] = documento.pop('_id')
+        resultado.append(redondear(documento))
+    return resultado
+
+
+# Etapas comunes de la reconstrucción: una fila por línea de venta activa con
+# sus importes, usando los datos de la línea o, si faltan, los del producto
+def etapas_lineas():
+    return [
+        {'$match': {'estado': {'$ne': 'anulado'}}},
+        {'$unwind': '$productos'},
+        {'$addFields': {'_idProducto': {'$convert': {'input': '$productos.idProducto', 'to': 'objectId', 'onError': None}}}},
+        {'$lookup': {'from': 'productos', 'localField': '_idProducto', 'foreignField': '_id', 'as': '_producto'}},
+        {'$set': {'_producto': {'$ifNull': [{'$first': '$_producto'}, {}]}}},
+        {'$set': {
+            'dia': {'$substrCP': ['$fechaVenta', 0, 10]},
+            'unidades': '$productos.cantidadVendida',
+            '_precio': {'$ifNull': ['$productos.precioVenta', {'$ifNull': ['$_producto.precioVenta', 0]}]},
+            '_precioCompra': {'$ifNull': ['$productos.precioCompra', {'$ifNull': ['$_producto.precioCompra', 0]}]},
+            '_tasa': {'$let': {
+                'vars': {'r': {'$regexFind': {
+                    'input': {'$toString': {'$ifNull': ['$productos.Iva', {'$ifNull': ['$_producto.Iva', '']}]}},
+                    'regex': r'\d+(\.\d+)?'
+                }}},
+                'in': {'$cond': [{'$eq': ['$$r', None]}, 0, {'$toDouble': '$$r.match'}]}
+            }},
+        }},
+        {'$set': {
+            'ingresos': {'$multiply': ['$unidades', '$_precio']},
+            'costo': {'$multiply': ['$unidades', '$_precioCompra']},
+        }},
+        {'$set': {'iva': {'$divide': [{'$multiply': ['$ingresos', '$_tasa']}, {'$add': [100, '$_tasa']}]}}},
+        {'$set': {'margen': {'$subtract': [{'$subtract': ['$ingresos', '$iva']}, '$costo']}}},
+    ]
+
+
+def sumas():
+    return {campo: {'$sum': f'${campo}'} for campo in CAMPOS}
+
+
+def reconstruir(db):
+    resumen_collection = db['resumen_ventas']
+    marca = datetime.now(timezone.utc)
+    salida = {'$merge': {'into': 'resumen_ventas', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+
+    # Por producto y día
+    db['ventas'].aggregate(etapas_lineas() + [
+        {'$group': dict({'_id': {'dia': '$dia', 'clave': '$productos.idProducto'},
+                         'nombre': {'$last': {'$ifNull': ['$productos.nombre', '$_producto.nombre']}}}, **sumas())},
+        {'$project': dict({'_id': {'$concat': ['producto:', '$_id.dia', ':', {'$toString': '$_id.clave'}]},
+                           'tipo': 'producto', 'dia': '$_id.dia', 'clave': {'$toString': '$_id.clave'},
+                           'nombre': 1, 'reconstruido': marca}, **{c: 1 for c in CAMPOS})},
+        salida,
+    ], allowDiskUse=True)
+
+    # Por categoría y día
+    db['ventas'].aggregate(etapas_lineas() + [
+        {'$group': dict({'_id': {'dia': '$dia', 'clave': {'$ifNull': ['$productos.Categoria', {'$ifNull': ['$_producto.Categoria', 'Sin categoría']}]}}}, **sumas())},
+        {'$project': dict({'_id': {'$concat': ['categoria:', '$_id.dia', ':', '$_id.clave']},
+                           'tipo': 'categoria', 'dia': '$_id.dia', 'clave': '$_id.clave',
+                           'reconstruido': marca}, **{c: 1 for c in CAMPOS})},
+        salida,
+    ], allowDiskUse=True)
+
+    # Por día, con la cantidad de ventas
+    db['ventas'].aggregate(etapas_lineas() + [
+        {'$group': dict({'_id': {'dia': '$dia', 'venta': '$_id'}}, **sumas())},
+        {'$group': dict({'_id': '$_id.dia', 'ventas': {'$sum': 1}}, **sumas())},
+        {'$project': dict({'_id': {'$concat': ['dia:', '$_id', ':', '$_id']},
+                           'tipo': 'dia', 'dia': '$_id', 'clave': '$_id', 'ventas': 1,
+                           'reconstruido': marca}, **{c: 1 for c in CAMPOS})},
+        salida,
+    ], allowDiskUse=True)
+
+    # Lo que no se tocó corresponde a días o productos que ya no tienen ventas activas
+    eliminados = resumen_collection.delete_many({'reconstruido': {'$ne': marca}}).deleted_count
+    return {
+        'documentos': resumen_collection.count_documents({}),
+        'eliminados': eliminados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resúmenes de ventas.')
+    parser.add_argument('comando', choices=('reconstruir',))
+    args = parser.parse_args()
+
+    from conexion import ConexionMongo
+    db = ConexionMongo.desde_entorno().db
+
+    if args.comando == 'reconstruir':
+        print(json.dumps(reconstruir(db), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carga_mixta import multipart, percentil
+from escenarios_benchmark import ESCENARIOS, cargar_imagenes
+from generar_datos import generar, leer_escala, agregar_opciones_escala, ESCALAS
+
+# Pruebas de rendimiento reproducibles de la API. Genera los datos (ver
+# generar_datos.py), ejecuta los escenarios de escenarios_benchmark.py y guarda
+# un reporte JSON con el commit, la configuración, las peticiones por segundo
+# y los percentiles p50/p95/p99 de cada escenario y de cada ruta.
+#
+# Destinos:
+#   memoria   la aplicación en este proceso con el cliente de pruebas de Flask
+#             y la base en memoria (mongomock://, requiere mongomock)
+#   mongod    la aplicación en este proceso contra un mongod local
+#             (MONGO_URI, por defecto mongodb://localhost:27017)
+#   url       un despliegue en marcha (--url) por HTTP; los datos se generan
+#             aparte con generar_datos.py
+#
+#   python scripts/benchmark.py correr --destino mongod --escala mediana
+#   python scripts/benchmark.py correr --destino url --url http://localhost:5000 --escenarios catalogo historial
+#   python scripts/benchmark.py comparar resultados_benchmark/antes.json resultados_benchmark/despues.json
+#
+# comparar termina con código 1 si algún escenario empeora más que la
+# tolerancia, para usarlo entre dos commits.
+
+DIRECTORIO_RESULTADOS = 'resultados_benchmark'
+MONGOD_LOCAL = 'mongodb://localhost:27017'
+BASE_BENCHMARK = 'benchmark'
+# Variables de entorno que cambian los resultados y se guardan en el reporte
+PREFIJOS_ENTORNO = ('ADMISION', 'VISION', 'MONGO_POOL', 'MONGO_LECTURA', 'VENTAS_', 'SECUENCIA_', 'LISTADO_',
+                    'COMPRESION_', 'BUSQUEDA_', 'CACHE_', 'PLAZO', 'EXPORTACION_', 'GUNICORN_')
+
+
+# Transporte en proceso: un cliente de pruebas de Flask por hilo
+class TransporteLocal:
+    def __init__(self, app):
+        self.app = app
+
+    def sesion(self):
+        cliente = self.app.test_client()
+
+        def enviar(peticion, cabeceras):
+            opciones = {'method': peticion['metodo'], 'headers': cabeceras}
+            if 'json' in peticion:
+                opciones['json'] = peticion['json']
+            if 'archivos' in peticion:
+                opciones['data'] = {campo: (io.BytesIO(contenido), nombre)
+                                    for campo, (nombre, contenido) in peticion['archivos'].items()}
+                opciones['content_type'] = 'multipart/form-data'
+            respuesta = cliente.open(peticion['ruta'], **opciones)
+            try:
+                # get_data() también consume las respuestas en streaming
+                return respuesta.status_code, dict(respuesta.headers), len(respuesta.get_data())
+            finally:
+                respuesta.close()
+        return enviar
+
+
+# Transporte HTTP contra un despliegue en marcha
+class TransporteHttp:
+    def __init__(self, url, timeout=120):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def sesion(self):
+        def enviar(peticion, cabeceras):
+            cabeceras = dict(cabeceras)
+            cuerpo = None
+            if 'json' in peticion:
+                cuerpo = json.dumps(peticion['json']).encode()
+                cabeceras['Content-Type'] = 'application/json'
+            if 'archivos' in peticion:
+                campo, (nombre, contenido) = next(iter(peticion['archivos'].items()))
+                cuerpo, cabeceras['Content-Type'] = multipart(campo, nombre, contenido)
+            solicitud = urllib.request.Request(self.url + peticion['ruta'], data=cuerpo,
+                                               method=peticion['metodo'], headers=cabeceras)
+            try:
+                with urllib.request.urlopen(solicitud, timeout=self.timeout) as respuesta:
+                    return respuesta.status, dict(respuesta.headers), len(respuesta.read())
+            except urllib.error.HTTPError as e:
+                return e.code, dict(e.headers), len(e.read())
+        return enviar
+
+
+# Datos que usan los escenarios, leídos de la API: así el contexto es el mismo
+# con cualquier destino
+def armar_contexto(obtener, fecha_fin, imagenes):
+    productos = [p for p in obtener('/productos/activos?limit=1000') if not p.get('bajoStock')]
+    primera_venta = obtener('/ventas?limit=1')
+    return {
+        'productos': productos,
+        'clientes': obtener('/clientes?limit=1000'),
+        'empresas': obtener('/empresas'),
+        'desde': primera_venta[0]['fechaVenta'][:10] if primera_venta else fecha_fin,
+        'hasta': fecha_fin,
+        'imagenes': imagenes,
+    }
+
+
+def obtener_local(app):
+    cliente = app.test_client()
+
+    def obtener(ruta):
+        respuesta = cliente.get(ruta)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'GET {ruta} respondió {respuesta.status_code}')
+        return respuesta.get_json()
+    return obtener
+
+
+def obtener_http(url):
+    def obtener(ruta):
+        with urllib.request.urlopen(url.rstrip('/') + ruta, timeout=60) as respuesta:
+            return json.loads(respuesta.read())
+    return obtener
+
+
+def resumir(latencias, codigos, tamanos, segundos):
+    ok = len(latencias)
+    return {
+        'peticiones': ok + sum(n for codigo, n in codigos.items() if not es_exito(codigo)),
+        'ok': ok,
+        'errores': sum(n for codigo, n in codigos.items() if not es_exito(codigo)),
+        'porSegundo': round(ok / segundos, 3) if segundos else 0,
+        'p50Ms': round(percentil(latencias, 50), 3),
+        'p95Ms': round(percentil(latencias, 95), 3),
+        'p99Ms': round(percentil(latencias, 99), 3),
+        'maxMs': round(max(latencias), 3) if latencias else 0,
+        'bytes': sum(tamanos),
+        'codigos': dict(sorted(codigos.items())),
+    }
+
+
+# Los códigos se guardan como texto; un error de conexión guarda el nombre de la excepción
+def es_exito(codigo):
+    return str(codigo).isdigit() and int(codigo) < 400
+
+
+# Ejecuta un escenario: 'peticiones' en total repartidas entre los clientes
+# (ráfaga) o, sin ellas, durante 'duracion' segundos (sondeo). Antes se
+# descartan 'calentamiento' peticiones para cargar cachés e índices en memoria
+def correr_escenario(transporte, escenario, contexto, clientes, peticiones=None, duracion=None,
+                     calentamiento=0, semilla=0):
+    registros = {}
+    candado = threading.Lock()
+    restantes = [peticiones]
+
+    def ejecutar(enviar, rng, estado, registrar=True):
+        peticion = escenario['armar'](rng, contexto, estado)
+        cabeceras = {}
+        etags = estado.setdefault('etags', {})
+        if peticion.get('revalidar') and peticion['ruta'] in etags:
+            cabeceras['If-None-Match'] = etags[peticion['ruta']]
+        inicio = time.perf_counter()
+        try:
+            codigo, cabeceras_respuesta, tamano = enviar(peticion, cabeceras)
+        except Exception as e:
+            codigo, cabeceras_respuesta, tamano = type(e).__name__, {}, 0
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        if peticion.get('revalidar') and cabeceras_respuesta.get('ETag'):
+            etags[peticion['ruta']] = cabeceras_respuesta['ETag']
+        if not registrar:
+            return
+        with candado:
+            registro = registros.setdefault(peticion['nombre'], {'latencias': [], 'codigos': {}, 'tamanos': []})
+            registro['codigos'][str(codigo)] = registro['codigos'].get(str(codigo), 0) + 1
+            if es_exito(codigo):
+                registro['latencias'].append(duracion_ms)
+                registro['tamanos'].append(tamano)
+
+    def tomar_turno():
+        with candado:
+            if restantes[0] <= 0:
+                return False
+            restantes[0] -= 1
+            return True
+
+    if calentamiento:
+        enviar, rng, estado = transporte.sesion(), random.Random(semilla - 1), {}
+        for _ in range(calentamiento):
+            ejecutar(enviar, rng, estado, registrar=False)
+
+    fin = time.perf_counter() + (duracion or 0)
+
+    def cliente(numero):
+        enviar, rng, estado = transporte.sesion(), random.Random(semilla * 1000 + numero), {}
+        while tomar_turno() if peticiones else time.perf_counter() < fin:
+            ejecutar(enviar, rng, estado)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    todas = {'latencias': [], 'codigos': {}, 'tamanos': []}
+    for registro in registros.values():
+        todas['latencias'] += registro['latencias']
+        todas['tamanos'] += registro['tamanos']
+        for codigo, n in registro['codigos'].items():
+            todas['codigos'][codigo] = todas['codigos'].get(codigo, 0) + n
+    reporte = dict(resumir(todas['latencias'], todas['codigos'], todas['tamanos'], segundos),
+                   descripcion=escenario['descripcion'], clientes=clientes, segundos=round(segundos, 3))
+    reporte['rutas'] = {nombre: resumir(r['latencias'], r['codigos'], r['tamanos'], segundos)
+                        for nombre, r in sorted(registros.items())}
+    return reporte
+
+
+def git(*argumentos):
+    try:
+        return subprocess.run(['git', *argumentos], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def preparar_destino(args):
+    if args.destino == 'url':
+        return TransporteHttp(args.url), obtener_http(args.url), None
+
+    from conexion import BASE_POR_DEFECTO
+
+    # La aplicación lee la configuración al importarse
+    if args.destino == 'memoria':
+        os.environ['MONGO_URI'] = 'mongomock://'
+    else:
+        os.environ.setdefault('MONGO_URI', MONGOD_LOCAL)
+    os.environ.setdefault('MONGO_DB', BASE_BENCHMARK)
+    # Ni mongomock ni un mongod sin replica set tienen transacciones, y sin
+    # ellas la numeración estricta de facturas no se admite (ver app.py)
+    os.environ.setdefault('VENTAS_TRANSACCIONES', '0')
+    if os.environ['VENTAS_TRANSACCIONES'] == '0':
+        os.environ.setdefault('SECUENCIA_FACTURA_ESTRICTA', '0')
+    # Los escenarios también escriben (ventas), así que nunca sobre la base por defecto
+    if os.environ['MONGO_DB'] == BASE_POR_DEFECTO:
+        raise SystemExit(f"MONGO_DB apunta a la base por defecto '{BASE_POR_DEFECTO}'; use otra base.")
+
+    import app as aplicacion
+
+    datos = None
+    if not args.sin_generar:
+        escala = leer_escala(args.escala, {clave: getattr(args, clave) for clave in ESCALAS['pequena']})
+        inicio = time.perf_counter()
+        datos = generar(aplicacion.db, escala, semilla=args.semilla, fecha_fin=args.fecha_fin)
+        datos['segundos'] = round(time.perf_counter() - inicio, 3)
+        print(f"Datos generados en {datos['segundos']} s: {json.dumps(datos['documentos'])}", file=sys.stderr)
+    return TransporteLocal(aplicacion.app), obtener_local(aplicacion.app), datos
+
+
+def correr(args):
+    nombres = args.escenarios or list(ESCENARIOS)
+    transporte, obtener, datos = preparar_destino(args)
+    imagenes = cargar_imagenes(args.imagenes) if 'reconocimiento' in nombres else []
+    contexto = armar_contexto(obtener, args.fecha_fin, imagenes)
+    if not contexto['productos'] or not contexto['clientes'] or not contexto['empresas']:
+        print('No hay productos, clientes o empresas; genere los datos primero.', file=sys.stderr)
+        return 1
+
+    escenarios = {}
+    for nombre in nombres:
+        escenario = ESCENARIOS[nombre]
+        clientes = args.concurrencia or escenario['clientes']
+        duracion = args.duracion or escenario.get('duracion')
+        peticiones = args.peticiones or (None if args.duracion else escenario.get('peticiones'))
+        print(f'Escenario {nombre}: {clientes} clientes, '
+              + (f'{peticiones} peticiones' if peticiones else f'{duracion} s'), file=sys.stderr)
+        escenarios[nombre] = correr_escenario(transporte, escenario, contexto, clientes, peticiones, duracion,
+                                              calentamiento=args.calentamiento, semilla=args.semilla)
+
+    commit = git('rev-parse', 'HEAD')
+    reporte = {
+        'commit': commit,
+        'cambiosSinCommit': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'etiqueta': args.etiqueta,
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'destino': args.destino,
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'entorno': {clave: valor for clave, valor in sorted(os.environ.items()) if clave.startswith(PREFIJOS_ENTORNO)},
+        'datos': datos,
+        'escenarios': escenarios,
+    }
+
+    os.makedirs(args.salida, exist_ok=True)
+    marca = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    partes = [marca, (commit or 'sin-git')[:10], args.destino] + ([args.etiqueta] if args.etiqueta else [])
+    ruta = os.path.join(args.salida, '-'.join(partes) + '.json')
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+    for nombre, resultado in escenarios.items():
+        print(f"{nombre:15s} {resultado['porSegundo']:10.1f}/s  p50 {resultado['p50Ms']:8.1f} ms  "
+              f"p95 {resultado['p95Ms']:8.1f} ms  p99 {resultado['p99Ms']:8.1f} ms  errores {resultado['errores']}")
+    print(f'Reporte: {ruta}')
+    return 0
+
+
+def variacion(antes, despues):
+    if not antes:
+        return None
+    return (despues - antes) * 100.0 / antes
+
+
+# Empeora si bajan las peticiones por segundo o suben los percentiles más que
+# la tolerancia (en %)
+def comparar_reportes(base, nuevo, tolerancia):
+    filas, regresiones = [], []
+    for nombre in base['escenarios']:
+        if nombre not in nuevo['escenarios']:
+            continue
+        antes, despues = base['escenarios'][nombre], nuevo['escenarios'][nombre]
+        for metrica, mayor_es_mejor in (('porSegundo', True), ('p50Ms', False), ('p95Ms', False), ('p99Ms', False)):
+            cambio = variacion(antes[metrica], despues[metrica])
+            empeora = cambio is not None and (-cambio if mayor_es_mejor else cambio) > tolerancia
+            filas.append((nombre, metrica, antes[metrica], despues[metrica], cambio, empeora))
+            if empeora:
+                regresiones.append(f'{nombre}.{metrica}')
+        if despues['errores'] > antes['errores']:
+            filas.append((nombre, 'errores', antes['errores'], despues['errores'], None, True))
+            regresiones.append(f'{nombre}.errores')
+    return filas, regresiones
+
+
+def comparar(args):
+    with open(args.base, encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    with open(args.nuevo, encoding='utf-8') as archivo:
+        nuevo = json.load(archivo)
+
+    print(f"base:  {(base.get('commit') or '?')[:10]} {base.get('fecha')} {base.get('destino')}")
+    print(f"nuevo: {(nuevo.get('commit') or '?')[:10]} {nuevo.get('fecha')} {nuevo.get('destino')}")
+    if base.get('entorno') != nuevo.get('entorno') or (base.get('datos') or {}).get('escala') != (nuevo.get('datos') or {}).get('escala'):
+        print('Atención: los reportes no usan la misma configuración o escala de datos.')
+
+    filas, regresiones = comparar_reportes(base, nuevo, args.tolerancia)
+    for nombre, metrica, antes, despues, cambio, empeora in filas:
+        texto_cambio = f'{cambio:+7.1f} %' if cambio is not None else '       -'
+        print(f"{nombre:15s} {metrica:10s} {antes:12.3f} {despues:12.3f} {texto_cambio}{'  EMPEORA' if empeora else ''}")
+    if regresiones:
+        print(f"Regresiones (tolerancia {args.tolerancia} %): {', '.join(regresiones)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pruebas de rendimiento reproducibles de la API.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    parser_correr = subparsers.add_parser('correr', help='Generar datos, ejecutar escenarios y guardar el reporte.')
+    parser_correr.add_argument('--destino', choices=('memoria', 'mongod', 'url'), default='memoria')
+    parser_correr.add_argument('--url', default='http://localhost:5000')
+    parser_correr.add_argument('--escenarios', nargs='+', choices=tuple(ESCENARIOS))
+    parser_correr.add_argument('--sin-generar', action='store_true', help='Usar los datos que ya están en la base.')
+    parser_correr.add_argument('--concurrencia', type=int, help='Clientes simultáneos de cada escenario (por defecto, los del escenario).')
+    parser_correr.add_argument('--peticiones', type=int, help='Peticiones totales de cada escenario.')
+    parser_correr.add_argument('--duracion', type=float, help='Segundos de cada escenario, en lugar de un total de peticiones.')
+    parser_correr.add_argument('--calentamiento', type=int, default=10, help='Peticiones previas que no se miden.')
+    parser_correr.add_argument('--imagenes', help='Imagen o carpeta para el reconocimiento; sin ella, imágenes sintéticas.')
+    parser_correr.add_argument('--salida', default=DIRECTORIO_RESULTADOS)
+    parser_correr.add_argument('--etiqueta', help='Texto libre que se agrega al reporte y al nombre del archivo.')
+    agregar_opciones_escala(parser_correr)
+
+    parser_comparar = subparsers.add_parser('comparar', help='Comparar dos reportes.')
+    parser_comparar.add_argument('base')
+    parser_comparar.add_argument('nuevo')
+    parser_comparar.add_argument('--tolerancia', type=float, default=10.0, help='Cambio admitido en %%.')
+
+    args = parser.parse_args()
+    if args.comando == 'correr':
+        return correr(args)
+    return comparar(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+
+# Carga mixta contra un despliegue en marcha: listados, datos de referencia,
+# altas de clientes y reconocimiento de imágenes, con 'clientes' hilos durante
+# 'duracion' segundos. Reporta peticiones por segundo y percentiles por tipo.
+#
+#   python scripts/carga_mixta.py --url http://localhost:5000 --duracion 60 --clientes 32 --imagen foto.jpg
+
+# (nombre, peso, método, ruta)
+MEZCLA = [
+    ('productos', 45, 'GET', '/productos?limit=50'),
+    ('categorias', 15, 'GET', '/categorias/activas'),
+    ('compras', 10, 'GET', '/compras?limit=200'),
+    ('health', 5, 'GET', '/health'),
+    ('alta_cliente', 10, 'POST', '/clientes'),
+    ('reconocer', 15, 'POST', '/reconocer-imagen'),
+]
+
+
+def multipart(campo, nombre_archivo, contenido):
+    limite = uuid.uuid4().hex
+    cuerpo = (
+        f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nombre_archivo}"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + contenido + f'\r\n--{limite}--\r\n'.encode()
+    return cuerpo, f'multipart/form-data; boundary={limite}'
+
+
+def armar_peticion(url, nombre, metodo, ruta, imagen):
+    if nombre == 'reconocer':
+        cuerpo, tipo = multipart('imagen', 'imagen.jpg', imagen)
+        return urllib.request.Request(url + ruta, data=cuerpo, method=metodo, headers={'Content-Type': tipo})
+    if nombre == 'alta_cliente':
+        cuerpo = json.dumps({'nombreCliente': 'Carga', 'rucCliente': f'carga-{uuid.uuid4().hex[:12]}', 'telefonoCliente': '0000'}).encode()
+        return urllib.request.Request(url + ruta, data=cuerpo, method=metodo, headers={'Content-Type': 'application/json'})
+    return urllib.request.Request(url + ruta, method=metodo)
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga mixta de CRUD y reconocimiento.')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--duracion', type=float, default=30)
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--imagen', help='Imagen para /reconocer-imagen; sin ella no se envían reconocimientos.')
+    parser.add_argument('--sin-escrituras', action='store_true', help='No crear clientes.')
+    args = parser.parse_args()
+
+    imagen = open(args.imagen, 'rb').read() if args.imagen else None
+    mezcla = [m for m in MEZCLA
+              if not (m[0] == 'reconocer' and imagen is None)
+              and not (m[0] == 'alta_cliente' and args.sin_escrituras)]
+    nombres = [m[0] for m in mezcla]
+    pesos = [m[1] for m in mezcla]
+    por_nombre = {m[0]: m for m in mezcla}
+
+    latencias = {nombre: [] for nombre in nombres}
+    errores = {nombre: {} for nombre in nombres}
+    candado = threading.Lock()
+    fin = time.perf_counter() + args.duracion
+
+    def cliente():
+        rng = random.Random()
+        while time.perf_counter() < fin:
+            nombre = rng.choices(nombres, pesos)[0]
+            _, _, metodo, ruta = por_nombre[nombre]
+            peticion = armar_peticion(args.url, nombre, metodo, ruta, imagen)
+            inicio = time.perf_counter()
+            estado = None
+            try:
+                with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                    respuesta.read()
+            except urllib.error.HTTPError as e:
+                estado = e.code
+            except Exception as e:
+                estado = type(e).__name__
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            with candado:
+                if estado is None:
+                    latencias[nombre].append(duracion_ms)
+                else:
+                    errores[nombre][str(estado)] = errores[nombre].get(str(estado), 0) + 1
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente) for _ in range(args.clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+
+    total = sum(len(v) for v in latencias.values())
+    reporte = {
+        'clientes': args.clientes,
+        'segundos': transcurrido,
+        'peticionesPorSegundo': total / transcurrido,
+        'rutas': {
+            nombre: {
+                'ok': len(latencias[nombre]),
+                'porSegundo': len(latencias[nombre]) / transcurrido,
+                'p50Ms': percentil(latencias[nombre], 50),
+                'p95Ms': percentil(latencias[nombre], 95),
+                'p99Ms': percentil(latencias[nombre], 99),
+                'errores': errores[nombre],
+            }
+            for nombre in nombres
+        },
+    }
+    print(json.dumps(reporte, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import resource
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Compara los motores de inferencia contra la ruta Keras original:
+# latencia por lote, memoria residual y coincidencia del top-3.
+#
+#   python scripts/comparar_motores.py --imagenes fotos/ --lote 1 --repeticiones 50
+#
+# La memoria se mide como pico de RSS del proceso; para aislar un motor,
+# correr uno por proceso guardando primero el top-3 de Keras:
+#
+#   python scripts/comparar_motores.py --motores keras --referencia keras.json
+#   python scripts/comparar_motores.py --motores tflite-int8 --referencia keras.json
+#
+# La coincidencia siempre se mide contra Keras: contra --referencia si el
+# archivo existe (debe ser de las mismas imágenes) o, si no, con el motor
+# keras de esta corrida. Sin keras en --motores ni archivo, Keras se carga al
+# final, después de medir la memoria de los demás motores.
+
+
+def cargar_imagenes(carpeta, cantidad):
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+    from tensorflow.keras.preprocessing import image
+
+    if not carpeta:
+        # Sin carpeta se usan imágenes sintéticas reproducibles
+        rng = np.random.default_rng(0)
+        return preprocess_input(rng.uniform(0, 255, (cantidad, 224, 224, 3)).astype(np.float32))
+
+    arreglos = []
+    for nombre in sorted(os.listdir(carpeta))[:cantidad]:
+        img = image.load_img(os.path.join(carpeta, nombre), target_size=(224, 224))
+        arreglos.append(image.img_to_array(img))
+    return preprocess_input(np.stack(arreglos))
+
+
+def rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def top3(predicciones):
+    return [[int(c) for c in np.argsort(fila)[::-1][:3]] for fila in predicciones]
+
+
+def leer_referencia(ruta, args):
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    if (datos.get('imagenes'), datos.get('cantidad')) != (args.imagenes, args.cantidad):
+        raise SystemExit(f"La referencia {ruta} es de otras imágenes (--imagenes {datos.get('imagenes')} "
+                         f"--cantidad {datos.get('cantidad')}).")
+    return datos['top3']
+
+
+def guardar_referencia(ruta, args, clases):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'imagenes': args.imagenes, 'cantidad': args.cantidad, 'top3': clases}, f)
+
+
+def coincidencias(clases, referencia):
+    return (float(np.mean([a[0] == b[0] for a, b in zip(clases, referencia)])),
+            float(np.mean([set(a) == set(b) for a, b in zip(clases, referencia)])))
+
+
+def medir(motor, imagenes, tamano_lote, repeticiones):
+    lotes = [imagenes[i:i + tamano_lote] for i in range(0, len(imagenes), tamano_lote)]
+    latencias = []
+    predicciones = []
+    for repeticion in range(repeticiones):
+        for lote in lotes:
+            inicio = time.perf_counter()
+            salida = motor.predecir(lote)
+            latencias.append((time.perf_counter() - inicio) * 1000.0)
+            if repeticion == 0:
+                predicciones.append(salida)
+    latencias = np.array(latencias)
+    return {
+        'p50Ms': float(np.percentile(latencias, 50)),
+        'p95Ms': float(np.percentile(latencias, 95)),
+        'promedioMs': float(latencias.mean()),
+        'imagenesPorSegundo': float(len(imagenes) * repeticiones / (latencias.sum() / 1000.0)),
+    }, np.concatenate(predicciones)
+
+
+def main():
+    from motores_inferencia import MOTORES, crear_motor
+
+    parser = argparse.ArgumentParser(description='Compara los motores de inferencia de MobileNetV2.')
+    parser.add_argument('--imagenes', help='Carpeta con imágenes de prueba (por defecto, sintéticas).')
+    parser.add_argument('--cantidad', type=int, default=32)
+    parser.add_argument('--lote', type=int, default=1)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--hilos', type=int, default=None)
+    parser.add_argument('--motores', default=','.join(MOTORES))
+    parser.add_argument('--salida', help='Guardar el reporte en un archivo JSON.')
+    parser.add_argument('--referencia', help='Archivo JSON con el top-3 de Keras; si no existe y se corre keras, se guarda ahí.')
+    args = parser.parse_args()
+
+    imagenes = cargar_imagenes(args.imagenes, args.cantidad)
+    referencia = None
+    if args.referencia and os.path.exists(args.referencia):
+        referencia = leer_referencia(args.referencia, args)
+    clases_por_motor = {}
+    reporte = []
+    for nombre in args.motores.split(','):
+        rss_antes = rss_mb()
+        inicio = time.perf_counter()
+        motor = crear_motor(nombre, hilos=args.hilos)
+        carga_s = time.perf_counter() - inicio
+
+        resultado, predicciones = medir(motor, imagenes, args.lote, args.repeticiones)
+        resultado['motor'] = nombre
+        resultado['cargaS'] = carga_s
+        resultado['rssMaxMb'] = rss_mb()
+        resultado['rssIncrementoMb'] = rss_mb() - rss_antes
+
+        clases_por_motor[nombre] = top3(predicciones)
+        if nombre == 'keras' and referencia is None:
+            referencia = clases_por_motor[nombre]
+            if args.referencia:
+                guardar_referencia(args.referencia, args, referencia)
+        reporte.append(resultado)
+
+        print(f"{nombre:16s} p50={resultado['p50Ms']:8.2f} ms  p95={resultado['p95Ms']:8.2f} ms  "
+              f"rss+={resultado['rssIncrementoMb']:7.1f} MB")
+        del motor
+        gc.collect()
+
+    if referencia is None:
+        # Keras al final, para no sumar su memoria a la de los motores medidos
+        motor = crear_motor('keras', hilos=args.hilos)
+        referencia = top3(medir(motor, imagenes, args.lote, 1)[1])
+        if args.referencia:
+            guardar_referencia(args.referencia, args, referencia)
+        del motor
+        gc.collect()
+
+    for resultado in reporte:
+        if resultado['motor'] == 'keras':
+            continue
+        resultado['coincidenciaTop1'], resultado['coincidenciaTop3'] = coincidencias(clases_por_motor[resultado['motor']], referencia)
+        print(f"{resultado['motor']:16s} contra keras: top1={resultado['coincidenciaTop1']:.2%}  "
+              f"top3={resultado['coincidenciaTop3']:.2%}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import io
+import os
+import random
+from datetime import date, datetime, timedelta
+
+# Escenarios de scripts/benchmark.py. Cada uno define cuántos clientes (hilos)
+# lo ejecutan, cuántas peticiones en total (ráfaga) o durante cuántos segundos
+# (sondeo), y una función que arma la próxima petición de un cliente:
+#
+#   armar(rng, contexto, estado) -> {'nombre', 'metodo', 'ruta', 'json'?, 'archivos'?, 'revalidar'?}
+#
+# 'contexto' tiene los datos leídos de la API antes de empezar (productos,
+# clientes, empresas, rango de fechas, imágenes) y 'estado' es propio de cada
+# cliente. Con 'revalidar' el ejecutor guarda el ETag de la ruta y lo manda en
+# If-None-Match, como hace el frontend al sondear el catálogo.
+#
+# Los clientes por defecto no superan los cupos de admisión de su clase (ver
+# admision.py), así los rechazos que aparezcan no son del propio escenario.
+
+TERMINOS_BUSQUEDA = ['lec', 'yerba', 'arroz desc', 'jab', 'cafe', 'gaseosa 2', 'aceite', 'queso', 'fideos', 'champu']
+
+
+def armar_checkout(rng, contexto, estado):
+    empresa = rng.choice(contexto['empresas'])
+    cliente = rng.choice(contexto['clientes'])
+    productos = rng.sample(contexto['productos'], min(len(contexto['productos']), rng.randint(1, 4)))
+    return {
+        'nombre': 'crear_venta',
+        'metodo': 'POST',
+        'ruta': '/ventas',
+        'json': {
+            'nombreEmpresa': empresa['nombreEmpresa'],
+            'rucEmpresa': empresa['rucEmpresa'],
+            'direccionEmpresa': empresa['direccionEmpresa'],
+            'timbradoEmpresa': empresa['timbradoEmpresa'],
+            'nombreCliente': cliente['nombreCliente'],
+            'rucCliente': cliente['rucCliente'],
+            'fechaVenta': datetime.now().isoformat(timespec='seconds'),
+            'productos': [{'idProducto': p['_id'], 'cantidadVendida': rng.randint(1, 2)} for p in productos],
+        },
+    }
+
+
+# (nombre, peso, ruta); las rutas de catálogo se revalidan con ETag
+SONDEO_CATALOGO = [
+    ('productos_activos', 40, '/productos/activos?limit=50'),
+    ('categorias_activas', 20, '/categorias/activas'),
+    ('proveedores_activos', 10, '/proveedores/activos'),
+    ('bajo_stock', 10, '/productos/bajo-stock?limit=50'),
+    ('buscar', 20, None),
+]
+
+
+def armar_catalogo(rng, contexto, estado):
+    nombre, _, ruta = rng.choices(SONDEO_CATALOGO, [s[1] for s in SONDEO_CATALOGO])[0]
+    if nombre == 'buscar':
+        return {'nombre': nombre, 'metodo': 'GET', 'ruta': f'/productos/buscar?q={rng.choice(TERMINOS_BUSQUEDA)}&limit=10'}
+    return {'nombre': nombre, 'metodo': 'GET', 'ruta': ruta, 'revalidar': True}
+
+
+# Un período al azar de uno a doce meses que termina dentro del historial
+def periodo(rng, contexto):
+    desde, hasta = date.fromisoformat(contexto['desde']), date.fromisoformat(contexto['hasta'])
+    dias = min((hasta - desde).days, rng.randint(1, 12) * 30)
+    fin = hasta - timedelta(days=rng.randint(0, (hasta - desde).days - dias))
+    return (fin - timedelta(days=dias)).isoformat(), fin.isoformat()
+
+
+HISTORIAL = [
+    ('exportar_ventas', 40, '/ventas/exportar?formato=ndjson'),
+    ('exportar_compras', 20, '/compras/exportar?formato=ndjson'),
+    ('reporte_diario', 20, '/reportes/ventas?'),
+    ('reporte_productos', 20, '/reportes/ventas/productos?orden=ingresos&limit=20'),
+]
+
+
+def armar_historial(rng, contexto, estado):
+    nombre, _, ruta = rng.choices(HISTORIAL, [h[1] for h in HISTORIAL])[0]
+    desde, hasta = periodo(rng, contexto)
+    # 'hasta' se compara como texto con fechas que incluyen la hora
+    separador = '' if ruta.endswith('?') else '&'
+    return {'nombre': nombre, 'metodo': 'GET', 'ruta': f'{ruta}{separador}desde={desde}&hasta={hasta}T23:59:59'}
+
+
+def armar_reconocimiento(rng, contexto, estado):
+    return {
+        'nombre': 'reconocer_imagen',
+        'metodo': 'POST',
+        'ruta': '/reconocer-imagen',
+        'archivos': {'imagen': ('foto.jpg', rng.choice(contexto['imagenes']))},
+    }
+
+
+ESCENARIOS = {
+    'checkout': {
+        'descripcion': 'Ráfaga de ventas concurrentes (POST /ventas).',
+        'clientes': 12, 'peticiones': 1000, 'armar': armar_checkout,
+    },
+    'catalogo': {
+        'descripcion': 'Sondeo del catálogo con ETag y búsqueda de productos.',
+        'clientes': 16, 'duracion': 30, 'armar': armar_catalogo,
+    },
+    'historial': {
+        'descripcion': 'Exportación del historial de ventas y compras y reportes por período.',
+        'clientes': 2, 'peticiones': 40, 'armar': armar_historial,
+    },
+    'reconocimiento': {
+        'descripcion': 'Ráfaga de reconocimientos de imagen (POST /reconocer-imagen).',
+        'clientes': 6, 'peticiones': 200, 'armar': armar_reconocimiento,
+    },
+}
+
+
+# Imágenes para el reconocimiento: un archivo, una carpeta o, sin ruta, JPEG
+# sintéticos reproducibles
+def cargar_imagenes(ruta=None, cantidad=8):
+    if ruta and os.path.isdir(ruta):
+        nombres = sorted(os.listdir(ruta))[:cantidad]
+        return [open(os.path.join(ruta, nombre), 'rb').read() for nombre in nombres]
+    if ruta:
+        return [open(ruta, 'rb').read()]
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(0)
+    imagenes = []
+    for _ in range(cantidad):
+        img = Image.new('RGB', (640, 480), tuple(rng.randint(0, 255) for _ in range(3)))
+        dibujo = ImageDraw.Draw(img)
+        for _ in range(12):
+            x, y = rng.randint(0, 560), rng.randint(0, 400)
+            dibujo.rectangle((x, y, x + rng.randint(20, 200), y + rng.randint(20, 200)),
+                             fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        salida = io.BytesIO()
+        img.save(salida, format='JPEG', quality=85)
+        imagenes.append(salida.getvalue())
+    return imagenes
@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Datos sintéticos para las pruebas de rendimiento: categorías, proveedores,
+# empresas, clientes, productos y varios años de ventas y compras, con la
+# misma forma que dejan las rutas de la API (líneas con nombre, precio, IVA y
+# total, facturaNumero correlativo, 'bajoStock', ...). Con la misma semilla y
+# escala se generan siempre los mismos datos.
+#
+#   MONGO_URI=mongodb://localhost:27017 MONGO_DB=benchmark python scripts/generar_datos.py --escala mediana
+#
+# Vacía antes las colecciones que llena, así que se niega a correr sobre la
+# base por defecto sin --forzar. Conviene generar los datos antes de levantar
+# la API: las cachés en memoria no se enteran de estas escrituras.
+
+# Cantidades por escala; cada una se puede cambiar con su opción
+ESCALAS = {
+    'pequena': {'categorias': 15, 'proveedores': 20, 'empresas': 1, 'clientes': 300, 'productos': 500,
+                'anios': 1, 'ventas_por_dia': 30, 'compras_por_dia': 2},
+    'mediana': {'categorias': 40, 'proveedores': 100, 'empresas': 2, 'clientes': 5000, 'productos': 5000,
+                'anios': 2, 'ventas_por_dia': 200, 'compras_por_dia': 10},
+    'grande': {'categorias': 80, 'proveedores': 500, 'empresas': 3, 'clientes': 50000, 'productos': 50000,
+               'anios': 3, 'ventas_por_dia': 1000, 'compras_por_dia': 40},
+}
+
+# Fecha fija para que los datos no cambien de un día para otro
+FECHA_FIN = '2025-06-30'
+TAMANO_LOTE = 5000
+
+COLECCIONES = ('categorias', 'proveedores', 'empresas', 'clientes', 'productos', 'ventas', 'compras',
+               'counters', 'resumen_ventas', 'versiones', 'embeddings_productos', 'trabajos_reconocimiento')
+
+RUBROS = ['Bebidas', 'Lácteos', 'Panadería', 'Limpieza', 'Almacén', 'Carnes', 'Verdulería', 'Perfumería',
+          'Congelados', 'Golosinas', 'Ferretería', 'Librería', 'Mascotas', 'Bazar', 'Electrónica']
+ARTICULOS = ['Leche', 'Yerba', 'Arroz', 'Fideos', 'Galletitas', 'Jabón', 'Detergente', 'Aceite', 'Azúcar',
+             'Café', 'Gaseosa', 'Agua', 'Harina', 'Queso', 'Manteca', 'Champú', 'Lavandina', 'Cuaderno']
+VARIANTES = ['entera', 'descremada', 'común', 'premium', 'light', 'clásico', 'sin azúcar', 'familiar', 'económico']
+PRESENTACIONES = ['500 g', '1 kg', '1 L', '2 L', '250 ml', 'x 6', 'x 12', '3 kg', '750 ml']
+UNIDADES = ['unidad', 'kg', 'litro', 'caja', 'paquete']
+IVAS = ['10%', '10%', '10%', '5%', 'Exenta']
+NOMBRES = ['Ana', 'Carlos', 'María', 'José', 'Lucía', 'Pedro', 'Sofía', 'Juan', 'Rosa', 'Miguel', 'Elena', 'Luis']
+APELLIDOS = ['González', 'Benítez', 'Martínez', 'López', 'Giménez', 'Vera', 'Duarte', 'Ramírez', 'Acosta', 'Ortiz']
+CALLES = ['Mcal. López', 'España', 'Artigas', 'Eusebio Ayala', 'San Martín', 'Brasilia', 'Colón']
+
+
+def ruc(rng, numero):
+    return f'{numero}-{rng.randint(0, 9)}'
+
+
+def telefono(rng):
+    return f'09{rng.randint(71, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}'
+
+
+def direccion(rng):
+    return f'{rng.choice(CALLES)} {rng.randint(100, 4000)}'
+
+
+def generar_categorias(rng, cantidad):
+    nombres = RUBROS[:cantidad] + [f'{RUBROS[i % len(RUBROS)]} {i // len(RUBROS) + 1}'
+                                   for i in range(len(RUBROS), cantidad)]
+    return [{'nombreCategoria': nombre, 'estado': 'anulado' if rng.random() < 0.05 else 'activo'}
+            for nombre in nombres]
+
+
+def generar_proveedores(rng, cantidad):
+    return [{
+        'nombreProveedor': f'{rng.choice(APELLIDOS)} Distribuidora {i + 1} S.A.',
+        'rucProveedor': ruc(rng, 80000000 + i),
+        'direccionProveedor': direccion(rng),
+        'telefonoProveedor': telefono(rng),
+        'estado': 'anulado' if rng.random() < 0.05 else 'activo',
+    } for i in range(cantidad)]
+
+
+def generar_empresas(rng, cantidad):
+    return [{
+        'nombreEmpresa': f'Comercial {APELLIDOS[i % len(APELLIDOS)]} {i + 1}',
+        'rucEmpresa': ruc(rng, 80100000 + i),
+        'direccionEmpresa': direccion(rng),
+        'timbradoEmpresa': str(15000000 + i),
+    } for i in range(cantidad)]
+
+
+def generar_clientes(rng, cantidad):
+    return [{
+        'nombreCliente': f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}',
+        'rucCliente': ruc(rng, 1000000 + i),
+        'telefonoCliente': telefono(rng),
+    } for i in range(cantidad)]
+
+
+def generar_productos(rng, cantidad, categorias, proveedores):
+    productos = []
+    for i in range(cantidad):
+        precio_venta = rng.randint(4, 400) * 500
+        minima = rng.randint(5, 50)
+        # Alrededor de un 5 % queda por debajo del mínimo
+        actual = rng.randint(0, minima - 1) if rng.random() < 0.05 else rng.randint(minima, minima + 2000)
+        productos.append({
+            '_id': ObjectId(),
+            'nombre': f'{rng.choice(ARTICULOS)} {rng.choice(VARIANTES)} {rng.choice(PRESENTACIONES)} #{i + 1}',
+            'unidadMedida': rng.choice(UNIDADES),
+            'precioVenta': float(precio_venta),
+            'precioCompra': float(round(precio_venta * rng.uniform(0.6, 0.85), -1)),
+            'CantidadActual': actual,
+            'CantidadMinima': minima,
+            'Proveedor': rng.choice(proveedores)['nombreProveedor'],
+            'Categoria': rng.choice(categorias)['nombreCategoria'],
+            'Iva': rng.choice(IVAS),
+            'descripcion': f'Producto de prueba {i + 1}',
+            'bajoStock': actual < minima,
+            'estado': 'anulado' if rng.random() < 0.02 else 'activo',
+        })
+    return productos
+
+
+# Pesos tipo Zipf: unos pocos productos concentran la mayoría de las líneas
+def pesos_acumulados(rng, cantidad):
+    pesos = [1.0 / (i + 1) ** 0.8 for i in range(cantidad)]
+    rng.shuffle(pesos)
+    acumulados, total = [], 0.0
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+    return acumulados
+
+
+def dias(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def cantidad_del_dia(rng, media, dia):
+    # Más movimiento los fines de semana
+    media = media * (1.3 if dia.weekday() >= 5 else 1.0)
+    return max(0, int(rng.uniform(0.5, 1.5) * media))
+
+
+def hora(rng, dia):
+    return datetime(dia.year, dia.month, dia.day, rng.randint(8, 20), rng.randint(0, 59), rng.randint(0, 59)).isoformat()
+
+
+def generar_ventas(rng, desde, hasta, media, productos, acumulados, clientes, empresas):
+    numero = 0
+    for dia in dias(desde, hasta):
+        fechas = sorted(hora(rng, dia) for _ in range(cantidad_del_dia(rng, media, dia)))
+        for fecha in fechas:
+            numero += 1
+            empresa = rng.choice(empresas)
+            cliente = rng.choice(clientes)
+            lineas = []
+            for producto in rng.choices(productos, cum_weights=acumulados, k=rng.randint(1, 6)):
+                cantidad = rng.randint(1, 5)
+                lineas.append({
+                    'idProducto': str(producto['_id']),
+                    'cantidadVendida': cantidad,
+                    'nombre': producto['nombre'],
+                    'precioVenta': producto['precioVenta'],
+                    'Iva': producto['Iva'],
+                    'precioCompra': producto['precioCompra'],
+                    'Categoria': producto['Categoria'],
+                    'total': cantidad * producto['precioVenta'],
+                })
+            yield {
+                'nombreEmpresa': empresa['nombreEmpresa'],
+                'rucEmpresa': empresa['rucEmpresa'],
+                'direccionEmpresa': empresa['direccionEmpresa'],
+                'timbradoEmpresa': empresa['timbradoEmpresa'],
+                'facturaNumero': f'001-001-{numero:07d}',
+                'numeroInterno': numero,
+                'nombreCliente': cliente['nombreCliente'],
+                'rucCliente': cliente['rucCliente'],
+                'fechaVenta': fecha,
+                'productos': lineas,
+                'estado': 'anulado' if rng.random() < 0.03 else 'activo',
+            }
+
+
+def generar_compras(rng, desde, hasta, media, productos, proveedores):
+    for dia in dias(desde, hasta):
+        for _ in range(cantidad_del_dia(rng, media, dia)):
+            proveedor = rng.choice(proveedores)
+            lineas = []
+            for producto in rng.sample(productos, min(len(productos), rng.randint(1, 15))):
+                cantidad = rng.randint(10, 200)
+                lineas.append({
+                    'idProducto': str(producto['_id']),
+                    'nombreProducto': producto['nombre'],
+                    'precioCompra': producto['precioCompra'],
+                    'cantidadComprada': cantidad,
+                    'nombre': producto['nombre'],
+                    'Iva': producto['Iva'],
+                    'total': cantidad * producto['precioCompra'],
+                })
+            yield {
+                'nombreProveedor': proveedor['nombreProveedor'],
+                'rucProveedor': proveedor['rucProveedor'],
+                'telefonoProveedor': proveedor['telefonoProveedor'],
+                'productos': lineas,
+                'fechaCompra': hora(rng, dia),
+                'estado': 'anulado' if rng.random() < 0.02 else 'activo',
+            }
+
+
+def insertar_por_lotes(collection, documentos, tamano_lote=TAMANO_LOTE):
+    total, lote = 0, []
+    for documento in documentos:
+        lote.append(documento)
+        if len(lote) >= tamano_lote:
+            collection.insert_many(lote, ordered=False)
+            total += len(lote)
+            lote = []
+    if lote:
+        collection.insert_many(lote, ordered=False)
+        total += len(lote)
+    return total
+
+
+# Índices y resúmenes, como después de un despliegue. Un paso que no se puede
+# completar (p. ej. $merge en la base en memoria) queda anotado en el reporte
+def pasos_finales(db):
+    import indices
+    import resumenes
+
+    pasos = {}
+    for nombre, paso in (('indices', lambda: indices.reconciliar(db)), ('resumenes', lambda: resumenes.reconstruir(db))):
+        try:
+            paso()
+            pasos[nombre] = 'ok'
+        except Exception as e:
+            pasos[nombre] = f'error: {e}'
+    return pasos
+
+
+def leer_escala(nombre, cambios=None):
+    escala = dict(ESCALAS[nombre])
+    escala.update({clave: valor for clave, valor in (cambios or {}).items() if valor is not None})
+    return escala
+
+
+def generar(db, escala, semilla=0, fecha_fin=FECHA_FIN):
+    rng = random.Random(semilla)
+    for nombre in COLECCIONES:
+        db[nombre].delete_many({})
+
+    categorias = generar_categorias(rng, escala['categorias'])
+    proveedores = generar_proveedores(rng, escala['proveedores'])
+    empresas = generar_empresas(rng, escala['empresas'])
+    clientes = generar_clientes(rng, escala['clientes'])
+    productos = generar_productos(rng, escala['productos'], categorias, proveedores)
+    for nombre, documentos in (('categorias', categorias), ('proveedores', proveedores), ('empresas', empresas),
+                               ('clientes', clientes), ('productos', productos)):
+        insertar_por_lotes(db[nombre], documentos)
+
+    hasta = date.fromisoformat(fecha_fin)
+    desde = hasta - timedelta(days=365 * escala['anios'] - 1)
+    acumulados = pesos_acumulados(rng, len(productos))
+    ventas = insertar_por_lotes(db['ventas'], generar_ventas(
+        rng, desde, hasta, escala['ventas_por_dia'], productos, acumulados, clientes, empresas))
+    compras = insertar_por_lotes(db['compras'], generar_compras(
+        rng, desde, hasta, escala['compras_por_dia'], productos, proveedores))
+
+    # La numeración de las ventas nuevas sigue a la última generada
+    db['counters'].update_one({'_id': 'ventas'}, {'$set': {'facturaNumero': ventas, 'numeroInterno': ventas}}, upsert=True)
+
+    return {
+        'semilla': semilla,
+        'escala': escala,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'documentos': {
+            'categorias': len(categorias),
+            'proveedores': len(proveedores),
+            'empresas': len(empresas),
+            'clientes': len(clientes),
+            'productos': len(productos),
+            'ventas': ventas,
+            'compras': compras,
+        },
+        'pasos': pasos_finales(db),
+    }
+
+
+def agregar_opciones_escala(parser):
+    parser.add_argument('--escala', choices=tuple(ESCALAS), default='pequena')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--fecha-fin', default=FECHA_FIN, help='Último día con ventas y compras (AAAA-MM-DD).')
+    for clave in ESCALAS['pequena']:
+        parser.add_argument('--' + clave.replace('_', '-'), dest=clave, type=int,
+                            help='Reemplaza el valor de la escala elegida.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos para las pruebas de rendimiento.')
+    agregar_opciones_escala(parser)
+    parser.add_argument('--forzar', action='store_true', help='Permitir vaciar la base por defecto.')
+    args = parser.parse_args()
+
+    from conexion import ConexionMongo, BASE_POR_DEFECTO
+    conexion = ConexionMongo.desde_entorno()
+    if conexion.nombre_base == BASE_POR_DEFECTO and not args.forzar:
+        print(f"MONGO_DB apunta a la base por defecto '{BASE_POR_DEFECTO}'; use otra base o --forzar.", file=sys.stderr)
+        return 1
+
+    escala = leer_escala(args.escala, {clave: getattr(args, clave) for clave in ESCALAS['pequena']})
+    reporte = generar(conexion.db, escala, semilla=args.semilla, fecha_fin=args.fecha_fin)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
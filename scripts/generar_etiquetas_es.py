@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import argparse
+
+# Regenera etiquetas_es.json a partir del índice de clases de Keras.
+# Conserva las traducciones existentes y, con --traducir, completa las que
+# falten usando googletrans (requiere acceso a red).
+
+RUTA_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_ETIQUETAS = os.path.join(RUTA_BASE, 'etiquetas_es.json')
+URL_INDICE = 'https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera la tabla de etiquetas de ImageNet en español.')
+    parser.add_argument('--salida', default=RUTA_ETIQUETAS)
+    parser.add_argument('--traducir', action='store_true', help='Traducir con googletrans las clases sin traducción.')
+    args = parser.parse_args()
+
+    from tensorflow.keras.utils import get_file
+    with open(get_file('imagenet_class_index.json', URL_INDICE, cache_subdir='models'), encoding='utf-8') as f:
+        indice = json.load(f)
+
+    existentes = []
+    if os.path.exists(args.salida):
+        with open(args.salida, encoding='utf-8') as f:
+            existentes = json.load(f)
+
+    translator = None
+    if args.traducir:
+        from googletrans import Translator
+        translator = Translator()
+
+    filas = []
+    for i in range(len(indice)):
+        clase = indice[str(i)][1]
+        traduccion = ''
+        if i < len(existentes) and existentes[i][0] == clase:
+            traduccion = existentes[i][1]
+        if not traduccion and translator:
+            traduccion = translator.translate(clase.replace('_', ' '), src='en', dest='es').text
+        filas.append([clase, traduccion])
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        f.write(',\n'.join('  ' + json.dumps(fila, ensure_ascii=False) for fila in filas))
+        f.write('\n]\n')
+
+    faltantes = sum(1 for _, traduccion in filas if not traduccion)
+    print(f'{len(filas)} clases escritas en {args.salida}, {faltantes} sin traducción.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Reporta tiempo de arranque y memoria por worker para las dos disposiciones
+# de la pila de visión:
+#   - local: cada worker importa app.py y carga el modelo en el primer uso
+#   - remoto: los workers solo importan app.py y un proceso aparte tiene el modelo
+#
+#   python scripts/medir_arranque.py --workers 4
+
+RUTA_BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICIONES = {
+    # Worker CRUD recién arrancado (sin TensorFlow)
+    'app': 'import app',
+    # Worker en modo local después del primer reconocimiento
+    'app_con_vision': 'import app; app.cliente_vision.cliente._modulo()',
+    # Proceso de visión dedicado
+    'vision_worker': 'import vision; vision.inicializar()',
+}
+
+PLANTILLA = '''
+import time, resource, json, sys
+inicio = time.perf_counter()
+{codigo}
+print(json.dumps({{
+    'segundos': time.perf_counter() - inicio,
+    'rssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'tensorflowImportado': 'tensorflow' in sys.modules,
+}}))
+'''
+
+
+def medir(codigo, modo):
+    entorno = dict(os.environ, VISION_MODO=modo)
+    salida = subprocess.run(
+        [sys.executable, '-c', PLANTILLA.format(codigo=codigo)],
+        cwd=RUTA_BASE, env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide arranque y memoria de las disposiciones de visión.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--salida', help='Guardar el reporte en un archivo JSON.')
+    args = parser.parse_args()
+
+    app = medir(MEDICIONES['app'], 'local')
+    app_con_vision = medir(MEDICIONES['app_con_vision'], 'local')
+    vision_worker = medir(MEDICIONES['vision_worker'], 'remoto')
+
+    reporte = {
+        'workers': args.workers,
+        'mediciones': {'app': app, 'app_con_vision': app_con_vision, 'vision_worker': vision_worker},
+        'local': {
+            'arranqueWorkerS': app['segundos'],
+            'primerReconocimientoS': app_con_vision['segundos'] - app['segundos'],
+            'rssPorWorkerMb': app_con_vision['rssMb'],
+            'rssTotalMb': app_con_vision['rssMb'] * args.workers,
+        },
+        'remoto': {
+            'arranqueWorkerS': app['segundos'],
+            'arranqueVisionS': vision_worker['segundos'],
+            'rssPorWorkerMb': app['rssMb'],
+            'rssTotalMb': app['rssMb'] * args.workers + vision_worker['rssMb'],
+        },
+    }
+
+    for disposicion in ('local', 'remoto'):
+        datos = reporte[disposicion]
+        print(f"{disposicion:7s} arranque worker={datos['arranqueWorkerS']:.2f} s  "
+              f"rss/worker={datos['rssPorWorkerMb']:.0f} MB  rss total ({args.workers} workers)={datos['rssTotalMb']:.0f} MB")
+    if not app['tensorflowImportado']:
+        print('app.py arranca sin importar TensorFlow.')
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
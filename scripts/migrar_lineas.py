@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import argparse
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conexion import ConexionMongo
+from inventario import buscar_productos, completar_lineas_venta, completar_lineas_compra
+
+# Completa las líneas de las ventas y compras anteriores con los datos del
+# producto (nombre, precioVenta, Iva y total), como hacen ahora crear_venta y
+# crear_compra. Recorre por _id en lotes: un $in a 'productos' y un bulk_write
+# por lote. Se puede interrumpir y volver a correr.
+#
+# Para las ventas históricas el precio que se guarda es el actual del producto
+# (el de la venta no quedó registrado); esas ventas se marcan con
+# 'lineasMigradas': True.
+#
+#   python scripts/migrar_lineas.py --lote 500 [--simular]
+
+COLECCIONES = {
+    'ventas': ('total', completar_lineas_venta, {'lineasMigradas': True}),
+    'compras': ('total', completar_lineas_compra, {}),
+}
+
+
+def migrar(db, nombre, tamano_lote=500, simular=False):
+    campo, completar, marcas = COLECCIONES[nombre]
+    collection = db[nombre]
+    filtro = {'productos': {'$elemMatch': {campo: {'$exists': False}}}}
+
+    revisados = 0
+    actualizados = 0
+    ultimo = None
+    while True:
+        consulta = dict(filtro)
+        if ultimo is not None:
+            consulta['_id'] = {'$gt': ultimo}
+        documentos = list(collection.find(consulta, {'productos': 1}).sort('_id', 1).limit(tamano_lote))
+        if not documentos:
+            break
+        ultimo = documentos[-1]['_id']
+        revisados += len(documentos)
+
+        # Las líneas con un idProducto inválido o de un producto borrado se dejan como están
+        validas = {documento['_id']: [l for l in documento['productos'] if id_valido(l)] for documento in documentos}
+        ids = {ObjectId(linea['idProducto']) for lineas in validas.values() for linea in lineas}
+        productos = buscar_productos(db['productos'], ids)
+
+        operaciones = []
+        for documento in documentos:
+            completar(validas[documento['_id']], productos)
+            operaciones.append(UpdateOne({'_id': documento['_id']}, {'$set': dict({'productos': documento['productos']}, **marcas)}))
+
+        if operaciones and not simular:
+            actualizados += collection.bulk_write(operaciones, ordered=False).modified_count
+        print(f'{nombre}: {revisados} revisados, {actualizados} actualizados', flush=True)
+
+    return {'coleccion': nombre, 'revisados': revisados, 'actualizados': actualizados}
+
+
+def id_valido(linea):
+    try:
+        ObjectId(linea.get('idProducto'))
+        return True
+    except (InvalidId, TypeError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Completar las líneas de ventas y compras históricas.')
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--coleccion', choices=tuple(COLECCIONES), action='append',
+                        help='Colección a migrar (por defecto, todas).')
+    parser.add_argument('--simular', action='store_true', help='Recorrer sin escribir.')
+    args = parser.parse_args()
+
+    db = ConexionMongo.desde_entorno().db
+    reporte = [migrar(db, nombre, args.lote, args.simular) for nombre in (args.coleccion or COLECCIONES)]
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
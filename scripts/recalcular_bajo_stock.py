@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conexion import ConexionMongo
+from inventario import recalcular_bajo_stock
+
+# Calcula 'bajoStock' en todos los productos con un solo update_many. Hay que
+# correrlo una vez al desplegar el indicador; después lo mantienen las rutas
+# que cambian el stock.
+#
+#   python scripts/recalcular_bajo_stock.py
+
+
+def main():
+    db = ConexionMongo.desde_entorno().db
+    modificados = recalcular_bajo_stock(db['productos'])
+    print(f'Productos actualizados: {modificados}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import os
+import threading
+
+from pymongo import ReturnDocument
+
+# Asignación de números correlativos desde la colección 'counters'.
+#
+# Todos los campos de una secuencia (p. ej. facturaNumero y numeroInterno)
+# viven en un mismo documento, así se obtienen juntos con un solo $inc.
+#   - Modo por bloques: cada worker reserva 'tamano_bloque' números con un
+#     $inc y los entrega desde memoria. Puede dejar huecos si un worker se
+#     reinicia con números sin usar.
+#   - Modo estricto: un $inc por venta, ejecutado dentro de la transacción de
+#     la venta, de modo que si la venta se aborta el número no se consume.
+#     Sin sesión el $inc se confirma solo y una venta fallida deja un hueco.
+
+
+class AsignadorSecuencias:
+    def __init__(self, counters_collection, nombre, campos, tamano_bloque=100, estricto=False):
+        self.collection = counters_collection
+        self.nombre = nombre
+        self.campos = tuple(campos)
+        self.tamano_bloque = tamano_bloque
+        self.estricto = estricto
+        self._candado = threading.Lock()
+        self._inicializado = False
+        self._pid = None
+        self._base = None
+        self._entregados = 0
+        self._disponibles = 0
+
+    def _inicializar(self):
+        # Migrar los contadores antiguos (un documento por campo: {'_id': campo, 'seq': n})
+        # al documento combinado. $max hace que sea seguro correrlo en varios workers
+        if self._inicializado:
+            return
+        anteriores = {c['_id']: c.get('seq', 0) for c in self.collection.find({'_id': {'$in': list(self.campos)}})}
+        if anteriores:
+            self.collection.update_one(
+                {'_id': self.nombre},
+                {'$max': {campo: anteriores.get(campo, 0) for campo in self.campos}},
+                upsert=True
+            )
+        self._inicializado = True
+
+    def _incrementar(self, cantidad, session=None):
+        return self.collection.find_one_and_update(
+            {'_id': self.nombre},
+            {'$inc': {campo: cantidad for campo in self.campos}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    # Devuelve un diccionario {campo: número}
+    def siguiente(self, session=None):
+        self._inicializar()
+        if self.estricto:
+            documento = self._incrementar(1, session=session)
+            return {campo: documento[campo] for campo in self.campos}
+
+        with self._candado:
+            # Un bloque heredado del proceso padre no se reutiliza tras el fork
+            if self._pid != os.getpid() or self._entregados >= self._disponibles:
+                documento = self._incrementar(self.tamano_bloque)
+                self._base = {campo: documento[campo] - self.tamano_bloque + 1 for campo in self.campos}
+                self._entregados = 0
+                self._disponibles = self.tamano_bloque
+                self._pid = os.getpid()
+
+            numeros = {campo: self._base[campo] + self._entregados for campo in self.campos}
+            self._entregados += 1
+            return numeros
@@ -1,2 +1,19 @@
 #!/bin/bash
-gunicorn -w 1 -b 0.0.0.0:5000 --timeout 120 app:app
+# Crear o corregir los índices declarados en indices.py antes de arrancar
+python indices.py reconciliar || echo "Advertencia: no se pudieron reconciliar todos los índices."
+
+# Con VISION_MODO=remoto el modelo vive en un solo proceso de visión y los
+# workers de gunicorn arrancan sin TensorFlow
+if [ "$VISION_MODO" = "remoto" ]; then
+    python vision_worker.py &
+fi
+
+# Pool de procesos para los trabajos de POST /reconocer-imagen/jobs
+# (TRABAJOS_PROCESOS=0 para no arrancarlo en esta máquina)
+if [ "${TRABAJOS_PROCESOS:-1}" != "0" ]; then
+    python trabajos.py &
+fi
+
+# Workers, hilos y clase de worker en gunicorn.conf.py (GUNICORN_CLASE=sync
+# vuelve al modo anterior de un hilo por worker)
+gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,31 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+# Los módulos de la aplicación están en la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Las pruebas usan una base en memoria (pip install -r requirements-dev.txt)
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()['pruebas']
+
+
+# app.py lee la configuración al importarse: cada prueba la importa de nuevo
+# con su entorno, contra una base de mongomock
+@pytest.fixture
+def importar_app(monkeypatch):
+    def importar(**entorno):
+        monkeypatch.setenv('MONGO_URI', 'mongomock://')
+        monkeypatch.setenv('MONGO_DB', 'pruebas_app')
+        monkeypatch.setenv('ADMISION', '0')
+        for clave, valor in entorno.items():
+            monkeypatch.setenv(clave, valor)
+        monkeypatch.delitem(sys.modules, 'app', raising=False)
+        return importlib.import_module('app')
+    return importar
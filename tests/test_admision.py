@@ -0,0 +1,108 @@
+import time
+import threading
+
+import pytest
+from flask import Flask
+
+from admision import ClaseAdmision, ControlAdmision, Rechazada, clasificar, leer_clases, hilos_necesarios, instalar_admision
+
+
+def test_clasificar():
+    assert clasificar('/health', 'GET') is None
+    assert clasificar('/reconocer-imagen', 'POST') == 'vision'
+    assert clasificar('/reconocer-imagen/jobs', 'POST') == 'escrituras'
+    assert clasificar('/reconocer-imagen/jobs/abc', 'GET') == 'sondeos'
+    assert clasificar('/ventas/exportar', 'GET') == 'pesadas'
+    assert clasificar('/ventas', 'POST') == 'escrituras'
+    assert clasificar('/productos/activos', 'GET') == 'lecturas'
+    # El prefijo solo coincide con la ruta completa o sus subrutas
+    assert clasificar('/ventasx', 'GET') == 'lecturas'
+
+
+def test_leer_clases_desde_el_entorno():
+    clases = leer_clases({'ADMISION_VISION': '1,3', 'ADMISION_PESADAS': '4,5,0.5'})
+
+    assert clases['vision'] == (1, 3, 10.0)
+    assert clases['pesadas'] == (4, 5, 0.5)
+    assert hilos_necesarios({}) == 62
+    assert hilos_necesarios({'ADMISION_VISION': '1,3'}) == 60
+
+
+def test_cola_llena_responde_429():
+    clase = ClaseAdmision('vision', 1, 0, 1.0)
+    clase.entrar()
+
+    with pytest.raises(Rechazada) as error:
+        clase.entrar()
+    assert (error.value.codigo, error.value.motivo) == (429, 'cola_llena')
+    assert error.value.reintentar >= 1
+    assert clase.metricas()['rechazadas'] == 1
+
+
+def test_espera_estimada_mayor_al_plazo_responde_503():
+    clase = ClaseAdmision('pesadas', 1, 5, 10.0)
+    clase.entrar()
+    clase._duracion = 3.0
+
+    with pytest.raises(Rechazada) as error:
+        clase.entrar(plazo=1.0)
+    assert (error.value.codigo, error.value.motivo) == (503, 'espera_estimada')
+
+
+def test_plazo_vencido_en_la_cola_responde_503():
+    clase = ClaseAdmision('lecturas', 1, 1, 0.05)
+    clase.entrar()
+    clase._duracion = 0.01
+
+    with pytest.raises(Rechazada) as error:
+        clase.entrar()
+    assert (error.value.codigo, error.value.motivo) == (503, 'plazo_vencido')
+    assert clase.metricas()['enEspera'] == 0
+
+
+def test_el_cupo_pasa_a_la_primera_en_espera():
+    clase = ClaseAdmision('escrituras', 1, 2, 5.0)
+    clase.entrar()
+    clase._duracion = 0.01
+    orden = []
+
+    def esperar(nombre):
+        clase.entrar()
+        orden.append(nombre)
+        clase.salir(0.01)
+
+    hilos = []
+    for nombre in ('primera', 'segunda'):
+        hilo = threading.Thread(target=esperar, args=(nombre,))
+        hilo.start()
+        hilos.append(hilo)
+        while clase.metricas()['enEspera'] < len(hilos):
+            time.sleep(0.001)
+    clase.salir(0.01)
+    for hilo in hilos:
+        hilo.join()
+
+    assert orden == ['primera', 'segunda']
+    assert clase.metricas()['enCurso'] == 0
+    assert clase.metricas()['admitidas'] == 3
+
+
+def test_la_aplicacion_responde_429_con_retry_after():
+    app = Flask(__name__)
+    control = instalar_admision(app, ControlAdmision({nombre: (1, 0, 1.0) for nombre in leer_clases()}))
+
+    @app.route('/productos/activos')
+    def activos():
+        return 'ok'
+
+    cliente = app.test_client()
+    assert cliente.get('/productos/activos').status_code == 200
+    # Al terminar la petición se libera el cupo
+    assert control.clases['lecturas'].metricas()['enCurso'] == 0
+
+    control.clases['lecturas'].entrar()
+    respuesta = cliente.get('/productos/activos')
+    assert respuesta.status_code == 429
+    assert respuesta.headers['Retry-After']
+    assert respuesta.get_json()['clase'] == 'lecturas'
+    assert cliente.get('/admision/metricas').status_code == 200
@@ -0,0 +1,117 @@
+import pytest
+from bson.objectid import ObjectId
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+import consultas
+from consultas import (paginar, leer_limite, leer_proyeccion, cabeceras_paginacion, construir_filtro, responder_lista,
+                       ParametrosInvalidos, LIMITE_MAXIMO, LIMITE_POR_DEFECTO)
+
+
+@pytest.fixture
+def clientes(db):
+    collection = db['clientes']
+    # Insertados en orden inverso al de _id: el listado igual sale ordenado
+    ids = sorted(ObjectId() for _ in range(25))
+    collection.insert_many([{'_id': i, 'nombreCliente': f'Cliente {n}', 'estado': 'activo' if n % 2 else 'inactivo'}
+                            for n, i in reversed(list(enumerate(ids)))])
+    return collection
+
+
+def recorrer(collection, **parametros):
+    vistos, paginas, after = [], [], None
+    while True:
+        args = MultiDict(dict(parametros, **({'after': after} if after else {})))
+        documentos, after = paginar(collection, args, filtros=('estado',))
+        paginas.append(len(documentos))
+        vistos += [d['_id'] for d in documentos]
+        if after is None:
+            return vistos, paginas
+
+
+def test_el_cursor_recorre_todo_sin_saltear_ni_repetir(clientes):
+    vistos, paginas = recorrer(clientes, limit='10')
+
+    assert paginas == [10, 10, 5]
+    assert vistos == sorted(str(c['_id']) for c in clientes.find())
+
+
+def test_el_cursor_respeta_los_filtros(clientes):
+    vistos, _ = recorrer(clientes, limit='4', estado='activo')
+
+    assert len(vistos) == 12
+    assert all(clientes.find_one({'_id': ObjectId(i)})['estado'] == 'activo' for i in vistos)
+
+
+def test_la_ultima_pagina_exacta_no_tiene_cursor(clientes):
+    documentos, siguiente = paginar(clientes, MultiDict({'limit': '25'}))
+
+    assert len(documentos) == 25
+    assert siguiente is None
+
+
+def test_limite_por_defecto_y_maximo():
+    assert leer_limite(MultiDict()) == LIMITE_POR_DEFECTO
+    assert leer_limite(MultiDict({'limit': str(LIMITE_MAXIMO + 1)})) == LIMITE_MAXIMO
+    for invalido in ('0', '-3', 'diez'):
+        with pytest.raises(ParametrosInvalidos):
+            leer_limite(MultiDict({'limit': invalido}))
+
+
+def test_cursor_invalido():
+    with pytest.raises(ParametrosInvalidos):
+        construir_filtro(MultiDict({'after': 'no-es-un-id'}))
+
+
+def test_proyeccion_oculta_campos_internos():
+    assert leer_proyeccion(MultiDict(), ocultos=('reservas',)) == {'reservas': 0}
+    assert leer_proyeccion(MultiDict({'fields': 'nombre,reservas'}), ocultos=('reservas',)) == {'nombre': 1}
+    assert leer_proyeccion(MultiDict({'fields': 'reservas'}), ocultos=('reservas',)) == {'_id': 1}
+    with pytest.raises(ParametrosInvalidos):
+        leer_proyeccion(MultiDict({'fields': '$where'}))
+
+
+def test_rango_de_fechas():
+    filtro = construir_filtro(MultiDict({'desde': '2024-01-01', 'hasta': '2024-12-31'}), campo_fecha='fechaVenta')
+    assert filtro == {'fechaVenta': {'$gte': '2024-01-01', '$lte': '2024-12-31'}}
+
+
+def test_cabeceras_de_la_pagina_siguiente():
+    cabeceras = cabeceras_paginacion(MultiDict({'estado': 'activo'}), '/clientes', 'abc')
+
+    assert cabeceras['X-Siguiente-Cursor'] == 'abc'
+    assert cabeceras['Link'] == f'</clientes?estado=activo&after=abc&limit={LIMITE_POR_DEFECTO}>; rel="next"'
+    assert cabeceras_paginacion(MultiDict(), '/clientes', None) == {}
+
+
+def responder(collection, **parametros):
+    with Flask(__name__).app_context():
+        respuesta, codigo = responder_lista(collection, MultiDict(parametros), '/clientes')
+        return codigo, respuesta.get_json(), respuesta.headers
+
+
+def test_lista_completa_sin_limit_responde_la_lista(clientes):
+    codigo, cuerpo, cabeceras = responder(clientes)
+
+    assert codigo == 200
+    assert len(cuerpo) == 25
+    assert 'X-Siguiente-Cursor' not in cabeceras
+
+
+def test_lista_recortada_sin_limit_lo_indica_en_el_cuerpo(clientes, monkeypatch):
+    monkeypatch.setattr(consultas, 'LIMITE_POR_DEFECTO', 10)
+    codigo, cuerpo, cabeceras = responder(clientes)
+
+    assert codigo == 206
+    assert cuerpo['truncado'] is True
+    assert len(cuerpo['datos']) == 10
+    assert cuerpo['siguiente'] == cabeceras['X-Siguiente-Cursor'] == cuerpo['datos'][-1]['_id']
+
+
+def test_cliente_que_pagina_recibe_la_lista_y_el_cursor(clientes, monkeypatch):
+    monkeypatch.setattr(consultas, 'LIMITE_POR_DEFECTO', 10)
+    codigo, cuerpo, cabeceras = responder(clientes, limit='10')
+    assert (codigo, len(cuerpo)) == (200, 10)
+
+    codigo, cuerpo, _ = responder(clientes, after=cabeceras['X-Siguiente-Cursor'])
+    assert (codigo, len(cuerpo)) == (200, 10)
@@ -0,0 +1,122 @@
+import io
+
+import pytest
+
+from importacion import importar, detectar_formato, Importacion, FormatoInvalido, CodificacionInvalida
+
+
+def preparar_cliente(datos):
+    if not datos.get('rucCliente'):
+        return None, "Falta 'rucCliente'."
+    return {'rucCliente': datos['rucCliente'], 'nombreCliente': datos.get('nombreCliente', '')}, None
+
+
+@pytest.fixture
+def clientes(db):
+    collection = db['clientes']
+    collection.create_index('rucCliente', unique=True)
+    return collection
+
+
+def archivo(texto):
+    return io.BytesIO(texto.encode('utf-8'))
+
+
+def test_detectar_formato():
+    assert detectar_formato('csv', 'x.ndjson', None) == 'csv'
+    assert detectar_formato(None, 'clientes.jsonl', None) == 'ndjson'
+    assert detectar_formato(None, None, 'text/csv; charset=utf-8') == 'csv'
+    with pytest.raises(FormatoInvalido):
+        detectar_formato(None, 'clientes.xlsx', None)
+    with pytest.raises(FormatoInvalido):
+        detectar_formato('xml', None, None)
+
+
+def test_csv_insertar_reporta_filas_invalidas_y_duplicadas(clientes):
+    clientes.insert_one({'rucCliente': '800-1', 'nombreCliente': 'Existente'})
+    csv = '﻿rucCliente,nombreCliente\n800-2,Ana\n,Sin RUC\n800-1,Repetido\n800-3,Luis\n'
+
+    reporte = importar(clientes, archivo(csv), 'csv', preparar_cliente, campos_solo_alta={'estado': 'activo'})
+
+    assert reporte['filas'] == 4
+    assert reporte['insertados'] == 2
+    assert reporte['rechazados'] == 2
+    assert sorted(e['fila'] for e in reporte['errores']) == [3, 4]
+    assert clientes.find_one({'rucCliente': '800-1'})['nombreCliente'] == 'Existente'
+    assert clientes.find_one({'rucCliente': '800-3'})['estado'] == 'activo'
+
+
+def test_ndjson_upsert_no_duplica_al_reimportar(clientes):
+    ndjson = '{"rucCliente": "800-1", "nombreCliente": "Ana"}\n\n{"rucCliente": "800-2", "nombreCliente": "Luis"}\n'
+
+    primera = importar(clientes, archivo(ndjson), 'ndjson', preparar_cliente,
+                       clave='rucCliente', campos_solo_alta={'estado': 'activo'})
+    clientes.update_one({'rucCliente': '800-1'}, {'$set': {'estado': 'inactivo'}})
+    segunda = importar(clientes, archivo(ndjson.replace('Ana', 'Ana María')), 'ndjson', preparar_cliente,
+                       clave='rucCliente', campos_solo_alta={'estado': 'activo'})
+
+    assert (primera['insertados'], primera['actualizados']) == (2, 0)
+    assert (segunda['insertados'], segunda['actualizados']) == (0, 2)
+    assert clientes.count_documents({}) == 2
+    ana = clientes.find_one({'rucCliente': '800-1'})
+    # Los campos de alta no pisan los documentos existentes
+    assert (ana['nombreCliente'], ana['estado']) == ('Ana María', 'inactivo')
+
+
+def test_ndjson_lineas_invalidas(clientes):
+    ndjson = '{"rucCliente": "800-1"}\nno es json\n[1, 2]\n'
+
+    reporte = importar(clientes, archivo(ndjson), 'ndjson', preparar_cliente)
+
+    assert reporte['insertados'] == 1
+    assert [e['fila'] for e in reporte['errores']] == [2, 3]
+
+
+@pytest.mark.parametrize('formato, contenido, fila', [
+    ('csv', b'rucCliente,nombreCliente\n800-1,Ana\n800-2,Luis\n800-3,Jos\xe9\n800-4,Eva\n', 4),
+    ('ndjson', b'{"rucCliente": "800-1"}\n{"rucCliente": "800-2"}\n{"rucCliente": "800-3", "nombreCliente": "Jos\xe9"}\n', 3),
+])
+def test_archivo_que_no_es_utf8_informa_las_filas_importadas(clientes, formato, contenido, fila):
+    with pytest.raises(CodificacionInvalida) as error:
+        importar(clientes, io.BytesIO(contenido), formato, preparar_cliente)
+
+    reporte = error.value.reporte
+    assert error.value.fila == fila
+    assert reporte['insertados'] == 2
+    assert reporte['errores'] == [{'fila': fila, 'error': 'El texto no es UTF-8 válido.'}]
+    assert sorted(c['rucCliente'] for c in clientes.find()) == ['800-1', '800-2']
+
+
+def test_escribe_en_lotes(clientes):
+    llamadas = []
+
+    class Espia:
+        def __getattr__(self, nombre):
+            return getattr(clientes, nombre)
+
+        def insert_many(self, documentos, **kwargs):
+            llamadas.append(len(documentos))
+            return clientes.insert_many(documentos, **kwargs)
+
+    importacion = Importacion(Espia(), tamano_lote=3)
+    for numero in range(7):
+        importacion.agregar(numero + 2, {'rucCliente': f'800-{numero}'})
+    importacion.escribir()
+
+    assert llamadas == [3, 3, 1]
+    assert importacion.reporte()['insertados'] == 7
+
+
+def test_importacion_con_texto_invalido_responde_400_con_el_reporte(importar_app):
+    aplicacion = importar_app(VENTAS_TRANSACCIONES='0', SECUENCIA_FACTURA_ESTRICTA='0')
+    aplicacion.clientes_collection.delete_many({})
+    contenido = b'rucCliente,nombreCliente,telefonoCliente\n800-1,Ana,0981\n800-2,Jos\xe9,0982\n'
+
+    respuesta = aplicacion.app.test_client().post('/clientes/bulk?formato=csv', data=contenido,
+                                                  content_type='text/csv')
+
+    assert respuesta.status_code == 400
+    cuerpo = respuesta.get_json()
+    assert cuerpo['insertados'] == 1
+    assert cuerpo['errores'] == [{'fila': 3, 'error': 'El texto no es UTF-8 válido.'}]
+    assert 'fila 3' in cuerpo['error']
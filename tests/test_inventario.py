@@ -0,0 +1,126 @@
+import pytest
+from bson.objectid import ObjectId
+
+from inventario import (agrupar_lineas, reservar_stock, liberar_stock, completar_lineas_venta,
+                        ProductosInexistentes, StockInsuficiente)
+
+
+@pytest.fixture
+def productos(db):
+    collection = db['productos']
+    collection.insert_many([
+        {'_id': ObjectId(), 'nombre': 'Leche', 'CantidadActual': 10, 'CantidadMinima': 2, 'precioVenta': 8000, 'Iva': '10%'},
+        {'_id': ObjectId(), 'nombre': 'Yerba', 'CantidadActual': 3, 'CantidadMinima': 2, 'precioVenta': 25000, 'Iva': '10%'},
+    ])
+    return collection
+
+
+def ids(productos):
+    return [p['_id'] for p in productos.find().sort('_id', 1)]
+
+
+def stock(productos, producto_id):
+    return productos.find_one({'_id': producto_id})['CantidadActual']
+
+
+# Colección que, justo antes del bulk_write, deja a otra venta llevarse el
+# stock de un producto (lo que ocurre entre la lectura y la actualización)
+class VentaConcurrente:
+    def __init__(self, collection, producto_id, cantidad):
+        self.collection = collection
+        self.producto_id = producto_id
+        self.cantidad = cantidad
+
+    def __getattr__(self, nombre):
+        return getattr(self.collection, nombre)
+
+    def bulk_write(self, *args, **kwargs):
+        if self.cantidad:
+            self.collection.update_one({'_id': self.producto_id}, {'$inc': {'CantidadActual': -self.cantidad}})
+            self.cantidad = 0
+        return self.collection.bulk_write(*args, **kwargs)
+
+
+def test_agrupar_lineas_suma_productos_repetidos():
+    producto_id = ObjectId()
+    cantidades = agrupar_lineas([
+        {'idProducto': str(producto_id), 'cantidadVendida': 2},
+        {'idProducto': str(producto_id), 'cantidadVendida': 3},
+    ])
+    assert cantidades == {producto_id: 5}
+
+
+def test_reserva_descuenta_stock_y_recalcula_bajo_stock(productos):
+    leche, yerba = ids(productos)
+    leidos = reservar_stock(productos, {leche: 4, yerba: 2})
+
+    assert set(leidos) == {leche, yerba}
+    assert stock(productos, leche) == 6
+    assert stock(productos, yerba) == 1
+    assert productos.find_one({'_id': yerba})['bajoStock'] is True
+    assert productos.find_one({'_id': leche})['bajoStock'] is False
+
+
+def test_reserva_completa_no_deja_marcas(productos):
+    leche, yerba = ids(productos)
+    reservar_stock(productos, {leche: 1, yerba: 1})
+
+    for producto in productos.find():
+        assert producto.get('reservas', []) == []
+
+
+def test_stock_insuficiente_no_descuenta_nada(productos):
+    leche, yerba = ids(productos)
+    with pytest.raises(StockInsuficiente) as error:
+        reservar_stock(productos, {leche: 1, yerba: 5})
+
+    assert error.value.faltantes == [{
+        'idProducto': str(yerba), 'nombre': 'Yerba', 'cantidadSolicitada': 5, 'cantidadDisponible': 3,
+    }]
+    assert stock(productos, leche) == 10
+    assert stock(productos, yerba) == 3
+
+
+def test_producto_inexistente(productos):
+    leche, _ = ids(productos)
+    falta = ObjectId()
+    with pytest.raises(ProductosInexistentes) as error:
+        reservar_stock(productos, {leche: 1, falta: 1})
+
+    assert error.value.ids == [str(falta)]
+    assert stock(productos, leche) == 10
+
+
+def test_conflicto_compensa_la_reserva_parcial(productos):
+    leche, yerba = ids(productos)
+    concurrente = VentaConcurrente(productos, yerba, 2)
+
+    with pytest.raises(StockInsuficiente) as error:
+        reservar_stock(concurrente, {leche: 4, yerba: 2})
+
+    # La leche se había descontado y se devuelve; la yerba queda como la dejó la otra venta
+    assert stock(productos, leche) == 10
+    assert stock(productos, yerba) == 1
+    assert [f['idProducto'] for f in error.value.faltantes] == [str(yerba)]
+    for producto in productos.find():
+        assert producto.get('reservas', []) == []
+
+
+def test_liberar_stock_devuelve_las_cantidades(productos):
+    leche, yerba = ids(productos)
+    reservar_stock(productos, {leche: 4, yerba: 2})
+    liberar_stock(productos, {leche: 4, yerba: 2})
+
+    assert stock(productos, leche) == 10
+    assert stock(productos, yerba) == 3
+    assert productos.find_one({'_id': yerba})['bajoStock'] is False
+
+
+def test_completar_lineas_venta_copia_los_datos_del_producto(productos):
+    leche, _ = ids(productos)
+    lineas = [{'idProducto': str(leche), 'cantidadVendida': 2}]
+    completar_lineas_venta(lineas, {leche: productos.find_one({'_id': leche})})
+
+    assert lineas[0]['nombre'] == 'Leche'
+    assert lineas[0]['precioVenta'] == 8000
+    assert lineas[0]['total'] == 16000
@@ -0,0 +1,88 @@
+import pytest
+from bson.objectid import ObjectId
+
+from resumenes import registrar_venta, importes_linea, tasa_iva, linea_completa, CAMPOS
+
+
+@pytest.fixture
+def productos():
+    return {
+        ObjectId(): {'nombre': 'Leche', 'precioVenta': 11000, 'precioCompra': 8000, 'Iva': '10%', 'Categoria': 'Lácteos'},
+        ObjectId(): {'nombre': 'Arroz', 'precioVenta': 10500, 'precioCompra': 7000, 'Iva': '5%', 'Categoria': None},
+    }
+
+
+def venta_de(productos, fecha='2025-03-14T10:30:00'):
+    lineas = []
+    for cantidad, (producto_id, producto) in enumerate(productos.items(), start=2):
+        linea = {'idProducto': str(producto_id), 'cantidadVendida': cantidad}
+        linea.update({campo: producto[campo] for campo in ('nombre', 'precioVenta', 'precioCompra', 'Iva', 'Categoria')})
+        lineas.append(linea)
+    return {'fechaVenta': fecha, 'productos': lineas}
+
+
+def test_tasa_iva():
+    assert tasa_iva('10%') == 10.0
+    assert tasa_iva('IVA 5') == 5.0
+    assert tasa_iva('2,5') == 2.5
+    assert tasa_iva('Exenta') == 0.0
+    assert tasa_iva(None) == 0.0
+
+
+def test_importes_con_iva_incluido():
+    importes = importes_linea({'cantidadVendida': 2, 'precioVenta': 11000, 'precioCompra': 8000, 'Iva': '10%'}, {})
+
+    assert importes == {'unidades': 2, 'ingresos': 22000, 'iva': 2000.0, 'costo': 16000, 'margen': 4000.0}
+
+
+def test_la_linea_tiene_prioridad_sobre_el_producto():
+    importes = importes_linea({'cantidadVendida': 1, 'precioVenta': 100, 'Iva': 'Exenta'},
+                              {'precioVenta': 999, 'precioCompra': 60, 'Iva': '10%'})
+
+    assert (importes['ingresos'], importes['iva'], importes['costo']) == (100, 0.0, 60)
+    assert not linea_completa({'precioVenta': 100, 'Iva': 'Exenta'})
+
+
+def test_registrar_venta_acumula_por_dia_producto_y_categoria(db, productos):
+    resumen = db['resumen_ventas']
+    registrar_venta(resumen, venta_de(productos), {})
+    registrar_venta(resumen, venta_de(productos), {})
+
+    dia = resumen.find_one({'_id': 'dia:2025-03-14:2025-03-14'})
+    assert dia['ventas'] == 2
+    assert dia['unidades'] == 10
+    assert dia['ingresos'] == 2 * (2 * 11000 + 3 * 10500)
+    leche_id = str(next(iter(productos)))
+    assert resumen.find_one({'_id': f'producto:2025-03-14:{leche_id}'})['nombre'] == 'Leche'
+    assert resumen.find_one({'_id': 'categoria:2025-03-14:Lácteos'})['unidades'] == 4
+    assert resumen.find_one({'_id': 'categoria:2025-03-14:Sin categoría'})['unidades'] == 6
+
+
+def test_la_anulacion_resta_lo_mismo_aunque_el_producto_haya_cambiado(db, productos):
+    resumen = db['resumen_ventas']
+    venta = venta_de(productos)
+    registrar_venta(resumen, venta, {})
+
+    # Después de la venta cambian el costo y la categoría del producto; la
+    # anulación usa los datos copiados en las líneas
+    actuales = {producto_id: dict(producto, precioCompra=1, Categoria='Otra') for producto_id, producto in productos.items()}
+    registrar_venta(resumen, venta, actuales, signo=-1)
+
+    documentos = list(resumen.find())
+    assert len(documentos) == 1 + len(productos) + 2
+    for documento in documentos:
+        assert all(documento[campo] == pytest.approx(0) for campo in CAMPOS), documento['_id']
+    assert resumen.find_one({'tipo': 'dia'})['ventas'] == 0
+    assert resumen.count_documents({'clave': 'Otra'}) == 0
+
+
+def test_ventas_anteriores_completan_los_datos_con_el_producto(db, productos):
+    resumen = db['resumen_ventas']
+    venta = {'fechaVenta': '2025-03-14', 'productos': [
+        {'idProducto': str(producto_id), 'cantidadVendida': 1} for producto_id in productos
+    ]}
+    registrar_venta(resumen, venta, productos)
+    registrar_venta(resumen, venta, productos, signo=-1)
+
+    assert resumen.find_one({'tipo': 'categoria', 'clave': 'Lácteos'})['unidades'] == 0
+    assert all(d['ingresos'] == pytest.approx(0) for d in resumen.find())
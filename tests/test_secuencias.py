@@ -0,0 +1,57 @@
+import threading
+
+from secuencias import AsignadorSecuencias
+
+CAMPOS = ('facturaNumero', 'numeroInterno')
+
+
+def test_por_bloques_entrega_correlativos_con_un_incremento_por_bloque(db):
+    asignador = AsignadorSecuencias(db['counters'], 'ventas', CAMPOS, tamano_bloque=5)
+    numeros = [asignador.siguiente() for _ in range(7)]
+
+    assert [n['facturaNumero'] for n in numeros] == list(range(1, 8))
+    assert [n['numeroInterno'] for n in numeros] == list(range(1, 8))
+    # Dos bloques reservados: el segundo queda a medio usar
+    assert db['counters'].find_one({'_id': 'ventas'})['facturaNumero'] == 10
+
+
+def test_dos_workers_no_repiten_numeros(db):
+    asignadores = [AsignadorSecuencias(db['counters'], 'ventas', CAMPOS, tamano_bloque=3) for _ in range(2)]
+    numeros = [asignadores[i % 2].siguiente()['facturaNumero'] for i in range(10)]
+
+    assert len(set(numeros)) == 10
+
+
+def test_hilos_concurrentes_no_repiten_numeros(db):
+    asignador = AsignadorSecuencias(db['counters'], 'ventas', CAMPOS, tamano_bloque=4)
+    numeros = []
+    candado = threading.Lock()
+
+    def pedir():
+        for _ in range(25):
+            numero = asignador.siguiente()['facturaNumero']
+            with candado:
+                numeros.append(numero)
+
+    hilos = [threading.Thread(target=pedir) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sorted(numeros) == list(range(1, 101))
+
+
+def test_estricto_incrementa_por_cada_numero(db):
+    asignador = AsignadorSecuencias(db['counters'], 'ventas', CAMPOS, estricto=True)
+
+    assert asignador.siguiente() == {'facturaNumero': 1, 'numeroInterno': 1}
+    assert asignador.siguiente() == {'facturaNumero': 2, 'numeroInterno': 2}
+    assert db['counters'].find_one({'_id': 'ventas'})['facturaNumero'] == 2
+
+
+def test_migra_los_contadores_anteriores(db):
+    db['counters'].insert_many([{'_id': 'facturaNumero', 'seq': 41}, {'_id': 'numeroInterno', 'seq': 7}])
+    asignador = AsignadorSecuencias(db['counters'], 'ventas', CAMPOS, estricto=True)
+
+    assert asignador.siguiente() == {'facturaNumero': 42, 'numeroInterno': 8}
@@ -0,0 +1,52 @@
+import pytest
+from pymongo.errors import WriteError
+
+
+def venta(producto_id, cantidad=2):
+    return {
+        'nombreEmpresa': 'Empresa', 'rucEmpresa': '80000001-1', 'direccionEmpresa': 'Asunción',
+        'timbradoEmpresa': '12345678', 'nombreCliente': 'Cliente', 'rucCliente': '4000000-1',
+        'fechaVenta': '2025-03-14T10:30:00',
+        'productos': [{'idProducto': str(producto_id), 'cantidadVendida': cantidad}],
+    }
+
+
+def test_numeracion_estricta_sin_transacciones_no_arranca(importar_app):
+    with pytest.raises(RuntimeError, match='VENTAS_TRANSACCIONES'):
+        importar_app(VENTAS_TRANSACCIONES='0', SECUENCIA_FACTURA_ESTRICTA='1')
+
+
+def test_la_numeracion_estricta_es_la_predeterminada(importar_app, monkeypatch):
+    monkeypatch.delenv('SECUENCIA_FACTURA_ESTRICTA', raising=False)
+    with pytest.raises(RuntimeError):
+        importar_app(VENTAS_TRANSACCIONES='0')
+
+
+def test_insercion_fallida_sin_transacciones_devuelve_el_stock(importar_app, monkeypatch):
+    aplicacion = importar_app(VENTAS_TRANSACCIONES='0', SECUENCIA_FACTURA_ESTRICTA='0')
+    for nombre in aplicacion.db.list_collection_names():
+        aplicacion.db.drop_collection(nombre)
+    productos = aplicacion.productos_collection
+    producto_id = productos.insert_one({'nombre': 'Leche', 'CantidadActual': 10, 'CantidadMinima': 2,
+                                        'precioVenta': 8000, 'precioCompra': 6000, 'Iva': '10%'}).inserted_id
+
+    def insert_one(*args, **kwargs):
+        raise WriteError('la base rechazó la venta')
+
+    cliente = aplicacion.app.test_client()
+    with monkeypatch.context() as parche:
+        parche.setattr(aplicacion.ventas_collection, 'insert_one', insert_one)
+        respuesta = cliente.post('/ventas', json=venta(producto_id))
+
+    assert respuesta.status_code == 500
+    assert productos.find_one({'_id': producto_id})['CantidadActual'] == 10
+    assert aplicacion.ventas_collection.count_documents({}) == 0
+    assert aplicacion.resumen_ventas_collection.count_documents({}) == 0
+
+    # En modo por bloques el número de la venta fallida queda sin usar: por
+    # eso ese modo no sirve para facturas con timbrado
+    respuesta = cliente.post('/ventas', json=venta(producto_id))
+    assert respuesta.status_code == 201
+    assert respuesta.get_json()['numeroInterno'] == 2
+    assert productos.find_one({'_id': producto_id})['CantidadActual'] == 8
+
@@ -0,0 +1,276 @@
+import os
+import sys
+import math
+import time
+import signal
+import socket
+import argparse
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+from bson.binary import Binary
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+# Trabajos de reconocimiento asíncronos (POST /reconocer-imagen/jobs).
+#
+# La petición valida la imagen, la guarda en la colección
+# 'trabajos_reconocimiento' con estado 'pendiente' y responde enseguida con el
+# id del trabajo. Un pool de procesos de inferencia (este módulo ejecutado
+# como programa) toma los trabajos pendientes de a lotes, los reconoce con
+# vision.py y guarda el resultado. El cliente lo consulta con
+# GET /reconocer-imagen/jobs/<id>, opcionalmente esperando (?esperar=segundos)
+# a que termine.
+#
+# La cola es la colección, así todos los workers de gunicorn ven los mismos
+# trabajos. Está acotada a TRABAJOS_COLA_MAX pendientes: pasado ese límite la
+# API responde 429 con Retry-After (el conteo no es atómico con la inserción,
+# así que en una ráfaga el límite puede superarse por unos pocos trabajos).
+# Los resultados se borran TRABAJOS_TTL_S segundos después de terminar, con un
+# índice TTL sobre 'expira' (ver indices.py).
+#
+#   python trabajos.py --procesos 2
+
+TRABAJOS_COLA_MAX = int(os.environ.get('TRABAJOS_COLA_MAX', 64))
+TRABAJOS_PROCESOS = int(os.environ.get('TRABAJOS_PROCESOS', 1))
+TRABAJOS_LOTE = int(os.environ.get('TRABAJOS_LOTE', 8))
+TRABAJOS_TTL_S = int(os.environ.get('TRABAJOS_TTL_S', 600))
+# Un trabajo 'procesando' por más de este plazo se da por perdido (el proceso
+# murió) y vuelve a tomarse, hasta TRABAJOS_INTENTOS veces
+TRABAJOS_PLAZO_S = int(os.environ.get('TRABAJOS_PLAZO_S', 120))
+TRABAJOS_INTENTOS = int(os.environ.get('TRABAJOS_INTENTOS', 2))
+# Estimación para Retry-After: segundos por imagen en cada proceso
+SEGUNDOS_POR_IMAGEN = float(os.environ.get('TRABAJOS_SEGUNDOS_POR_IMAGEN', 0.5))
+# Espera máxima de GET /reconocer-imagen/jobs/<id>?esperar=; debe quedar por
+# debajo de la espera en cola de la clase 'sondeos' de admision.py
+MAX_ESPERA_CONSULTA_S = float(os.environ.get('TRABAJOS_ESPERA_MAX_S', 5))
+ESPERA_SIN_TRABAJOS = (0.05, 1.0)
+
+TERMINADOS = ('listo', 'error')
+
+
+class ColaLlena(Exception):
+    def __init__(self, reintentar):
+        super().__init__(f'La cola de reconocimiento está llena, intente nuevamente en {reintentar} s.')
+        self.reintentar = reintentar
+
+
+def _ahora_utc():
+    return datetime.now(timezone.utc)
+
+
+class ColaTrabajos:
+    def __init__(self, collection, limite=TRABAJOS_COLA_MAX, procesos=TRABAJOS_PROCESOS,
+                 ttl_segundos=TRABAJOS_TTL_S, plazo_segundos=TRABAJOS_PLAZO_S, intentos=TRABAJOS_INTENTOS):
+        self.collection = collection
+        self.limite = limite
+        self.procesos = max(procesos, 1)
+        self.ttl = ttl_segundos
+        self.plazo = plazo_segundos
+        self.intentos = intentos
+        self._rechazados = 0
+
+    def reintentar_en(self, pendientes):
+        return max(1, math.ceil(pendientes * SEGUNDOS_POR_IMAGEN / self.procesos))
+
+    def encolar(self, datos):
+        pendientes = self.collection.count_documents({'estado': 'pendiente'})
+        if pendientes >= self.limite:
+            self._rechazados += 1
+            raise ColaLlena(self.reintentar_en(pendientes))
+
+        ahora = _ahora_utc()
+        resultado = self.collection.insert_one({
+            'estado': 'pendiente',
+            'imagen': Binary(datos),
+            'intentos': 0,
+            'creado': ahora,
+            # Si nadie lo procesa, el trabajo vence igual
+            'expira': ahora + timedelta(seconds=self.plazo * (self.intentos + 1) + self.ttl),
+        })
+        return str(resultado.inserted_id)
+
+    # Estado del trabajo, o None si no existe o ya venció. Con 'esperar' se
+    # vuelve a consultar hasta que termine o pasen esos segundos
+    def consultar(self, trabajo_id, esperar=0):
+        _id = ObjectId(trabajo_id)
+        limite = time.monotonic() + min(max(esperar, 0), MAX_ESPERA_CONSULTA_S)
+        intervalo = 0.05
+        while True:
+            # El monitor TTL de Mongo corre cada ~60 s, así que se filtra también aquí
+            documento = self.collection.find_one({'_id': _id, 'expira': {'$gt': _ahora_utc()}}, {'imagen': 0})
+            restante = limite - time.monotonic()
+            if documento is None or documento['estado'] in TERMINADOS or restante <= 0:
+                return self._describir(documento)
+            time.sleep(min(intervalo, restante))
+            intervalo = min(intervalo * 2, 0.5)
+
+    def _describir(self, documento):
+        if documento is None:
+            return None
+        respuesta = {
+            'id': str(documento['_id']),
+            'estado': documento['estado'],
+            'creado': documento['creado'].isoformat(),
+        }
+        if documento['estado'] == 'pendiente':
+            respuesta['posicion'] = self.collection.count_documents(
+                {'estado': 'pendiente', '_id': {'$lt': documento['_id']}}) + 1
+        if documento.get('terminado'):
+            respuesta['terminado'] = documento['terminado'].isoformat()
+        if documento['estado'] == 'listo':
+            respuesta['objetos_reconocidos'] = documento.get('objetos_reconocidos')
+        if documento['estado'] == 'error':
+            respuesta['error'] = documento.get('error')
+        return respuesta
+
+    # Los trabajos que quedaron 'procesando' más allá del plazo y ya agotaron
+    # sus intentos no se vuelven a tomar: se cierran con error para que el
+    # cliente deje de consultarlos
+    def cerrar_agotados(self):
+        ahora = _ahora_utc()
+        return self.collection.update_many(
+            {'estado': 'procesando', 'tomado': {'$lt': ahora - timedelta(seconds=self.plazo)},
+             'intentos': {'$gte': self.intentos}},
+            {'$set': {'estado': 'error',
+                      'error': f'El reconocimiento no terminó después de {self.intentos} intentos.',
+                      'terminado': ahora, 'expira': ahora + timedelta(seconds=self.ttl)},
+             '$unset': {'imagen': ''}}
+        ).modified_count
+
+    # Tomar hasta 'cantidad' trabajos, primero los más antiguos. También se
+    # retoman los que quedaron 'procesando' más allá del plazo
+    def tomar(self, trabajador, cantidad=TRABAJOS_LOTE):
+        self.cerrar_agotados()
+        trabajos = []
+        for _ in range(cantidad):
+            ahora = _ahora_utc()
+            documento = self.collection.find_one_and_update(
+                {'$or': [
+                    {'estado': 'pendiente'},
+                    {'estado': 'procesando', 'tomado': {'$lt': ahora - timedelta(seconds=self.plazo)}},
+                ], 'intentos': {'$lt': self.intentos}},
+                {'$set': {'estado': 'procesando', 'tomado': ahora, 'trabajador': trabajador}, '$inc': {'intentos': 1}},
+                sort=[('_id', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if documento is None:
+                break
+            trabajos.append(documento)
+        return trabajos
+
+    def _terminar(self, trabajo_id, campos):
+        ahora = _ahora_utc()
+        campos.update({'terminado': ahora, 'expira': ahora + timedelta(seconds=self.ttl)})
+        self.collection.update_one({'_id': trabajo_id, 'estado': 'procesando'},
+                                   {'$set': campos, '$unset': {'imagen': ''}})
+
+    def completar(self, trabajo_id, objetos_reconocidos):
+        self._terminar(trabajo_id, {'estado': 'listo', 'objetos_reconocidos': objetos_reconocidos})
+
+    def fallar(self, trabajo_id, mensaje):
+        self._terminar(trabajo_id, {'estado': 'error', 'error': mensaje})
+
+    def metricas(self):
+        conteos = {d['_id']: d['n'] for d in self.collection.aggregate([{'$group': {'_id': '$estado', 'n': {'$sum': 1}}}])}
+        return {
+            'pendientes': conteos.get('pendiente', 0),
+            'procesando': conteos.get('procesando', 0),
+            'listos': conteos.get('listo', 0),
+            'errores': conteos.get('error', 0),
+            'limiteCola': self.limite,
+            'rechazados': self._rechazados,
+        }
+
+
+# Reconocer un lote; si falla, se reintenta de a una imagen para no marcar
+# con error los trabajos que no tienen problema
+def procesar(cola, vision, trabajos):
+    from micro_lotes import LoteVencido
+
+    try:
+        resultados = vision.reconocer([bytes(t['imagen']) for t in trabajos])
+    except LoteVencido as e:
+        # Reintentar de a una esperaría el plazo otra vez por cada imagen
+        for trabajo in trabajos:
+            cola.fallar(trabajo['_id'], str(e))
+        return
+    except Exception:
+        resultados = None
+    if resultados is not None:
+        for trabajo, objetos_reconocidos in zip(trabajos, resultados):
+            cola.completar(trabajo['_id'], objetos_reconocidos)
+        return
+
+    for trabajo in trabajos:
+        try:
+            cola.completar(trabajo['_id'], vision.reconocer([bytes(trabajo['imagen'])])[0])
+        except Exception as e:
+            cola.fallar(trabajo['_id'], str(e))
+
+
+# Bucle de un proceso del pool: carga el modelo una vez y atiende la cola
+def atender(lote):
+    from conexion import ConexionMongo
+    from instrumentacion import exportar_en_segundo_plano, MonitorComandos
+    import vision
+
+    conexion = ConexionMongo.desde_entorno()
+    conexion.agregar_monitor(MonitorComandos())
+    db = conexion.db
+    vision.inicializar(db)
+    exportar_en_segundo_plano({'vision': vision.metricas})
+    cola = ColaTrabajos(db['trabajos_reconocimiento'])
+    trabajador = f'{socket.gethostname()}:{os.getpid()}'
+    print(f'Proceso de trabajos {trabajador} listo', flush=True)
+
+    espera = ESPERA_SIN_TRABAJOS[0]
+    while True:
+        try:
+            trabajos = cola.tomar(trabajador, lote)
+        except Exception as e:
+            print(f'{trabajador}: error al leer la cola: {e}', flush=True)
+            trabajos = []
+        if not trabajos:
+            time.sleep(espera)
+            espera = min(espera * 2, ESPERA_SIN_TRABAJOS[1])
+            continue
+        espera = ESPERA_SIN_TRABAJOS[0]
+        procesar(cola, vision, trabajos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pool de procesos para los trabajos de reconocimiento.')
+    parser.add_argument('--procesos', type=int, default=TRABAJOS_PROCESOS)
+    parser.add_argument('--lote', type=int, default=TRABAJOS_LOTE, help='Trabajos que toma cada proceso por pasada.')
+    args = parser.parse_args()
+
+    # 'spawn': cada proceso importa TensorFlow desde cero
+    contexto = multiprocessing.get_context('spawn')
+    procesos = []
+
+    def detener(*_):
+        for proceso in procesos:
+            proceso.terminate()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+
+    for _ in range(args.procesos):
+        proceso = contexto.Process(target=atender, args=(args.lote,), daemon=True)
+        proceso.start()
+        procesos.append(proceso)
+
+    # Reemplazar los procesos que terminan (p. ej. por falta de memoria)
+    while True:
+        time.sleep(1)
+        for i, proceso in enumerate(procesos):
+            if not proceso.is_alive():
+                print(f'El proceso {proceso.pid} terminó con código {proceso.exitcode}; se reinicia.', flush=True)
+                procesos[i] = contexto.Process(target=atender, args=(args.lote,), daemon=True)
+                procesos[i].start()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import os
+import json
+from functools import lru_cache
+
+import numpy as np
+
+
+RUTA_BASE = os.path.dirname(os.path.abspath(__file__))
+
+# Tabla precalculada de las 1000 clases de ImageNet, en el mismo orden que la
+# salida de MobileNetV2: cada fila es [nombre en inglés, nombre en español]
+RUTA_ETIQUETAS = os.environ.get('ETIQUETAS_ES', os.path.join(RUTA_BASE, 'etiquetas_es.json'))
+
+# Archivo opcional con el vocabulario propio de productos. Las claves pueden
+# ser el nombre en inglés ("banana") o el índice de la clase ("954")
+RUTA_PERSONALIZADAS = os.environ.get('ETIQUETAS_PERSONALIZADAS', os.path.join(RUTA_BASE, 'etiquetas_personalizadas.json'))
+
+# Traducción en vivo con googletrans solo para clases sin traducción en la
+# tabla; desactivada por defecto para no hacer peticiones de red
+TRADUCCION_EN_VIVO = os.environ.get('TRADUCCION_EN_VIVO', '0') == '1'
+TRADUCCION_CACHE_TAMANO = int(os.environ.get('TRADUCCION_CACHE_TAMANO', 1024))
+
+
+def cargar_etiquetas(ruta_etiquetas=RUTA_ETIQUETAS, ruta_personalizadas=RUTA_PERSONALIZADAS):
+    with open(ruta_etiquetas, encoding='utf-8') as f:
+        filas = json.load(f)
+
+    nombres_en = [fila[0] for fila in filas]
+    nombres_es = [fila[1] for fila in filas]
+
+    if ruta_personalizadas and os.path.exists(ruta_personalizadas):
+        with open(ruta_personalizadas, encoding='utf-8') as f:
+            personalizadas = json.load(f)
+        for clave, traduccion in personalizadas.items():
+            if clave.isdigit():
+                nombres_es[int(clave)] = traduccion
+                continue
+            # Un mismo nombre en inglés puede repetirse (p. ej. 'crane')
+            for i, nombre in enumerate(nombres_en):
+                if nombre == clave:
+                    nombres_es[i] = traduccion
+
+    return nombres_en, nombres_es
+
+
+# Se carga una sola vez al importar el módulo
+nombres_en, nombres_es = cargar_etiquetas()
+
+
+@lru_cache(maxsize=TRADUCCION_CACHE_TAMANO)
+def traducir_en_vivo(clase):
+    from googletrans import Translator
+    return Translator().translate(clase.replace('_', ' '), src='en', dest='es').text
+
+
+def traducir_clase(indice):
+    traduccion = nombres_es[indice]
+    if traduccion:
+        return traduccion
+
+    clase = nombres_en[indice]
+    if TRADUCCION_EN_VIVO:
+        try:
+            return traducir_en_vivo(clase)
+        except Exception:
+            pass
+    return clase.replace('_', ' ')
+
+
+# Reemplazo de decode_predictions: top-k de una fila de predicciones con las
+# clases ya traducidas, sin acceso a red
+def clases_principales(prediccion, top=3):
+    prediccion = np.asarray(prediccion).reshape(-1)
+    indices = np.argpartition(prediccion, -top)[-top:]
+    indices = indices[np.argsort(prediccion[indices])[::-1]]
+    return [(traducir_clase(int(i)), float(prediccion[i])) for i in indices]
@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import TimeoutError as FuturoVencido
+
+from micro_lotes import ProgramadorLotes, LoteVencido
+from motores_inferencia import crear_motor
+from traducciones import clases_principales
+from cache_predicciones import CachePredicciones, BackendMemoria, BackendMongo, hash_contenido
+from decodificacion import decodificar, a_buffer, PoolBuffers
+from instrumentacion import registro
+
+# Pila de reconocimiento de imágenes. Este módulo importa TensorFlow, por eso
+# app.py no lo importa directamente: lo carga cliente_vision la primera vez
+# que se necesita, o lo ejecuta un proceso aparte (vision_worker.py)
+
+# Espera máxima por el resultado de un lote. Queda por debajo de
+# VISION_PLAZO_S (cliente_vision.py) para que un lote trabado libere el hilo
+# que espera en lugar de retenerlo para siempre
+VISION_PLAZO_LOTE_S = float(os.environ.get('VISION_PLAZO_LOTE_S', 25))
+
+motor = None
+programador_lotes = None
+programador_embeddings = None
+cache_predicciones = None
+pool_buffers = None
+
+
+# Caché de resultados de reconocimiento por contenido de la imagen.
+# CACHE_PREDICCIONES_BACKEND: 'memoria' (por defecto), 'mongo' o 'ninguno'
+def crear_cache_predicciones(db=None):
+    tipo = os.environ.get('CACHE_PREDICCIONES_BACKEND', 'memoria')
+    ttl = int(os.environ.get('CACHE_PREDICCIONES_TTL', 86400))
+    max_entradas = int(os.environ.get('CACHE_PREDICCIONES_MAX', 10000))
+    if tipo == 'ninguno':
+        return None
+    if tipo == 'mongo' and db is not None:
+        backend = BackendMongo(db['cache_predicciones'], max_entradas=max_entradas, ttl_segundos=ttl)
+    else:
+        backend = BackendMemoria(max_entradas=max_entradas, ttl_segundos=ttl)
+    return CachePredicciones(backend, usar_hash_perceptual=os.environ.get('CACHE_HASH_PERCEPTUAL', '0') == '1')
+
+
+# Tiempo de cada etapa del reconocimiento en el histograma vision_etapa_segundos
+def medir_etapa(etapa, funcion):
+    def medida(*args):
+        with registro.cronometro('vision_etapa_segundos', etapa=etapa):
+            return funcion(*args)
+    return medida
+
+
+def inicializar(db=None):
+    global motor, programador_lotes, programador_embeddings, cache_predicciones, pool_buffers
+    if motor is not None:
+        return
+
+    # Cargar el modelo preentrenado MobileNetV2 con el motor de inferencia elegido.
+    # MOTOR_INFERENCIA: 'keras', 'compilado', 'tflite-float16' o 'tflite-int8'
+    motor = crear_motor(
+        os.environ.get('MOTOR_INFERENCIA', 'keras'),
+        hilos=int(os.environ['TFLITE_HILOS']) if os.environ.get('TFLITE_HILOS') else None
+    )
+
+    # Programador de micro-lotes: agrupa imágenes de peticiones concurrentes
+    # (hasta LOTE_TAMANO_MAXIMO imágenes o LOTE_ESPERA_MS milisegundos)
+    programador_lotes = ProgramadorLotes(
+        medir_etapa('predecir', motor.predecir),
+        tamano_maximo=int(os.environ.get('LOTE_TAMANO_MAXIMO', 16)),
+        espera_maxima_ms=float(os.environ.get('LOTE_ESPERA_MS', 10)),
+        limite_cola=int(os.environ.get('LOTE_LIMITE_COLA', 256))
+    )
+
+    # Lo mismo para los embeddings de las coincidencias visuales; el hilo del
+    # programador recién arranca con el primer embedding
+    programador_embeddings = ProgramadorLotes(
+        medir_etapa('embeddings', motor.embeddings),
+        tamano_maximo=int(os.environ.get('LOTE_TAMANO_MAXIMO', 16)),
+        espera_maxima_ms=float(os.environ.get('LOTE_ESPERA_MS', 10)),
+        limite_cola=int(os.environ.get('LOTE_LIMITE_COLA', 256))
+    )
+
+    cache_predicciones = crear_cache_predicciones(db)
+
+    # Buffers float32 en los que se decodifican las imágenes hasta entrar al lote
+    pool_buffers = PoolBuffers(tamano=int(os.environ.get('LOTE_TAMANO_MAXIMO', 16)) * 4)
+
+
+def decodificar_imagen(datos):
+    with registro.cronometro('vision_etapa_segundos', etapa='decodificar'):
+        return decodificar(datos)
+
+
+# Copiar la imagen decodificada a un buffer del pool, ya preprocesada
+def preprocesar(img):
+    with registro.cronometro('vision_etapa_segundos', etapa='preprocesar'):
+        return a_buffer(img, pool_buffers.tomar())
+
+
+# Obtener las 3 clases más probables ya traducidas con la tabla local
+def interpretar_predicciones(predicciones):
+    objetos_reconocidos = []
+    with registro.cronometro('vision_etapa_segundos', etapa='traducir'):
+        clases = clases_principales(predicciones[0], top=3)
+    for clase_traducida, puntuacion in clases:
+        objetos_reconocidos.append({
+            "clase": clase_traducida,
+            "probabilidad": f"{puntuacion * 100:.2f}%"
+        })
+
+    return objetos_reconocidos
+
+
+# Buscar la imagen subida en la caché. Si no está, devuelve el buffer listo
+# para el modelo y las claves con las que se debe guardar el resultado
+def buscar_en_cache(datos):
+    if cache_predicciones is None:
+        return None, preprocesar(decodificar_imagen(datos)), ()
+
+    clave_contenido = hash_contenido(datos)
+    resultado = cache_predicciones.obtener_exacto(clave_contenido)
+    if resultado is not None:
+        return resultado, None, ()
+
+    img = decodificar_imagen(datos)
+    clave_perceptual = cache_predicciones.clave_perceptual(img)
+    resultado = cache_predicciones.obtener_perceptual(clave_perceptual)
+    if resultado is not None:
+        cache_predicciones.guardar(resultado, clave_contenido)
+        return resultado, None, ()
+
+    return None, preprocesar(img), (clave_contenido, clave_perceptual)
+
+
+def esperar_lote(futuro):
+    try:
+        return futuro.result(timeout=VISION_PLAZO_LOTE_S)
+    except FuturoVencido:
+        raise LoteVencido('El servicio de reconocimiento no responde, intente nuevamente.')
+
+
+def guardar_en_cache(resultado, claves):
+    if cache_predicciones is not None:
+        cache_predicciones.guardar(resultado, *claves)
+
+
+# Reconocer una lista de imágenes (bytes subidos). Todas las que no están en
+# caché se encolan antes de esperar, así caen en el mismo lote
+def reconocer(contenidos):
+    pendientes = []
+    for datos in contenidos:
+        objetos_reconocidos, img_array, claves = buscar_en_cache(datos)
+        futuro = None
+        if objetos_reconocidos is None:
+            try:
+                futuro = programador_lotes.enviar(img_array, liberar=pool_buffers.devolver)
+            except Exception:
+                pool_buffers.devolver(img_array)
+                raise
+        pendientes.append((objetos_reconocidos, futuro, claves))
+
+    resultados = []
+    for objetos_reconocidos, futuro, claves in pendientes:
+        if futuro is not None:
+            objetos_reconocidos = interpretar_predicciones(esperar_lote(futuro))
+            guardar_en_cache(objetos_reconocidos, claves)
+        resultados.append(objetos_reconocidos)
+    return resultados
+
+
+# Embeddings de MobileNetV2 (penúltima capa, float32) de una lista de
+# imágenes; no pasan por la caché de predicciones
+def embeddings(contenidos):
+    futuros = []
+    for datos in contenidos:
+        img_array = preprocesar(decodificar_imagen(datos))
+        try:
+            futuros.append(programador_embeddings.enviar(img_array, liberar=pool_buffers.devolver))
+        except Exception:
+            pool_buffers.devolver(img_array)
+            raise
+    return [esperar_lote(futuro)[0] for futuro in futuros]
+
+
+def metricas():
+    resultado = programador_lotes.metricas()
+    resultado['motor'] = motor.nombre
+    resultado['embeddings'] = programador_embeddings.metricas()
+    resultado['cache'] = cache_predicciones.metricas() if cache_predicciones is not None else None
+    return resultado
@@ -0,0 +1,89 @@
+import os
+import sys
+import queue
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+from cliente_vision import VISION_AUTHKEY, direccion_vision
+from decodificacion import ImagenInvalida, ImagenDemasiadoGrande
+from instrumentacion import exportar_en_segundo_plano
+from micro_lotes import LoteVencido
+
+# Proceso de visión dedicado: carga el modelo una sola vez y atiende a los
+# workers de gunicorn por un socket local (VISION_MODO=remoto).
+#
+#   VISION_SOCKET=/tmp/vision.sock python vision_worker.py
+
+
+def atender(conexion, vision):
+    with conexion:
+        while True:
+            try:
+                operacion, args = conexion.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if operacion == 'reconocer':
+                    respuesta = ('ok', vision.reconocer(*args))
+                elif operacion == 'embeddings':
+                    respuesta = ('ok', vision.embeddings(*args))
+                elif operacion == 'metricas':
+                    respuesta = ('ok', vision.metricas())
+                else:
+                    respuesta = ('error', f"Operación desconocida: '{operacion}'.")
+            except ImagenDemasiadoGrande as e:
+                respuesta = ('demasiado_grande', str(e))
+            except ImagenInvalida as e:
+                respuesta = ('invalida', str(e))
+            except queue.Full:
+                respuesta = ('saturado', 'El servicio de reconocimiento está saturado, intente nuevamente.')
+            except LoteVencido as e:
+                respuesta = ('saturado', str(e))
+            except Exception as e:
+                respuesta = ('error', str(e))
+
+            try:
+                conexion.send(respuesta)
+            except (EOFError, OSError):
+                return
+
+
+def main():
+    # Validar la dirección antes de cargar el modelo
+    direccion = direccion_vision()
+    import vision
+
+    db = None
+    if os.environ.get('CACHE_PREDICCIONES_BACKEND') == 'mongo':
+        from conexion import ConexionMongo
+        db = ConexionMongo.desde_entorno().db
+    vision.inicializar(db)
+    # Con METRICAS_DIR, los tiempos por etapa llegan a GET /metrics
+    exportar_en_segundo_plano({'vision': vision.metricas})
+
+    if isinstance(direccion, str) and os.path.exists(direccion):
+        os.remove(direccion)
+
+    # El socket Unix se crea ya con permisos solo para el usuario del proceso
+    mascara = os.umask(0o177) if isinstance(direccion, str) else None
+    try:
+        listener = Listener(direccion, authkey=VISION_AUTHKEY)
+    finally:
+        if mascara is not None:
+            os.umask(mascara)
+
+    with listener:
+        print(f'Proceso de visión escuchando en {direccion}', flush=True)
+        while True:
+            try:
+                conexion = listener.accept()
+            except (OSError, AuthenticationError):
+                # Falla de autenticación o conexión cortada durante el saludo
+                continue
+            threading.Thread(target=atender, args=(conexion, vision), daemon=True).start()
+
+
+if __name__ == '__main__':
+    sys.exit(main())